@@ -0,0 +1,87 @@
+"""
+Compares the two code block modes: `listings` (highlighted by TeX) and
+`pygments` (highlighted in Python, cached). Generates a code-heavy
+document, renders it both ways and times a single pdflatex pass of each.
+
+    python -m benchmarks.code_highlighting --blocks 200 --lines 40
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from src.core.parser import Parser
+from src.core.renderer import LatexRenderer
+from src.core.tokenizer import Tokenizer
+from src.utils.highlight import HighlightCache
+from src.utils.pdf_generator import generate_pdf_from_latex
+
+SNIPPETS = {
+    "python": "def step_{i}(values):\n    total = sum(v * {i} for v in values if v % 2)  # odd only\n    return {{'step': {i}, 'total': total}}\n",
+    "java": "public int step{i}(int[] values) {{\n    int total = 0;\n    for (int v : values) total += v * {i};\n    return total; // sum\n}}\n",
+    "c": "static int step_{i}(const int *values, size_t n) {{\n    int total = 0;\n    for (size_t k = 0; k < n; k++) total += values[k] * {i};\n    return total;\n}}\n",
+}
+
+
+def make_document(blocks: int, lines: int) -> str:
+    """A deterministic Markdown document with `blocks` code blocks of about `lines` lines."""
+    parts = ["# Code"]
+    languages = sorted(SNIPPETS)
+    for index in range(blocks):
+        language = languages[index % len(languages)]
+        body = ""
+        i = index
+        while body.count("\n") < lines:
+            body += SNIPPETS[language].format(i=i)
+            i += 1
+        parts.append(f"Block {index}:\n\n```{language}\n{body.rstrip()}\n```")
+    return "\n\n".join(parts) + "\n"
+
+
+def _time(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=100)
+    parser.add_argument("--lines", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3, help="pdflatex runs per mode (best is reported)")
+    args = parser.parse_args()
+
+    markdown = make_document(args.blocks, args.lines)
+    document = Parser(Tokenizer().tokenize(markdown)).parse()
+    metadata = {"title": "bench"}
+    has_pdflatex = shutil.which("pdflatex") is not None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = HighlightCache(use_disk=False)
+        print(f"{args.blocks} blocks x ~{args.lines} lines")
+        for mode in ("listings", "pygments"):
+            renderer = LatexRenderer(code_mode=mode, highlighter=cache)
+            latex, cold = _time(lambda: renderer.render(document, metadata))
+            _, warm = _time(lambda: renderer.render(document, metadata))
+            tex_file = Path(tmp) / mode / "bench.tex"
+            tex_file.parent.mkdir()
+            tex_file.write_text(latex, encoding="utf-8")
+
+            line = f"{mode:>9}: render {cold * 1000:8.1f} ms cold, {warm * 1000:8.1f} ms warm"
+            if has_pdflatex:
+                best = None
+                for _ in range(args.repeat):
+                    (success, message), elapsed = _time(lambda: generate_pdf_from_latex(tex_file, passes=1))
+                    if not success:
+                        raise SystemExit(f"pdflatex failed in {mode} mode: {message}")
+                    best = elapsed if best is None else min(best, elapsed)
+                line += f", pdflatex {best:6.2f} s"
+            print(line)
+        if not has_pdflatex:
+            print("pdflatex not found; only render times were measured.")
+
+
+if __name__ == "__main__":
+    main()
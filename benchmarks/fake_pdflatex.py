@@ -0,0 +1,60 @@
+"""
+Stand-in for pdflatex in load tests: sleeps, then writes a tiny PDF next
+to the .tex file, or fails like a broken document would. Tuned through the
+environment of the process that runs it:
+
+    FAKE_PDFLATEX_LATENCY       seconds per pass (default 0.5)
+    FAKE_PDFLATEX_JITTER        extra random seconds per pass, uniform in [0, jitter] (default 0)
+    FAKE_PDFLATEX_FAILURE_RATE  chance that a pass fails, 0..1 (default 0)
+
+`install(bin_dir)` puts an executable `pdflatex` wrapper into `bin_dir`;
+prepend that directory to PATH.
+"""
+
+import os
+import random
+import stat
+import sys
+import time
+from pathlib import Path
+
+PDF = (b"%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+       b"2 0 obj << /Type /Pages /Kids [] /Count 0 >> endobj\n"
+       b"trailer << /Root 1 0 R >>\n%%EOF\n")
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def install(bin_dir: Path) -> Path:
+    """Writes the `pdflatex` wrapper into `bin_dir` and returns its path."""
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    wrapper = bin_dir / "pdflatex"
+    wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{Path(__file__).resolve()}" "$@"\n',
+                       encoding="utf-8")
+    wrapper.chmod(wrapper.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return wrapper
+
+
+def main(argv) -> int:
+    tex_name = next((arg for arg in reversed(argv) if not arg.startswith("-")), None)
+    if tex_name is None:
+        print("fake pdflatex: no input file", file=sys.stderr)
+        return 1
+    stem = Path(tex_name).name[:-len(".tex")] if tex_name.endswith(".tex") else Path(tex_name).name
+
+    time.sleep(_env_float("FAKE_PDFLATEX_LATENCY", 0.5) + random.uniform(0, _env_float("FAKE_PDFLATEX_JITTER", 0)))
+    if random.random() < _env_float("FAKE_PDFLATEX_FAILURE_RATE", 0):
+        Path(f"{stem}.log").write_text("! Emergency stop (fake pdflatex failure).\n", encoding="utf-8")
+        print("! Emergency stop (fake pdflatex failure).")
+        return 1
+
+    Path(f"{stem}.log").write_text("Output written on fake pdflatex.\n", encoding="utf-8")
+    Path(f"{stem}.pdf").write_bytes(PDF)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
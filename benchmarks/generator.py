@@ -0,0 +1,164 @@
+"""
+Deterministic synthetic Markdown documents for benchmarks. The same size,
+mix and seed always give the same bytes, so runs on different commits
+convert identical input.
+
+    python -m benchmarks.generator --size 10MB --mix technical -o big.md
+"""
+
+import argparse
+import random
+import re
+import sys
+from typing import Dict, Iterator, TextIO
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+         "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+         "exercitation ullamco laboris nisi aliquip ex ea commodo consequat").split()
+
+LATEX_MATH = ("\\frac{{a_{i}}}{{b + {i}}}", "\\sum_{{k=1}}^{{{i}}} k^2", "\\sqrt{{x_{i} + y}}",
+              "\\int_0^{{{i}}} e^{{-t}} \\, dt")
+CODE_LINES = ("def step_{i}(values):", "    total = sum(v * {i} for v in values)",
+              "    if total > {i}:", "        return total // 2", "    return total")
+
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+
+class FeatureMix:
+    """Relative weights of the block types, plus how busy the inline markup is."""
+
+    def __init__(self, headings: float = 1, paragraphs: float = 6, lists: float = 2,
+                 tables: float = 1, code: float = 1, math: float = 1, images: float = 0.5,
+                 inline_density: float = 0.3, list_depth: int = 3):
+        self.headings = headings
+        self.paragraphs = paragraphs
+        self.lists = lists
+        self.tables = tables
+        self.code = code
+        self.math = math
+        self.images = images
+        self.inline_density = inline_density  # chance that a word carries bold/italic/code/link/math
+        self.list_depth = list_depth          # deepest nesting level of generated lists
+
+    def to_dict(self) -> Dict[str, float]:
+        return dict(vars(self))
+
+
+MIXES = {
+    "prose": FeatureMix(headings=1, paragraphs=10, lists=1, tables=0, code=0, math=0, images=0,
+                        inline_density=0.1),
+    "mixed": FeatureMix(),
+    "technical": FeatureMix(headings=1, paragraphs=3, lists=2, tables=2, code=3, math=3, images=1,
+                            inline_density=0.5),
+}
+
+
+def parse_size(text: str) -> int:
+    """'1KB', '500MB' or a plain byte count."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*", text.upper())
+    if not match:
+        raise ValueError(f"Invalid size: {text!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+class _BlockWriter:
+    def __init__(self, mix: FeatureMix, seed: int):
+        self.mix = mix
+        self.random = random.Random(seed)
+        self.count = 0
+        self.kinds = [kind for kind in ("headings", "paragraphs", "lists", "tables", "code", "math", "images")
+                      if getattr(mix, kind) > 0]
+        self.weights = [getattr(mix, kind) for kind in self.kinds]
+
+    def next_block(self) -> str:
+        self.count += 1
+        kind = self.random.choices(self.kinds, self.weights)[0]
+        return getattr(self, f"_{kind}")()
+
+    def _words(self, count: int, inline: bool = True) -> str:
+        words = []
+        for _ in range(count):
+            word = self.random.choice(WORDS)
+            if inline and self.random.random() < self.mix.inline_density:
+                style = self.random.randrange(5)
+                word = (f"**{word}**", f"*{word}*", f"`{word}`",
+                        f"[{word}](https://example.com/{word})", f"${word}_{self.count}$")[style]
+            words.append(word)
+        return " ".join(words)
+
+    def _headings(self) -> str:
+        return f"{'#' * self.random.randint(1, 3)} {self._words(4, inline=False).capitalize()} {self.count}"
+
+    def _paragraphs(self) -> str:
+        lines = [self._words(self.random.randint(8, 16)) for _ in range(self.random.randint(1, 4))]
+        return "\n".join(lines)
+
+    def _lists(self) -> str:
+        lines, depth = [], 0
+        for index in range(self.random.randint(3, 8)):
+            depth = max(0, min(self.mix.list_depth - 1, depth + self.random.choice((-1, 0, 0, 1))))
+            marker = "-" if depth % 2 == 0 else f"{index + 1}."
+            lines.append(f"{'  ' * depth}{marker} {self._words(self.random.randint(3, 8))}")
+        return "\n".join(lines)
+
+    def _tables(self) -> str:
+        columns = self.random.randint(2, 5)
+        lines = ["::: table", f"caption: {self._words(3, inline=False)}",
+                 "| " + " | ".join(f"Col {c}" for c in range(columns)) + " |",
+                 "|" + "---|" * columns]
+        for _ in range(self.random.randint(2, 10)):
+            lines.append("| " + " | ".join(self._words(2, inline=False) for _ in range(columns)) + " |")
+        lines.append(":::")
+        return "\n".join(lines)
+
+    def _code(self) -> str:
+        body = [CODE_LINES[k % len(CODE_LINES)].format(i=self.count) for k in range(self.random.randint(3, 25))]
+        return "```python\n" + "\n".join(body) + "\n```"
+
+    def _math(self) -> str:
+        return "$$\n" + self.random.choice(LATEX_MATH).format(i=self.count) + "\n$$"
+
+    def _images(self) -> str:
+        return f"![Figure: {self._words(3, inline=False)}](img/figure{self.count % 10}.png)"
+
+
+def iter_document(size: int, mix: FeatureMix = MIXES["mixed"], seed: int = 0) -> Iterator[str]:
+    """Yields the document in blocks; stops once at least `size` bytes (UTF-8) were produced."""
+    header = "@title: Benchmark document\n@author: LittleTex\n@date: 2025-01-01\n\n"
+    writer = _BlockWriter(mix, seed)
+    produced = len(header)
+    yield header
+    while produced < size:
+        block = writer.next_block() + "\n\n"
+        produced += len(block)  # the generated text is ASCII, so characters are bytes
+        yield block
+
+
+def generate_document(size: int, mix: FeatureMix = MIXES["mixed"], seed: int = 0) -> str:
+    """The whole document as one string (see `iter_document`)."""
+    return "".join(iter_document(size, mix, seed))
+
+
+def write_document(out: TextIO, size: int, mix: FeatureMix = MIXES["mixed"], seed: int = 0) -> None:
+    """Streams the document to `out` without holding it in memory."""
+    for block in iter_document(size, mix, seed):
+        out.write(block)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="100KB", help="target size, e.g. 1KB, 10MB, 500MB")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            write_document(out, parse_size(args.size), MIXES[args.mix], args.seed)
+    else:
+        write_document(sys.stdout, parse_size(args.size), MIXES[args.mix], args.seed)
+
+
+if __name__ == "__main__":
+    main()
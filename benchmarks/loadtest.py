@@ -0,0 +1,358 @@
+"""
+End-to-end load test of the web app. Starts it locally (gunicorn, or the
+Flask server with --server flask) with a fake pdflatex on PATH (see
+benchmarks/fake_pdflatex.py), then drives concurrent users through it:
+.md and .zip uploads to /convert, polling the job, fetching the result
+page and every download, and JSON conversions on /api/convert.
+
+    python -m benchmarks.loadtest --concurrency 1,4,16 --duration 20 \\
+        --latency 0.5 --failure-rate 0.05 --mix md=2,zip=1,api=2
+
+For each concurrency level it reports throughput, latency percentiles per
+operation and error rates. "failed" counts conversions the app reported as
+failed (expected with --failure-rate); "errors" counts HTTP errors,
+timeouts and broken responses, which should stay at zero. --url points the
+users at an already running server instead.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks import fake_pdflatex
+from benchmarks.generator import MIXES, generate_document, parse_size
+from benchmarks.suite import PIXEL_PNG
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ("md", "zip", "api")
+DOWNLOAD_LINK = re.compile(r'href="(/(?:downloads|view)/[^"]+)"')
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of `values` (0 for no values)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def _multipart(fields: Dict[str, str], filename: str, content: bytes) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+               f'Content-Type: application/octet-stream\r\n\r\n'.encode())
+    body.write(content)
+    body.write(f"\r\n--{boundary}--\r\n".encode())
+    return body.getvalue(), f"multipart/form-data; boundary={boundary}"
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Recorder:
+    """Thread-safe collection of (operation, seconds, outcome) samples."""
+
+    def __init__(self):
+        self.samples: List[Tuple[str, float, str]] = []
+        self._lock = threading.Lock()
+
+    def add(self, operation: str, seconds: float, outcome: str = "ok") -> None:
+        with self._lock:
+            self.samples.append((operation, seconds, outcome))
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        operations: Dict[str, Dict[str, float]] = {}
+        for name in sorted({operation for operation, _, _ in self.samples}):
+            rows = [(seconds, outcome) for operation, seconds, outcome in self.samples if operation == name]
+            latencies = [seconds for seconds, outcome in rows if outcome == "ok"]
+            operations[name] = {
+                "count": len(rows),
+                "per_second": len(rows) / elapsed if elapsed else 0.0,
+                "failed": sum(outcome == "failed" for _, outcome in rows) / len(rows),
+                "errors": sum(outcome == "error" for _, outcome in rows) / len(rows),
+                "p50": percentile(latencies, 0.5),
+                "p90": percentile(latencies, 0.9),
+                "p99": percentile(latencies, 0.99),
+                "max": max(latencies, default=0.0),
+            }
+        return operations
+
+
+class User:
+    """One simulated client running scenarios back to back."""
+
+    def __init__(self, base_url: str, recorder: Recorder, documents: List[str], seed: int,
+                 html_only_rate: float, unique: bool, job_timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.documents = documents
+        self.random = random.Random(seed)
+        self.seed = seed
+        self.html_only_rate = html_only_rate
+        self.unique = unique
+        self.job_timeout = job_timeout
+        self.count = 0
+        self.opener = urllib.request.build_opener(_NoRedirect)
+
+    def _request(self, operation: str, path: str, data: Optional[bytes] = None,
+                 headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        """Timed HTTP request; HTTP errors are recorded and returned, connection problems raise."""
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers or {})
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        except OSError:
+            self.recorder.add(operation, time.perf_counter() - start, "error")
+            raise
+        self.recorder.add(operation, time.perf_counter() - start, "ok" if status < 400 else "error")
+        return status, body
+
+    def _document(self) -> str:
+        self.count += 1
+        markdown = self.random.choice(self.documents)
+        if self.unique:
+            # Different bytes for every upload, so the result cache does not answer for the pipeline.
+            markdown += f"\nUpload {self.seed}-{self.count}-{uuid.uuid4().hex[:8]}.\n"
+        return markdown
+
+    def _zip(self, markdown: str) -> bytes:
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("paper/main.md", markdown)
+            for index in range(10):
+                archive.writestr(f"paper/img/figure{index}.png", PIXEL_PNG)
+            archive.writestr("paper/unused/notes.txt", "not referenced, never extracted\n")
+        return buffer.getvalue()
+
+    def run(self, scenario: str) -> None:
+        try:
+            if scenario == "api":
+                self._api()
+            else:
+                self._upload(scenario)
+        except OSError:
+            pass  # already recorded as an error by _request
+
+    def _api(self) -> None:
+        payload = json.dumps({"markdown": self._document(), "html": self.random.random() < 0.5}).encode()
+        status, body = self._request("api_convert", "/api/convert", payload, {"Content-Type": "application/json"})
+        if status == 200 and "latex" not in json.loads(body):
+            self.recorder.add("api_convert", 0.0, "error")
+
+    def _upload(self, kind: str) -> None:
+        markdown = self._document()
+        html_only = self.random.random() < self.html_only_rate
+        content = self._zip(markdown) if kind == "zip" else markdown.encode("utf-8")
+        fields = {"html_only": "1"} if html_only else {}
+        body, content_type = _multipart(fields, f"doc.{kind}", content)
+
+        start = time.perf_counter()
+        status, response = self._request(f"upload_{kind}", "/convert", body,
+                                         {"Content-Type": content_type, "Accept": "application/json"})
+        conversion = f"convert_{kind}_{'html' if html_only else 'pdf'}"
+        if status != 202:
+            self.recorder.add(conversion, time.perf_counter() - start, "error")
+            return
+        job = json.loads(response)
+        while job["status"] not in ("done", "failed"):
+            if time.perf_counter() - start > self.job_timeout:
+                self.recorder.add(conversion, time.perf_counter() - start, "error")
+                return
+            time.sleep(0.05)
+            status, response = self._request("job_status", job["status_url"])
+            if status != 200:
+                self.recorder.add(conversion, time.perf_counter() - start, "error")
+                return
+            job = json.loads(response)
+        self.recorder.add(conversion, time.perf_counter() - start, "ok" if job["status"] == "done" else "failed")
+        if job["status"] != "done":
+            return
+
+        if html_only:
+            self._request("download", job["result_url"])
+            return
+        status, page = self._request("result_page", job["result_url"])
+        for link in DOWNLOAD_LINK.findall(page.decode("utf-8", "replace")):
+            self._request("download", link)
+
+
+class AppServer:
+    """The web app in a child process, with the fake pdflatex first on its PATH and private temp dirs."""
+
+    def __init__(self, workdir: Path, server: str = "gunicorn", workers: int = 2, job_workers: int = 2,
+                 latency: float = 0.5, jitter: float = 0.0, failure_rate: float = 0.0):
+        self.workdir = workdir
+        self.server = server
+        self.workers = workers
+        self.port = self._free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        bin_dir = workdir / "bin"
+        fake_pdflatex.install(bin_dir)
+        (workdir / "tmp").mkdir(exist_ok=True)
+        self.env = dict(os.environ,
+                        PATH=f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+                        TMPDIR=str(workdir / "tmp"),  # sessions, result cache and metrics
+                        PYTHONPATH=str(ROOT),
+                        LITTLETEX_JOB_WORKERS=str(job_workers),
+                        FAKE_PDFLATEX_LATENCY=str(latency),
+                        FAKE_PDFLATEX_JITTER=str(jitter),
+                        FAKE_PDFLATEX_FAILURE_RATE=str(failure_rate))
+        self.process: Optional[subprocess.Popen] = None
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def start(self, timeout: float = 60) -> None:
+        if self.server == "gunicorn":
+            command = [sys.executable, "-m", "gunicorn", "-c", str(ROOT / "web" / "gunicorn.conf.py"),
+                       "--bind", f"127.0.0.1:{self.port}", "--workers", str(self.workers),
+                       "--timeout", "300", "web.app:app"]
+        else:
+            command = [sys.executable, "-c",
+                       f"from web.app import app; app.run(port={self.port}, threaded=True)"]
+        self.log = open(self.workdir / "server.log", "wb")
+        self.process = subprocess.Popen(command, cwd=ROOT, env=self.env, stdout=self.log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"The server exited; see {self.workdir / 'server.log'}")
+            try:
+                with urllib.request.urlopen(self.url + "/", timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"The server did not come up within {timeout} s")
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.process is not None:
+            self.log.close()
+
+
+def run_level(base_url: str, concurrency: int, duration: float, weights: Dict[str, float],
+              documents: List[str], seed: int = 0, html_only_rate: float = 0.3,
+              unique: bool = True, job_timeout: float = 120) -> Dict[str, object]:
+    """Runs `concurrency` users for `duration` seconds and summarises what they saw."""
+    recorder = Recorder()
+    scenarios = [name for name in SCENARIOS if weights.get(name)]
+    deadline = time.monotonic() + duration
+
+    def user_loop(index: int) -> int:
+        user = User(base_url, recorder, documents, seed * 1000 + index, html_only_rate, unique, job_timeout)
+        done = 0
+        while time.monotonic() < deadline:
+            user.run(user.random.choices(scenarios, [weights[name] for name in scenarios])[0])
+            done += 1
+        return done
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        scenarios_run = sum(pool.map(user_loop, range(concurrency)))
+    elapsed = time.monotonic() - start
+    return {"concurrency": concurrency, "seconds": elapsed, "scenarios": scenarios_run,
+            "scenarios_per_second": scenarios_run / elapsed, "operations": recorder.summary(elapsed)}
+
+
+def _print_level(level: Dict[str, object]) -> None:
+    print(f"\n== {level['concurrency']} concurrent users: {level['scenarios']} scenarios in "
+          f"{level['seconds']:.1f} s ({level['scenarios_per_second']:.2f}/s)")
+    print(f"{'operation':<22}{'count':>7}{'/s':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'failed':>8}{'errors':>8}")
+    for name, stats in level["operations"].items():
+        print(f"{name:<22}{stats['count']:>7}{stats['per_second']:>8.2f}"
+              + "".join(f"{stats[key] * 1000:>9.0f}" for key in ("p50", "p90", "p99", "max"))
+              + f"{stats['failed']:>8.1%}{stats['errors']:>8.1%}")
+
+
+def _parse_weights(text: str) -> Dict[str, float]:
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated numbers of concurrent users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per concurrency level")
+    parser.add_argument("--mix", type=_parse_weights, default="md=2,zip=1,api=2", help="scenario weights")
+    parser.add_argument("--doc-size", default="20KB", help="size of the generated documents")
+    parser.add_argument("--doc-mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--html-only-rate", type=float, default=0.3, help="share of uploads that skip the PDF")
+    parser.add_argument("--same-upload", action="store_true",
+                        help="send identical uploads, so repeats are served by the result cache")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake pdflatex seconds per pass")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per pass")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="chance that a fake pdflatex pass fails")
+    parser.add_argument("--server", choices=("gunicorn", "flask"), default="gunicorn")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--job-workers", type=int, default=2, help="conversion threads per worker process")
+    parser.add_argument("--url", help="test an already running server instead of starting one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    documents = [generate_document(parse_size(args.doc_size), MIXES[args.doc_mix], seed)
+                 for seed in range(args.seed, args.seed + 8)]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="littletex-load-") as tmp:
+        server = None
+        if not args.url:
+            server = AppServer(Path(tmp), args.server, args.workers, args.job_workers,
+                               args.latency, args.jitter, args.failure_rate)
+            print(f"Starting {args.server} on {server.url} (fake pdflatex: {args.latency} s/pass, "
+                  f"{args.failure_rate:.0%} failures)...")
+            server.start()
+        try:
+            for concurrency in levels:
+                level = run_level(args.url or server.url, concurrency, args.duration, args.mix, documents,
+                                  args.seed, args.html_only_rate, not args.same_upload)
+                _print_level(level)
+                results.append(level)
+        finally:
+            if server is not None:
+                server.stop()
+    if args.json:
+        args.json.write_text(json.dumps({"settings": {key: str(value) for key, value in vars(args).items()},
+                                         "levels": results}, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
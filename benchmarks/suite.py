@@ -0,0 +1,190 @@
+"""
+Throughput and peak memory of the conversion steps on generated documents
+(see benchmarks/generator.py), with JSON baselines to catch regressions.
+
+    python -m benchmarks.suite --sizes 1KB,1MB,10MB --save baseline.json
+    python -m benchmarks.suite --sizes 1KB,1MB,10MB --compare baseline.json --threshold 0.2
+
+With --compare the run exits with status 1 when a step got slower (or its
+peak memory grew) by more than the threshold. Timings are only comparable
+on the same machine, so keep baselines local or per CI runner.
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.generator import MIXES, FeatureMix, generate_document, parse_size
+from src.core.parser import Parser
+from src.core.renderer import LatexRenderer
+from src.core.tokenizer import Tokenizer
+from src.pipeline.builder import PipelineBuilder
+from src.pipeline.config import PipelineConfig
+from src.utils.highlight import HighlightCache
+
+STEPS = ("tokenize", "parse", "render", "pipeline")
+BASELINE_VERSION = 1
+# A 1x1 transparent PNG, so image references in generated documents resolve.
+PIXEL_PNG = bytes.fromhex("89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+                          "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082")
+
+
+def _best_time(func: Callable[[], object], repeat: int, min_seconds: float = 0.05) -> float:
+    """Best seconds per call, looping tiny workloads like `timeit` so timer noise does not dominate."""
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+    number = max(1, int(min_seconds / first)) if first > 0 else 1000
+    best = first
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def _peak_memory(func: Callable[[], object]) -> int:
+    """Peak bytes allocated by Python while `func` runs (on top of what was already allocated)."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class _Workload:
+    """One generated document and the prepared input of every step."""
+
+    def __init__(self, markdown: str, workdir: Path):
+        self.markdown = markdown
+        self.size = len(markdown.encode("utf-8"))
+        self.tokens = Tokenizer().tokenize(markdown)
+        self.document = Parser().parse(self.tokens)
+        self.renderer = LatexRenderer(highlighter=HighlightCache(use_disk=False))
+
+        self.input_path = workdir / "bench.md"
+        self.input_path.write_text(markdown, encoding="utf-8")
+        (workdir / "img").mkdir(exist_ok=True)
+        for index in range(10):
+            (workdir / "img" / f"figure{index}.png").write_bytes(PIXEL_PNG)
+        self.config = PipelineConfig(self.input_path, workdir / "out" / "bench.tex")
+
+    def run(self, step: str) -> object:
+        if step == "tokenize":
+            return Tokenizer().tokenize(self.markdown)
+        if step == "parse":
+            return Parser().parse(self.tokens)
+        if step == "render":
+            return self.renderer.render(self.document, {})
+        with contextlib.redirect_stdout(io.StringIO()):
+            return PipelineBuilder(self.config).add_core_stages().build().execute()
+
+
+def run_suite(sizes: List[int], mix_name: str = "mixed", steps=STEPS, repeat: int = 3,
+              measure_memory: bool = True, seed: int = 0,
+              log: Callable[[str], None] = print) -> Dict[str, Dict[str, float]]:
+    """Runs every step on a document of each size; results are keyed '<mix>/<size>/<step>'."""
+    mix: FeatureMix = MIXES[mix_name]
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            workload = _Workload(generate_document(size, mix, seed), Path(tmp))
+            for step in steps:
+                seconds = _best_time(lambda: workload.run(step), repeat)
+                result = {"bytes": workload.size, "seconds": seconds,
+                          "mb_per_s": workload.size / seconds / 1024 ** 2}
+                if measure_memory:
+                    result["peak_mb"] = _peak_memory(lambda: workload.run(step)) / 1024 ** 2
+                key = f"{mix_name}/{size}/{step}"
+                results[key] = result
+                memory = f", peak {result['peak_mb']:9.2f} MB" if measure_memory else ""
+                log(f"{key:<28} {seconds * 1000:10.2f} ms {result['mb_per_s']:9.2f} MB/s{memory}")
+    return results
+
+
+def save_baseline(path: Path, results: Dict[str, Dict[str, float]]) -> None:
+    data = {
+        "version": BASELINE_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": results,
+    }
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def load_baseline(path: Path) -> Dict[str, Dict[str, float]]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data.get("version") != BASELINE_VERSION:
+        raise ValueError(f"{path} is a version {data.get('version')} baseline; expected {BASELINE_VERSION}.")
+    return data["results"]
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float, memory_threshold: Optional[float] = None) -> List[str]:
+    """Regressions of `results` against `baseline`, as messages; steps missing from either side are skipped."""
+    memory_threshold = threshold if memory_threshold is None else memory_threshold
+    regressions = []
+    for key, current in sorted(results.items()):
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        slowdown = current["seconds"] / previous["seconds"] - 1
+        if slowdown > threshold:
+            regressions.append(f"{key}: {slowdown:+.0%} time ({previous['seconds'] * 1000:.2f} ms -> "
+                               f"{current['seconds'] * 1000:.2f} ms)")
+        if "peak_mb" in current and previous.get("peak_mb"):
+            growth = current["peak_mb"] / previous["peak_mb"] - 1
+            if growth > memory_threshold:
+                regressions.append(f"{key}: {growth:+.0%} peak memory ({previous['peak_mb']:.1f} MB -> "
+                                   f"{current['peak_mb']:.1f} MB)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1KB,100KB,1MB,10MB",
+                        help="comma-separated document sizes, up to e.g. 500MB")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--steps", default=",".join(STEPS), help=f"subset of {','.join(STEPS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per step (best is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the (slower) peak memory runs")
+    parser.add_argument("--save", type=Path, help="write the results to this JSON baseline")
+    parser.add_argument("--compare", type=Path, help="fail on regressions against this JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("--memory-threshold", type=float, help="allowed peak memory growth (default: --threshold)")
+    args = parser.parse_args()
+
+    steps = [step.strip() for step in args.steps.split(",") if step.strip()]
+    unknown = set(steps) - set(STEPS)
+    if unknown:
+        parser.error(f"unknown steps: {', '.join(sorted(unknown))}")
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+
+    results = run_suite(sizes, args.mix, steps, args.repeat, not args.no_memory, args.seed)
+    if args.save:
+        save_baseline(args.save, results)
+        print(f"Baseline written to {args.save}")
+    if args.compare:
+        regressions = compare(results, load_baseline(args.compare), args.threshold, args.memory_threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,78 @@
 import argparse
 from pathlib import Path
+from typing import List, Optional
+from src.core.spill import DEFAULT_SPILL_THRESHOLD
 from src.pipeline.config import PipelineConfig
+from src.utils.image_optimizer import DEFAULT_DPI
+from src.utils.pdf_generator import CompileLimits
 
 
 class ArgumentParser:
     """Handles command line argument parsing."""
     
     @staticmethod
-    def parse_args() -> PipelineConfig:
-        """Parse command line arguments and return configuration."""
-        parser = argparse.ArgumentParser(description="Converts Markdown to LaTeX.")
+    def parse_args(argv: Optional[List[str]] = None, cwd: Optional[str] = None) -> PipelineConfig:
+        """
+        Parse command line arguments (default: sys.argv) and return configuration.
+        Relative paths are taken relative to `cwd` when given (the daemon runs
+        on behalf of clients in other directories).
+        """
+        parser = argparse.ArgumentParser(prog="littletex", description="Converts Markdown to LaTeX.",
+                                         epilog="Run 'littletex serve' to keep a warm conversion daemon; "
+                                                "later commands use it automatically.")
         parser.add_argument("input_file", help="Path to the input Markdown file.")
         parser.add_argument("output_file", help="Path to the output LaTeX file.")
         parser.add_argument("--pdf", action="store_true", help="Generate PDF from LaTeX.")
+        parser.add_argument("--concurrent", action="store_true", help="Run independent pipeline stages concurrently.")
+        parser.add_argument("--pass-timeout", type=float, help="Maximum seconds for a single pdflatex pass.")
+        parser.add_argument("--timeout", type=float, help="Maximum seconds for the whole PDF compilation.")
+        parser.add_argument("--memory-limit", type=int, help="Memory limit for pdflatex in MB.")
+        parser.add_argument("--cpu-limit", type=int, help="CPU time limit for pdflatex in seconds.")
+        parser.add_argument("--isolated", action="store_true", help="Compile the PDF in a private scratch directory.")
+        parser.add_argument("--keep-log", action="store_true", help="Keep the pdflatex log next to the PDF.")
+        parser.add_argument("--optimize-images", action="store_true", help="Downsample and convert images before compiling (requires Pillow).")
+        parser.add_argument("--image-dpi", type=int, default=DEFAULT_DPI, help="Target DPI for optimized images.")
+        parser.add_argument("--depfile", action="store_true", help="Write a Make-compatible .d dependency file.")
+        parser.add_argument("--depfile-path", help="Path of the dependency file (default: next to the .tex file).")
+        parser.add_argument("--split", action="store_true", help="Write one .tex file per top-level section, joined with \\include.")
+        parser.add_argument("--python-toc", action="store_true", help="Build the table of contents in Python so the PDF compiles in a single pass.")
+        parser.add_argument("--html", action="store_true", help="Also write a standalone HTML preview (no pdflatex needed).")
+        parser.add_argument("--pygments", action="store_true", help="Highlight code blocks with Pygments instead of the listings package (faster pdflatex runs).")
+        parser.add_argument("--preview", action="store_true", help="Compile one draft PDF per top-level section, in parallel.")
+        parser.add_argument("--preview-workers", type=int, help="Number of concurrent preview compiles.")
+        parser.add_argument("--only", action="append", metavar="SECTION", help="With --split: compile only this section (number, name or heading). Repeatable.")
+        parser.add_argument("--spill-threshold", type=int, default=DEFAULT_SPILL_THRESHOLD // 1024, metavar="KB",
+                            help="Write code and table blocks larger than this to side files read by pdflatex (0: never).")
+        parser.add_argument("--no-daemon", action="store_true", help="Convert in this process even if a LittleTex daemon is running.")
+        parser.add_argument("--socket", help="Socket of the LittleTex daemon to use (default: $LITTLETEX_SOCKET or a per-user path).")
         
-        args = parser.parse_args()
+        args = parser.parse_args(argv)
+        base = Path(cwd) if cwd else Path()
         
         return PipelineConfig(
-            input_path=Path(args.input_file),
-            output_path=Path(args.output_file),
-            generate_pdf=args.pdf  
+            input_path=base / args.input_file,
+            output_path=base / args.output_file,
+            generate_pdf=args.pdf,
+            concurrent=args.concurrent,
+            compile_limits=CompileLimits(
+                pass_timeout=args.pass_timeout,
+                total_timeout=args.timeout,
+                memory_limit_mb=args.memory_limit,
+                cpu_time_limit=args.cpu_limit,
+            ),
+            isolated_build=args.isolated,
+            keep_log=args.keep_log,
+            optimize_images=args.optimize_images,
+            image_dpi=args.image_dpi,
+            depfile=args.depfile or args.depfile_path is not None,
+            depfile_path=base / args.depfile_path if args.depfile_path else None,
+            split_sections=args.split or bool(args.only),
+            only_sections=args.only,
+            preview=args.preview,
+            preview_workers=args.preview_workers,
+            toc_mode="python" if args.python_toc else "latex",
+            code_mode="pygments" if args.pygments else "listings",
+            html=args.html,
+            spill_threshold=args.spill_threshold * 1024 or None,
+            working_dir=Path(cwd) if cwd else None,
         )
\ No newline at end of file
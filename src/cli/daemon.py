@@ -0,0 +1,370 @@
+"""
+Long-lived conversion daemon on a local Unix socket, and the thin client
+the littletex command uses to reach it.
+
+Protocol: each message is a 4-byte big-endian length followed by that many
+bytes of UTF-8 JSON. A connection carries any number of request/response
+pairs. Requests:
+
+    {"op": "ping"}
+    {"op": "run", "argv": [...], "cwd": "/abs/dir"}   -> {"ok": true, "exit_code", "stdout", "stderr"}
+    {"op": "convert", "markdown": "...", "toc_mode", "code_mode", "html"}
+                                                      -> {"ok": true, "result": {...}}
+
+Failed requests answer {"ok": false, "error": ..., "kind": ...}.
+"""
+
+import argparse
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+PROTOCOL_VERSION = 1
+MAX_FRAME_BYTES = 256 * 1024 * 1024
+_HEADER = struct.Struct(">I")
+
+# Runs one command-line conversion (argv without the program name, the client's
+# working directory) and returns its exit status.
+RunCallback = Callable[[List[str], str], int]
+
+
+class ProtocolError(Exception):
+    """The peer sent something that is not a valid frame."""
+
+
+def default_socket_path() -> Path:
+    """$LITTLETEX_SOCKET, else a per-user socket in the runtime or temp directory."""
+    if os.getenv("LITTLETEX_SOCKET"):
+        return Path(os.environ["LITTLETEX_SOCKET"])
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "littletex.sock"
+    return Path(tempfile.gettempdir()) / f"littletex-{os.getuid()}.sock"
+
+
+def send_frame(sock: socket.socket, message: Dict[str, object]) -> None:
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1024 * 1024))
+        if not chunk:
+            if remaining == size:
+                return None  # clean end of stream between frames
+            raise ProtocolError("Connection closed in the middle of a frame.")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock: socket.socket) -> Optional[Dict[str, object]]:
+    """The next message, or None when the peer closed the connection."""
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_FRAME_BYTES:
+        raise ProtocolError(f"Frame of {size} bytes exceeds the {MAX_FRAME_BYTES} byte limit.")
+    data = _recv_exactly(sock, size) if size else b""
+    if data is None:
+        raise ProtocolError("Connection closed after a frame header.")
+    try:
+        message = json.loads(data.decode("utf-8"))
+    except ValueError as e:
+        raise ProtocolError(f"Frame is not UTF-8 JSON: {e}") from e
+    if not isinstance(message, dict):
+        raise ProtocolError("Frame is not a JSON object.")
+    return message
+
+
+class _ThreadOutput(io.TextIOBase):
+    """
+    Stands in for sys.stdout/sys.stderr in the daemon: text written by a
+    thread that is capturing goes to that thread's buffer (and back to its
+    client), everything else to the real stream. Threads a conversion starts
+    itself (e.g. preview compiles) write to the daemon's own output.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self.local, "buffer", None)
+        return (self.stream if buffer is None else buffer).write(text)
+
+    def flush(self) -> None:
+        if getattr(self.local, "buffer", None) is None:
+            self.stream.flush()
+
+    def start_capture(self) -> None:
+        self.local.buffer = io.StringIO()
+
+    def stop_capture(self) -> str:
+        buffer, self.local.buffer = self.local.buffer, None
+        return buffer.getvalue()
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        daemon: "ConversionDaemon" = self.server.conversion_daemon
+        while True:
+            try:
+                request = recv_frame(self.request)
+            except ProtocolError as e:
+                send_frame(self.request, {"ok": False, "error": str(e), "kind": "ProtocolError"})
+                return
+            except OSError:
+                return
+            if request is None:
+                return
+            try:
+                send_frame(self.request, daemon.handle(request))
+            except OSError:
+                return  # the client went away; the conversion itself has finished
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ConversionDaemon:
+    """
+    Serves conversions over a Unix socket, one thread per connection. The
+    process keeps the tokenizer, parser, renderers and their caches warm
+    between requests. `run` performs a command-line conversion (see
+    src.main.convert); the socket is only accessible to the current user.
+    """
+
+    def __init__(self, socket_path: Path, run: RunCallback):
+        self.socket_path = Path(socket_path)
+        self.run = run
+        self.stdout = _ThreadOutput(sys.stdout)
+        self.stderr = _ThreadOutput(sys.stderr)
+        self._output_lock = threading.Lock()
+        self.server: Optional[_Server] = None
+
+    def _install_output(self) -> None:
+        """Puts the capturing streams in place (again, if someone replaced sys.stdout/stderr since)."""
+        with self._output_lock:
+            if sys.stdout is not self.stdout:
+                self.stdout.stream, sys.stdout = sys.stdout, self.stdout
+            if sys.stderr is not self.stderr:
+                self.stderr.stream, sys.stderr = sys.stderr, self.stderr
+
+    def _restore_output(self) -> None:
+        with self._output_lock:
+            if sys.stdout is self.stdout:
+                sys.stdout = self.stdout.stream
+            if sys.stderr is self.stderr:
+                sys.stderr = self.stderr.stream
+
+    def handle(self, request: Dict[str, object]) -> Dict[str, object]:
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(), "version": PROTOCOL_VERSION}
+        if op == "run":
+            return self._run(request)
+        if op == "convert":
+            return self._convert(request)
+        return {"ok": False, "error": f"Unknown operation {op!r}.", "kind": "ProtocolError"}
+
+    def _run(self, request: Dict[str, object]) -> Dict[str, object]:
+        argv, cwd = request.get("argv"), request.get("cwd")
+        if not isinstance(argv, list) or not isinstance(cwd, str) or not os.path.isabs(cwd):
+            return {"ok": False, "error": '"run" needs an "argv" list and an absolute "cwd".',
+                    "kind": "ProtocolError"}
+        self._install_output()
+        self.stdout.start_capture()
+        self.stderr.start_capture()
+        try:
+            exit_code = self.run([str(arg) for arg in argv], cwd)
+        except SystemExit as e:  # argparse usage errors and --help
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception as e:
+            print(f"🚨 Unexpected error: {e}", file=sys.stderr)
+            exit_code = 1
+        finally:
+            stdout, stderr = self.stdout.stop_capture(), self.stderr.stop_capture()
+        return {"ok": True, "exit_code": exit_code, "stdout": stdout, "stderr": stderr}
+
+    def _convert(self, request: Dict[str, object]) -> Dict[str, object]:
+        # Imported here: the client side of this module must stay cheap to import.
+        from src.core.convert import convert_markdown
+        from src.core.errors import LittleTexError
+
+        if not isinstance(request.get("markdown"), str):
+            return {"ok": False, "error": '"convert" needs a "markdown" string.', "kind": "ProtocolError"}
+        try:
+            result = convert_markdown(
+                request["markdown"],
+                toc_mode="python" if request.get("toc_mode") == "python" else "latex",
+                code_mode="pygments" if request.get("code_mode") == "pygments" else "listings",
+                html=bool(request.get("html")),
+            )
+        except LittleTexError as e:
+            return {"ok": False, "error": str(e), "kind": type(e).__name__}
+        return {"ok": True, "result": result.to_dict()}
+
+    def bind(self) -> None:
+        """
+        Creates the socket, replacing a stale one of ours; fails if another
+        daemon is listening on it or the path is anything but our own socket.
+        """
+        try:
+            existing = self.socket_path.lstat()
+        except FileNotFoundError:
+            existing = None
+        if existing is not None:
+            if not stat.S_ISSOCK(existing.st_mode) or existing.st_uid != os.getuid():
+                raise RuntimeError(f"{self.socket_path} exists and is not a socket of yours; not replacing it.")
+            if ping(self.socket_path) is not None:
+                raise RuntimeError(f"A LittleTex daemon is already listening on {self.socket_path}.")
+            self.socket_path.unlink()
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        previous = os.umask(0o177)  # srw------- from the start, not after a chmod
+        try:
+            self.server = _Server(str(self.socket_path), _RequestHandler)
+        finally:
+            os.umask(previous)
+        self.server.conversion_daemon = self
+
+    def serve_forever(self) -> None:
+        try:
+            self.server.serve_forever()
+        finally:
+            self._restore_output()
+            self.close()
+
+    def shutdown(self) -> None:
+        """Stops serve_forever (from another thread)."""
+        self.server.shutdown()
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.server_close()
+            self.server = None
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class DaemonClient:
+    """A connection to a running daemon."""
+
+    def __init__(self, socket_path: Path, timeout: Optional[float] = None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(str(socket_path))
+        except OSError:
+            self.sock.close()
+            raise
+
+    def request(self, message: Dict[str, object]) -> Dict[str, object]:
+        send_frame(self.sock, message)
+        response = recv_frame(self.sock)
+        if response is None:
+            raise ProtocolError("The daemon closed the connection without answering.")
+        return response
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def __enter__(self) -> "DaemonClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def ping(socket_path: Path, timeout: float = 1.0) -> Optional[Dict[str, object]]:
+    """The daemon's ping answer, or None if nothing is listening on `socket_path`."""
+    try:
+        with DaemonClient(socket_path, timeout) as client:
+            return client.request({"op": "ping"})
+    except (OSError, ProtocolError):
+        return None
+
+
+def run_via_daemon(argv: List[str], socket_path: Optional[Path] = None) -> Optional[int]:
+    """
+    Runs a command-line conversion in the daemon, replaying its output here.
+    Returns the exit status, or None when no usable daemon is reachable (none
+    listening, one owned by another user or speaking another protocol
+    version) and the caller should convert in-process.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    socket_path = socket_path or default_socket_path()
+    try:
+        owner = socket_path.stat().st_uid
+    except FileNotFoundError:
+        return None
+    # Another user could have put a socket there (e.g. in a shared temp
+    # directory) to receive our documents and feed us their output.
+    if owner != os.getuid():
+        print(f"⚠️  {socket_path} belongs to another user; converting in-process.", file=sys.stderr)
+        return None
+    try:
+        with DaemonClient(socket_path) as client:
+            version = client.request({"op": "ping"}).get("version")
+            if version != PROTOCOL_VERSION:
+                print(f"⚠️  LittleTex daemon at {socket_path} speaks protocol {version}, not {PROTOCOL_VERSION}; "
+                      "restart it with `littletex serve`. Converting in-process.", file=sys.stderr)
+                return None
+            response = client.request({"op": "run", "argv": argv, "cwd": os.getcwd()})
+    except (OSError, ProtocolError) as e:
+        if not isinstance(e, (ConnectionRefusedError, FileNotFoundError)):
+            print(f"⚠️  LittleTex daemon at {socket_path} failed ({e}); converting in-process.", file=sys.stderr)
+        return None
+    if not response.get("ok"):
+        print(f"⚠️  LittleTex daemon rejected the request: {response.get('error')}", file=sys.stderr)
+        return None
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    return int(response["exit_code"])
+
+
+def serve_main(argv: List[str], run: RunCallback) -> int:
+    """`littletex serve`: runs the daemon in the foreground until SIGINT/SIGTERM."""
+    parser = argparse.ArgumentParser(prog="littletex serve",
+                                     description="Serve conversions from a warm process over a Unix socket.")
+    parser.add_argument("--socket", type=Path, default=None,
+                        help=f"Socket path (default: $LITTLETEX_SOCKET or {default_socket_path()}).")
+    parser.add_argument("--no-warm-up", action="store_true", help="Skip the start-up conversion that preloads everything.")
+    args = parser.parse_args(argv)
+
+    daemon = ConversionDaemon(args.socket or default_socket_path(), run)
+    try:
+        daemon.bind()
+    except (RuntimeError, OSError) as e:
+        print(f"🚨 {e}")
+        return 1
+    if not args.no_warm_up:
+        from src.core.convert import warm_up
+        warm_up()
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # stop like Ctrl-C
+    print(f"🚀 LittleTex daemon listening on {daemon.socket_path} (pid {os.getpid()})")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+    print("👋 LittleTex daemon stopped.")
+    return 0
@@ -9,28 +9,26 @@ class LittleTexApp:
     
     def __init__(self, config: PipelineConfig):
         self.config = config
+        self.stages = []
         
-    def run(self) -> None:
-        """Execute the conversion process."""
-        pipeline = (PipelineBuilder(self.config)
-                    .add_core_stages() 
-                    .add_pdf_stage_if_needed() 
-                    .build())
-        try:
-            result = pipeline.execute()
-            self._print_success_message(result)
-            return result
-        except Exception as e:
-            self._handle_error(e)
-            return None
+    def run(self) -> Optional[Path]:
+        """
+        Execute the conversion process. Failures are raised as
+        src.core.errors.LittleTexError subclasses (ParseError, RenderError,
+        AssetError, CompileError); turning them into exit codes is up to the caller.
+        """
+        builder = (PipelineBuilder(self.config)
+                   .add_core_stages()
+                   .add_pdf_stage_if_needed())
+        # Kept so callers can inspect what the stages did (e.g. which assets were copied).
+        self.stages = builder.stages
+        pipeline = builder.build_concurrent() if self.config.concurrent else builder.build()
+        result = pipeline.execute()
+        self._print_success_message(result)
+        return result
     
     def _print_success_message(self, result: Optional[Path]) -> None:
         """Print success message based on execution result."""
         print(f"✅ Successfully processed {self.config.input_path}")
         if self.config.generate_pdf and result:
             print(f"📤 Final PDF output written to {result}")
-    
-    def _handle_error(self, error: Exception) -> None:
-        """Handle execution errors."""
-        print(f"🚨 Error: {error}")
-        exit(1)
\ No newline at end of file
@@ -1,9 +1,11 @@
 # define the classes for AST nodes (structure of the document)
 
 # 1. define a template that all other AST nodes will be based on
-from typing import List
+from typing import List, Optional
 from abc import ABC, abstractmethod
 
+from .spill import SpilledBlock
+
 
 class Node(ABC):
     @abstractmethod
@@ -154,9 +156,10 @@ class ImageNode(Node):
 class CodeBlockNode(Node):
     """Represents a code block (```...```)."""
 
-    def __init__(self, content: str, language: str = "text"):
+    def __init__(self, content: str, language: str = "text", source: Optional[SpilledBlock] = None):
         self.content = content
         self.language = language
+        self.source = source  # set (and content left empty) when the body was spilled to a side file
 
     def accept(self, visitor):
         return visitor.visit_code_block(self)
@@ -199,10 +202,12 @@ class TableNode(Node):
         headers: List[str],
         rows: List[List[str]],
         caption: str = "",
+        source: Optional[SpilledBlock] = None,
     ):
         self.headers = headers
         self.rows = rows
         self.caption = caption
+        self.source = source  # set (headers, rows and caption left empty) when the body was spilled
 
     def accept(self, visitor):
         return visitor.visit_table(self)
@@ -219,4 +224,37 @@ class TocNode(Node):
     """Represents a table of contents command (@toc)."""
 
     def accept(self, visitor):
-        return visitor.visit_toc(self)
\ No newline at end of file
+        return visitor.visit_toc(self)
+
+
+class IncludeNode(Node):
+    """Represents an @include: directive; children hold the included document once resolved."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.children: List[Node] = []
+
+    def accept(self, visitor):
+        return visitor.visit_include(self)
+
+
+class CitationNode(Node):
+    """Represents an inline citation (@cite[key1, key2])."""
+
+    def __init__(self, keys: List[str]):
+        self.keys = keys
+        self.labels: List[str] = []  # one per key, filled in when the bibliography is resolved
+
+    def accept(self, visitor):
+        return visitor.visit_citation(self)
+
+
+class BibliographyNode(Node):
+    """Represents the formatted reference list; entries are (label, BibEntry) pairs."""
+
+    def __init__(self, title: str, entries: list):
+        self.title = title
+        self.entries = entries
+
+    def accept(self, visitor):
+        return visitor.visit_bibliography(self)
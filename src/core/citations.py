@@ -0,0 +1,134 @@
+"""Numbering and formatting of @cite[...] references against a parsed bibliography."""
+
+import html
+import re
+from typing import Dict, Iterator, List
+
+from . import ast
+from .links import is_safe_link
+from src.utils.bibtex import BibEntry
+
+UNKNOWN_LABEL = "?"
+# Entry types whose title is the whole work (set in italics) rather than a part of a venue.
+WHOLE_WORK_TYPES = ("book", "phdthesis", "mastersthesis", "manual")
+TEX_FONT_COMMAND = re.compile(r"\\(?:emph|textit|textbf|textsc|textrm|texttt)\s*(?=\{)")
+TEX_ESCAPED_CHAR = re.compile(r"\\([&%$#_{}])")
+TEX_COMMAND = re.compile(r"\\([A-Za-z]+)\s*")
+
+
+def iter_citations(node: ast.Node) -> Iterator[ast.CitationNode]:
+    """Yields every CitationNode in the tree, in document order."""
+    if isinstance(node, ast.CitationNode):
+        yield node
+        return
+    for child in getattr(node, "children", []):
+        yield from iter_citations(child)
+    for item in getattr(node, "items", []):
+        yield from iter_citations(item)
+
+
+def resolve_citations(document: ast.DocumentNode, entries: Dict[str, BibEntry],
+                      title: str = "References") -> List[str]:
+    """
+    Numbers the cited entries in order of first citation, fills in the
+    labels of every CitationNode and appends a BibliographyNode listing the
+    cited entries. Returns the keys that are not in the bibliography; their
+    citations are labelled '?'.
+    """
+    labels: Dict[str, str] = {}
+    cited: List[tuple] = []
+    missing: List[str] = []
+    for citation in iter_citations(document):
+        citation.labels = []
+        for key in citation.keys:
+            if key not in labels:
+                if key in entries:
+                    labels[key] = str(len(cited) + 1)
+                    cited.append((labels[key], entries[key]))
+                else:
+                    labels[key] = UNKNOWN_LABEL
+                    missing.append(key)
+            citation.labels.append(labels[key])
+    if cited:
+        document.children.append(ast.BibliographyNode(title, cited))
+    return missing
+
+
+def _format_authors(names: str) -> str:
+    """'Knuth, Donald E. and Lamport, Leslie' -> 'Donald E. Knuth and Leslie Lamport'."""
+    authors = []
+    for name in names.split(" and "):
+        last, _, first = name.partition(",")
+        authors.append(f"{first.strip()} {last.strip()}".strip())
+    if len(authors) <= 2:
+        return " and ".join(authors)
+    return ", ".join(authors[:-1]) + ", and " + authors[-1]
+
+
+def tex_to_html(text: str) -> str:
+    """Turns the bits of TeX found in .bib values ({Braces}, --, ~, \\&, \\LaTeX) into HTML text."""
+    text = TEX_FONT_COMMAND.sub("", text)
+    text = TEX_ESCAPED_CHAR.sub(r"\1", text)
+    text = TEX_COMMAND.sub(r"\1", text)
+    text = html.escape(text.replace("{", "").replace("}", ""), quote=False)
+    return text.replace("---", "\u2014").replace("--", "\u2013").replace("~", "\u00a0")
+
+
+def format_reference(entry: BibEntry, markup: str = "latex") -> str:
+    """Formats a bibliography entry as a reference-list item (plain style) in LaTeX or HTML."""
+    if markup == "html":
+        def field(name: str) -> str:
+            return tex_to_html(entry.get(name))
+
+        def emph(text: str) -> str:
+            return f"<em>{text}</em>"
+
+        def link(url: str, text: str) -> str:
+            if not is_safe_link(url):
+                return html.escape(text)
+            return f'<a href="{html.escape(url)}">{html.escape(text)}</a>'
+        nbsp, en_dash = "\u00a0", "\u2013"
+    else:
+        field = entry.get
+
+        def emph(text: str) -> str:
+            return f"\\emph{{{text}}}"
+
+        def link(url: str, text: str) -> str:
+            return f"\\url{{{url}}}" if url == text else f"\\href{{{url}}}{{{text}}}"
+        nbsp, en_dash = "~", "--"
+
+    parts = []
+    names = field("author") or field("editor")
+    if names:
+        parts.append(_format_authors(names) + ("" if field("author") else f"{nbsp}(ed.)"))
+    title = field("title")
+    if entry.entry_type in WHOLE_WORK_TYPES:
+        if title:
+            parts.append(emph(title))
+        venue = [field("publisher") or field("school") or field("organization")]
+    else:
+        if title:
+            parts.append(title)
+        volume = field("volume")
+        if volume and field("number"):
+            volume = f"{volume}({field('number')})"
+        pages = re.sub(r"\s*(?:-+|\u2013)\s*", en_dash, entry.get("pages"))
+        container = field("journal") or field("booktitle")
+        venue = [
+            emph(container) if container else "",
+            volume,
+            f"pp.{nbsp}{pages}" if pages else "",
+            field("publisher") or field("institution") or field("howpublished"),
+        ]
+    venue.append(field("year"))
+    venue_text = ", ".join(part for part in venue if part)
+    if venue_text:
+        parts.append(venue_text)
+    text = ". ".join(part.rstrip(".") for part in parts) + "."
+    doi, url = entry.get("doi"), entry.get("url")
+    if doi:
+        text += " " + link(f"https://doi.org/{doi}", f"doi:{doi}")
+    elif url:
+        text += " " + link(url, url)
+    return text
@@ -0,0 +1,140 @@
+"""In-memory conversion API: Markdown string in, LaTeX string out, no file system access."""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Union
+
+from .citations import resolve_citations
+from .errors import ParseError, RenderError, wrap_errors
+from .html_renderer import HtmlRenderer
+from .includes import PARSE_CACHE, MemoryIncludeResolver
+from .renderer import shared_renderer
+from src.utils.asset_sync import plan_asset_names
+from src.utils.bibtex import BibParseError, parse_bibliography
+from src.utils.highlight import HighlightCache
+from src.utils.pdf_generator import TimingCallback
+from src.utils.text_processing import extract_metadata
+
+# The shared highlight cache is backed by files; conversions here stay in memory.
+MEMORY_HIGHLIGHT_CACHE = HighlightCache(use_disk=False)
+# Renderers keep their per-document state on a copy, so one instance serves every thread
+# (LaTeX renderers are shared per set of options, see shared_renderer()).
+HTML_RENDERER = HtmlRenderer()
+
+# Touches the lazily built parts of a conversion: the AsciiMath grammar,
+# Pygments lexers and formatter, and the tokenizer and parser regexes.
+WARM_UP_DOCUMENT = """@title: Warm-up
+@math_mode: asciimath
+@code_highlight: pygments
+
+# Section
+
+Some **bold**, *italic*, `code`, [a link](https://example.com) and $sum_(i=1)^n i$.
+
+$$
+int_0^1 x^2 dx
+$$
+
+```python
+def f(x):
+    return x
+```
+
+::: table
+caption: Values
+| A | B |
+|---|---|
+| 1 | 2 |
+:::
+
+- item
+  1. nested
+"""
+
+
+@contextmanager
+def _timed(name: str, on_timing: Optional[TimingCallback]) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if on_timing is not None:
+            on_timing(name, time.perf_counter() - start)
+
+
+class ConversionResult:
+    """The output of `convert_markdown`."""
+
+    def __init__(self, latex: str, metadata: Dict[str, str], asset_names: Dict[str, str],
+                 warnings: List[str], html: Optional[str] = None):
+        self.latex = latex
+        self.metadata = metadata
+        self.asset_names = asset_names  # image url -> file name the .tex expects next to it
+        self.warnings = warnings
+        self.html = html
+
+    def to_dict(self) -> Dict[str, object]:
+        result = {
+            "latex": self.latex,
+            "metadata": self.metadata,
+            "assets": self.asset_names,
+            "warnings": self.warnings,
+        }
+        if self.html is not None:
+            result["html"] = self.html
+        return result
+
+
+def convert_markdown(markdown: str, assets: Optional[Dict[str, Union[str, bytes]]] = None,
+                     toc_mode: str = "latex", code_mode: str = "listings",
+                     html: bool = False, on_timing: Optional[TimingCallback] = None) -> ConversionResult:
+    """
+    Converts a Markdown document to LaTeX without reading or writing files.
+    `assets` maps relative paths to file contents; it supplies @include:d
+    documents, the @bibliography: file and, optionally, the images (which are
+    only checked for presence). Problems that the CLI reports as warnings are
+    returned in `warnings` instead of being printed; failures raise ParseError
+    or RenderError. `on_timing` receives the duration of the "parse" and
+    "render" steps, like the pipeline stages report theirs.
+    """
+    assets = assets or {}
+    warnings: List[str] = []
+    with _timed("parse", on_timing), wrap_errors(ParseError, "parse"):
+        metadata, body = extract_metadata(markdown)
+        document = PARSE_CACHE.parse(body)
+        MemoryIncludeResolver(assets).resolve(document)
+
+    entries = {}
+    bib_name = metadata.get("bibliography")
+    if bib_name:
+        content = assets.get(bib_name)
+        if content is None:
+            warnings.append(f"Bibliography file not provided: {bib_name}")
+        else:
+            try:
+                text = content.decode("utf-8") if isinstance(content, bytes) else content
+                entries = parse_bibliography(text, use_disk_cache=False)
+            except (BibParseError, UnicodeDecodeError) as e:
+                warnings.append(f"Could not read bibliography {bib_name}: {e}")
+    missing = resolve_citations(document, entries, metadata.get("bibliography_title", "References"))
+    if missing:
+        warnings.append(f"Unknown citation keys: {', '.join(missing)}")
+
+    asset_names = plan_asset_names(document)
+    if assets:
+        warnings.extend(f"Image not provided: {url}" for url in asset_names if url not in assets)
+
+    with _timed("render", on_timing), wrap_errors(RenderError, "render"):
+        renderer = shared_renderer(toc_mode=toc_mode, code_mode=code_mode, highlighter=MEMORY_HIGHLIGHT_CACHE)
+        latex = renderer.render(document, metadata, asset_names=asset_names)
+        html_page = HTML_RENDERER.render(document, metadata, asset_names) if html else None
+    return ConversionResult(latex, metadata, asset_names, warnings, html_page)
+
+
+def warm_up() -> None:
+    """
+    Runs one throwaway conversion so the expensive one-time setup happens now.
+    Called in the gunicorn master before it forks, the workers then share the
+    result copy-on-write instead of each building it on its first request.
+    """
+    convert_markdown(WARM_UP_DOCUMENT, html=True)
@@ -0,0 +1,44 @@
+"""Exceptions raised by conversions, so library callers can tell failures apart."""
+
+from contextlib import contextmanager
+from typing import Iterator, Optional, Type
+
+
+class LittleTexError(Exception):
+    """Base class of every conversion error; `stage` names the pipeline stage that failed."""
+
+    def __init__(self, message: str, stage: Optional[str] = None):
+        super().__init__(message)
+        self.stage = stage
+
+
+class ParseError(LittleTexError):
+    """The document (or an included file or bibliography) could not be read as Markdown/BibTeX."""
+
+
+class RenderError(LittleTexError):
+    """The AST could not be turned into LaTeX or HTML."""
+
+
+class AssetError(LittleTexError):
+    """A file the conversion reads or writes (source, image, output) could not be accessed."""
+
+
+class CompileError(LittleTexError):
+    """pdflatex failed to produce a PDF."""
+
+
+@contextmanager
+def wrap_errors(error_type: Type[LittleTexError], stage: Optional[str] = None) -> Iterator[None]:
+    """
+    Re-raises any other exception from the block as `error_type`, keeping the
+    original as __cause__; LittleTexErrors pass through with `stage` filled in.
+    """
+    try:
+        yield
+    except LittleTexError as e:
+        if e.stage is None:
+            e.stage = stage
+        raise
+    except Exception as e:
+        raise error_type(str(e) or type(e).__name__, stage) from e
@@ -0,0 +1,245 @@
+import copy
+import datetime
+import html
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from . import ast
+from .citations import UNKNOWN_LABEL, format_reference
+from .links import is_safe_link
+from .renderer import number_headings
+from .spill import iter_table, spilled_text
+from src.utils.asset_sync import plan_asset_names
+
+MATHJAX_URL = "https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"
+
+STYLESHEET = """
+body { max-width: 46rem; margin: 2rem auto; padding: 0 1rem; font: 17px/1.55 Georgia, serif; color: #222; }
+header { text-align: center; margin-bottom: 2rem; }
+header .author, header .date { margin: 0.2rem 0; }
+h1, h2, h3, h4 { line-height: 1.25; }
+pre { background: #f4f4f4; border: 1px solid #ddd; padding: 0.6rem; overflow-x: auto; font-size: 0.85em; }
+code { font-size: 0.9em; }
+figure { text-align: center; margin: 1.5rem 0; }
+figure img { max-width: 80%; }
+table { border-collapse: collapse; margin: 1rem auto; }
+th, td { border: 1px solid #bbb; padding: 0.25rem 0.6rem; }
+caption { caption-side: bottom; padding-top: 0.4rem; }
+.indented { margin-left: 2em; }
+.toc ol { list-style: none; padding-left: 1.5em; }
+.page-break { border: 0; border-top: 1px dashed #ccc; margin: 2rem 0; }
+.references dt { float: left; clear: left; width: 2.5em; }
+.references dd { margin-left: 2.5em; margin-bottom: 0.4rem; }
+"""
+
+
+class HtmlRenderer:
+    """
+    Implements the Visitor pattern, like LatexRenderer, but renders the AST to
+    a standalone HTML page for quick previews. Math is left as raw TeX and
+    typeset in the browser by MathJax. Like LatexRenderer, each render works
+    on a private copy, so one instance can be shared between threads.
+    """
+    def __init__(self, mathjax_url: str = MATHJAX_URL):
+        self.mathjax_url = mathjax_url
+        self.math_mode = 'latex'
+        self.asset_names = {}
+        self.heading_numbers = {}
+
+    def render(self, document_node: ast.DocumentNode, metadata: dict,
+               asset_names: Optional[Dict[str, str]] = None) -> str:
+        """Takes the AST root and metadata, and returns the complete HTML page."""
+        renderer = copy.copy(self)
+        renderer.math_mode = metadata.get('math_mode', 'latex').lower()
+        # Same image names as the .tex file, so both outputs share the copied assets.
+        renderer.asset_names = asset_names if asset_names is not None else plan_asset_names(document_node)
+        renderer.heading_numbers = number_headings(document_node)
+
+        body = "\n".join(document_node.accept(renderer))
+        return renderer._generate_head(metadata) + body + "\n</main>\n</body>\n</html>\n"
+
+    def _generate_head(self, metadata: dict) -> str:
+        title = html.escape(metadata.get("title", "Untitled"))
+        author = html.escape(metadata.get("author", "Unknown"))
+        date = html.escape(metadata.get("date") or datetime.date.today().strftime("%B %d, %Y"))
+        if self.math_mode == 'asciimath':
+            mathjax_config = "window.MathJax = { loader: { load: ['input/asciimath'] } };"
+        else:
+            mathjax_config = "window.MathJax = { tex: { inlineMath: [['\\\\(', '\\\\)']] } };"
+        return "\n".join([
+            "<!doctype html>",
+            '<html lang="en">',
+            "<head>",
+            '<meta charset="utf-8">',
+            f"<title>{title}</title>",
+            f"<style>{STYLESHEET}</style>",
+            f"<script>{mathjax_config}</script>",
+            f'<script async src="{self.mathjax_url}"></script>',
+            "</head>",
+            "<body>",
+            "<header>",
+            f"<h1>{title}</h1>",
+            f'<p class="author">{author}</p>',
+            f'<p class="date">{date}</p>',
+            "</header>",
+            "<main>",
+            "",
+        ])
+
+    def _render_nodes(self, nodes: List[ast.Node]) -> List[str]:
+        rendered_lines = []
+        for node in nodes:
+            rendered_lines.extend(node.accept(self))
+        return rendered_lines
+
+    def _inline(self, nodes: List[ast.Node]) -> str:
+        # Block-level nodes (e.g. images) can appear inline; they render to lists of lines.
+        parts = (child.accept(self) for child in nodes)
+        return "".join(part if isinstance(part, str) else "".join(part) for part in parts)
+
+    def _math(self, content: str, display: bool) -> str:
+        if self.math_mode == 'asciimath':
+            return f"`{html.escape(content)}`"
+        if display:
+            return f"\\[{html.escape(content)}\\]"
+        return f"\\({html.escape(content)}\\)"
+
+    def visit_document(self, node: ast.DocumentNode) -> list[str]:
+        return self._render_nodes(node.children)
+
+    def visit_heading(self, node: ast.HeadingNode) -> list[str]:
+        # <h1> is the document title, so sections start at <h2>.
+        tag = f"h{min(node.level, 3) + 1}"
+        entry = self.heading_numbers.get(id(node))
+        if entry is None:
+            return [f"<{tag}>{html.escape(node.text)}</{tag}>"]
+        return [f'<{tag} id="sec:{entry[1]}">{entry[1]} {html.escape(node.text)}</{tag}>']
+
+    def visit_paragraph(self, node: ast.ParagraphNode) -> list[str]:
+        return [f"<p>{self._inline(node.children)}</p>"]
+
+    def visit_horizontal_rule(self, node: ast.HorizontalRuleNode) -> list[str]:
+        return ["<hr>"]
+
+    def visit_indented_text(self, node: ast.IndentedTextNode) -> list[str]:
+        return [f'<p class="indented">{html.escape(node.text)}</p>']
+
+    def visit_forced_break(self, node: ast.ForcedBreakNode) -> list[str]:
+        return [f'<div style="height: {node.num_lines}em"></div>']
+
+    def visit_blank_line(self, node: ast.BlankLineNode) -> list[str]:
+        return []
+
+    def visit_page_break(self, node: ast.PageBreakNode) -> list[str]:
+        return ['<hr class="page-break">']
+
+    def visit_list(self, node: ast.ListNode) -> list[str]:
+        tag = "ol" if node.list_type == "enumerate" else "ul"
+        lines = [f"<{tag}>"]
+        for item_node in node.items:
+            lines.extend(item_node.accept(self))
+        lines.append(f"</{tag}>")
+        return lines
+
+    def visit_list_item(self, node: ast.ListItemNode) -> list[str]:
+        inline_parts = []
+        block_lines = []
+        for child in node.children:
+            if isinstance(child, ast.ListNode):
+                block_lines.extend(child.accept(self))
+            else:
+                inline_parts.append(child)
+        return [f"<li>{self._inline(inline_parts)}", *block_lines, "</li>"]
+
+    def visit_text(self, node: ast.TextNode) -> str:
+        return html.escape(node.text, quote=False)
+
+    def visit_bold(self, node: ast.BoldNode) -> str:
+        return f"<strong>{self._inline(node.children)}</strong>"
+
+    def visit_italic(self, node: ast.ItalicNode) -> str:
+        return f"<em>{self._inline(node.children)}</em>"
+
+    def visit_code(self, node: ast.CodeNode) -> str:
+        return f"<code>{html.escape(node.text)}</code>"
+
+    def visit_link(self, node: ast.LinkNode) -> str:
+        if not is_safe_link(node.url):
+            # e.g. javascript: URLs; the preview is served from the app's own origin.
+            return self._inline(node.children)
+        return f'<a href="{html.escape(node.url)}">{self._inline(node.children)}</a>'
+
+    def visit_image(self, node: ast.ImageNode) -> list[str]:
+        image_filename = self.asset_names.get(node.url, Path(node.url).name)
+        return [
+            "<figure>",
+            f'  <img src="{html.escape(image_filename)}" alt="{html.escape(node.alt_text)}">',
+            f"  <figcaption>{html.escape(node.figure_type)}: {html.escape(node.caption)}</figcaption>",
+            "</figure>",
+        ]
+
+    def visit_code_block(self, node: ast.CodeBlockNode) -> list[str]:
+        language = html.escape(node.language)
+        content = spilled_text(node.source) if node.source is not None else node.content
+        return [f'<pre><code class="language-{language}">{html.escape(content)}</code></pre>']
+
+    def visit_inline_math(self, node: ast.InlineMathNode) -> str:
+        return self._math(node.content, display=False)
+
+    def visit_block_math(self, node: ast.BlockMathNode) -> list[str]:
+        return [f"<p>{self._math(node.content, display=True)}</p>"]
+
+    def visit_table(self, node: ast.TableNode) -> list[str]:
+        if node.source is not None:
+            return self._render_spilled_table(node)
+        if not node.headers:
+            return []
+        lines = ["<table>"]
+        if node.caption:
+            lines.append(f"<caption>{html.escape(node.caption)}</caption>")
+        lines.append("<tr>" + "".join(f"<th>{html.escape(h)}</th>" for h in node.headers) + "</tr>")
+        for row in node.rows:
+            lines.append("<tr>" + "".join(f"<td>{html.escape(cell)}</td>" for cell in row) + "</tr>")
+        lines.append("</table>")
+        return lines
+
+    def _render_spilled_table(self, node: ast.TableNode) -> list[str]:
+        lines, caption = ["<table>"], ""
+        for kind, value in iter_table(node.source):
+            if kind == "meta":
+                caption = value[1] if value[0] == "caption" else caption
+            else:
+                cell = "th" if kind == "header" else "td"
+                lines.append("<tr>" + "".join(f"<{cell}>{html.escape(text)}</{cell}>" for text in value) + "</tr>")
+        if len(lines) == 1:
+            return []
+        if caption:
+            lines.insert(1, f"<caption>{html.escape(caption)}</caption>")
+        lines.append("</table>")
+        return lines
+
+    def visit_toc(self, node: ast.TocNode) -> list[str]:
+        lines = ['<nav class="toc">', "<h2>Contents</h2>", "<ol>"]
+        for heading, number in self.heading_numbers.values():
+            indent = 1.5 * (min(heading.level, 3) - 1)
+            lines.append(f'<li style="margin-left: {indent}em"><a href="#sec:{number}">'
+                         f"{number} {html.escape(heading.text)}</a></li>")
+        lines.extend(["</ol>", "</nav>"])
+        return lines
+
+    def visit_include(self, node: ast.IncludeNode) -> list[str]:
+        return self._render_nodes(node.children)
+
+    def visit_citation(self, node: ast.CitationNode) -> str:
+        labels = node.labels or [UNKNOWN_LABEL] * len(node.keys)
+        parts = [label if label == UNKNOWN_LABEL else f'<a href="#cite.{html.escape(key)}">{label}</a>'
+                 for key, label in zip(node.keys, labels)]
+        return f"[{', '.join(parts)}]"
+
+    def visit_bibliography(self, node: ast.BibliographyNode) -> list[str]:
+        lines = [f"<h2>{html.escape(node.title)}</h2>", '<dl class="references">']
+        for label, entry in node.entries:
+            lines.append(f'<dt id="cite.{html.escape(entry.key)}">[{label}]</dt>'
+                         f"<dd>{format_reference(entry, markup='html')}</dd>")
+        lines.append("</dl>")
+        return lines
@@ -0,0 +1,146 @@
+"""Resolution of @include: directives, with a per-file parse cache."""
+
+import copy
+import os
+import posixpath
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from . import ast
+from .errors import ParseError
+from .parser import Parser
+from .tokenizer import Tokenizer
+from src.utils.asset_sync import iter_images
+from src.utils.cache import hash_bytes
+from src.utils.file_io import is_within
+from src.utils.text_processing import extract_metadata
+
+# Image urls that point somewhere other than the local file system.
+EXTERNAL_URL = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*://")
+
+
+class IncludeError(ParseError, ValueError):
+    """Raised for missing included files, include cycles and includes outside the document's directory."""
+
+
+class ParseCache:
+    """Thread-safe LRU cache of parsed documents, keyed by the hash of their content."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, ast.DocumentNode]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, markdown: str) -> ast.DocumentNode:
+        """Returns a private copy of the parsed document, parsing only on a cache miss."""
+        key = hash_bytes(markdown)
+        with self._lock:
+            document = self._entries.get(key)
+            if document is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if document is None:
+            document = Parser(Tokenizer().tokenize(markdown)).parse()
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = document
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        # Later stages may rewrite nodes, so the cached tree is never handed out.
+        return copy.deepcopy(document)
+
+
+# Shared across pipelines so long-running processes reuse parses between runs.
+PARSE_CACHE = ParseCache()
+
+
+class IncludeResolver:
+    """
+    Splices included documents into the AST. Records the include graph
+    (file -> files it includes) so callers can invalidate caches or emit
+    dependency lists.
+    """
+
+    def __init__(self, root_path: Path, cache: Optional[ParseCache] = None):
+        self.root_path = Path(root_path).resolve()
+        self.cache = cache or PARSE_CACHE
+        self.graph: Dict[Path, List[Path]] = {}
+
+    @property
+    def files(self) -> Set[Path]:
+        """Every included file (not counting the root document)."""
+        return {path for targets in self.graph.values() for path in targets}
+
+    def resolve(self, document: ast.DocumentNode) -> ast.DocumentNode:
+        """Replaces the IncludeNodes of the root document with the included content."""
+        document.children = self._splice(document.children, self.root_path, (self.root_path,))
+        return document
+
+    def _splice(self, children: List[ast.Node], current: Path, stack: Tuple[Path, ...]) -> List[ast.Node]:
+        result: List[ast.Node] = []
+        for node in children:
+            if not isinstance(node, ast.IncludeNode):
+                result.append(node)
+                continue
+            target = self._locate(current, node.path)
+            self.graph.setdefault(current, [])
+            if target not in self.graph[current]:
+                self.graph[current].append(target)
+            if target in stack:
+                chain = " -> ".join(str(p) for p in stack + (target,))
+                raise IncludeError(f"Include cycle detected: {chain}")
+            result.extend(self._load(target, stack + (target,)))
+        return result
+
+    def _locate(self, current: Path, relative: str) -> Path:
+        target = (current.parent / relative).resolve()
+        # Documents may come from uploads, so they must not pull in arbitrary files from the host.
+        if not is_within(target, self.root_path.parent):
+            raise IncludeError(f"Included file {relative} is outside the document's directory.")
+        return target
+
+    def _read(self, path: Path) -> str:
+        if not path.is_file():
+            raise IncludeError(f"Included file not found: {path}")
+        return path.read_text(encoding="utf-8")
+
+    def _load(self, path: Path, stack: Tuple[Path, ...]) -> List[ast.Node]:
+        # Metadata of included files is ignored; only the root document's applies.
+        _, markdown = extract_metadata(self._read(path))
+        document = self.cache.parse(markdown)
+        self._rebase_images(document, path.parent)
+        return self._splice(document.children, path, stack)
+
+    def _rebase_images(self, document: ast.DocumentNode, directory: Path) -> None:
+        """Makes image urls of an included file relative to the root document."""
+        root_dir = self.root_path.parent
+        for image in iter_images(document):
+            if EXTERNAL_URL.match(image.url) or os.path.isabs(image.url):
+                continue
+            rebased = os.path.relpath(directory / image.url, root_dir)
+            image.url = posixpath.normpath(rebased.replace(os.sep, "/"))
+
+
+class MemoryIncludeResolver(IncludeResolver):
+    """Resolves includes against in-memory files ({relative path: content}) instead of the disk."""
+
+    def __init__(self, files: Dict[str, Union[str, bytes]], cache: Optional[ParseCache] = None):
+        # A virtual root; paths never touch the file system.
+        self.root_path = PurePosixPath("/document.md")
+        self.cache = cache or PARSE_CACHE
+        self.graph = {}
+        self.sources = {posixpath.normpath("/" + name): content for name, content in files.items()}
+
+    def _locate(self, current: Path, relative: str) -> Path:
+        return PurePosixPath(posixpath.normpath(posixpath.join(str(current.parent), relative)))
+
+    def _read(self, path: Path) -> str:
+        content = self.sources.get(str(path))
+        if content is None:
+            raise IncludeError(f"Included file not found: {str(path).lstrip('/')}")
+        return content.decode("utf-8") if isinstance(content, bytes) else content
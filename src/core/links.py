@@ -0,0 +1,15 @@
+"""Checks on link targets taken from documents, which may come from untrusted uploads."""
+
+import re
+
+# Schemes a rendered link may use; anything else (javascript:, data:, vbscript:, ...) is dropped.
+SAFE_LINK_SCHEMES = {"http", "https", "mailto"}
+LINK_SCHEME = re.compile(r"^([a-zA-Z][a-zA-Z0-9+.-]*):")
+# Browsers ignore these inside a URL, so "java\tscript:" still runs script.
+IGNORED_URL_CHARACTERS = re.compile(r"[\x00-\x20\x7f]")
+
+
+def is_safe_link(url: str) -> bool:
+    """True for http(s) and mailto URLs and for relative ones (paths, #anchors, ?queries)."""
+    match = LINK_SCHEME.match(IGNORED_URL_CHARACTERS.sub("", url))
+    return match is None or match.group(1).lower() in SAFE_LINK_SCHEMES
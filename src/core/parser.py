@@ -22,13 +22,39 @@ from .ast import (
     TableNode,
     PageBreakNode,
     TocNode,
+    IncludeNode,
+    CitationNode,
 )
-from typing import List
+from .spill import SpilledBlock
+from typing import List, Optional
 import re
 
+INLINE_PATTERN = re.compile(r"""
+    \*{2}(.*?)\*{2}         # Group 1: Bold (**...**)
+    | \*(.*?)\*             # Group 2: Italic (*...*)
+    | `(.*?)`               # Group 3: Inline Code (`...`)
+    | !\[(.*?)\]\((.*?)\)   # Groups 4 & 5: Image (![...](...))
+    | \[(.*?)\]\((.*?)\)    # Groups 6 & 7: Link ([...](...))
+    | \$(.*?)\$             # Group 8: Inline Math ($...$)
+    | @cite\[(.*?)\]        # Group 9: Citation (@cite[key1, key2])
+""", re.VERBOSE)
+
 
 class Parser:
-    # takes a list of tokens and transforms it into AST (document structure)
+    """
+    Transforms a list of tokens into an AST. The instance keeps no per-parse
+    state (each parse gets its own cursor), so one Parser can serve several
+    threads: `Parser(tokens).parse()` and `Parser().parse(tokens)` are equivalent.
+    """
+    def __init__(self, tokens: Optional[List[Token]] = None):
+        self.tokens = tokens
+
+    def parse(self, tokens: Optional[List[Token]] = None) -> DocumentNode:
+        return _TokenCursor(self.tokens if tokens is None else tokens).parse()
+
+
+class _TokenCursor:
+    # takes a list of tokens and transforms it into AST (document structure); one instance per parse
     def __init__(self, tokens: List[Token]):
         self.tokens = tokens
         self.current_token_index = 0
@@ -48,6 +74,7 @@ class Parser:
             TokenType.TABLE: self._parse_table,
             TokenType.PAGE_BREAK: self._parse_page_break,
             TokenType.TOC: self._parse_toc,
+            TokenType.INCLUDE: self._parse_include,
         }
 
     def _peek(self) -> Token:
@@ -74,6 +101,12 @@ class Parser:
         self._advance()
         return TocNode()
     
+    def _parse_include(self) -> IncludeNode:
+        """Parses an INCLUDE token into an IncludeNode (resolved later by the IncludeResolver)."""
+        token = self._peek()
+        self._advance()
+        return IncludeNode(path=token.value)
+    
     def _parse_page_break(self) -> PageBreakNode:
         """Parses a PAGE_BREAK token into a PageBreakNode."""
         self._advance()
@@ -131,18 +164,10 @@ class Parser:
     
     def _parse_inline_elements(self, text: str) -> List[Node]:
         """parses a string for inline elements like bold, italic, links, etc."""
-        pattern = re.compile(r"""
-            \*{2}(.*?)\*{2}         # Group 1: Bold (**...**)
-            | \*(.*?)\*             # Group 2: Italic (*...*)
-            | `(.*?)`               # Group 3: Inline Code (`...`)
-            | !\[(.*?)\]\((.*?)\)   # Groups 4 & 5: Image (![...](...))
-            | \[(.*?)\]\((.*?)\)    # Groups 6 & 7: Link ([...](...))
-            | \$(.*?)\$             # Group 8: Inline Math ($...$)
-        """, re.VERBOSE)
         nodes = []
         last_index = 0
 
-        for match in pattern.finditer(text):
+        for match in INLINE_PATTERN.finditer(text):
             if match.start() > last_index:
                 nodes.append(TextNode(text[last_index : match.start()]))
 
@@ -165,6 +190,10 @@ class Parser:
             # Group 8: Inline Math
             elif match.group(8) is not None:
                 nodes.append(InlineMathNode(match.group(8)))
+            # Group 9: Citation
+            elif match.group(9) is not None:
+                keys = [key.strip() for key in match.group(9).split(",") if key.strip()]
+                nodes.append(CitationNode(keys))
 
             last_index = match.end()
 
@@ -205,7 +234,7 @@ class Parser:
         language = token.value.get('language', 'text') or 'text'
         content = token.value.get("content", "")
         self._advance()
-        return CodeBlockNode(content=content, language=language)
+        return CodeBlockNode(content=content, language=language, source=token.value.get("spilled"))
 
 
     def _parse_heading(self) -> HeadingNode:
@@ -280,6 +309,10 @@ class Parser:
 
     def _parse_table(self) -> TableNode:
         token = self._peek()
+        if isinstance(token.value, SpilledBlock):
+            # Read row by row when rendered; see spill.iter_table.
+            self._advance()
+            return TableNode(headers=[], rows=[], source=token.value)
         lines = [line for line in token.value.strip().split('\n') if line.strip()]
         
         metadata = {}
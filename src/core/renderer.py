@@ -1,6 +1,23 @@
-from py_asciimath.translator.translator import ASCIIMath2Tex as AsciiMath
+import copy
+import logging
+import re
+import threading
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
 from . import ast
+from .citations import UNKNOWN_LABEL, format_reference
+from .sections import select_sections, split_sections
+from .spill import SpilledBlock, iter_table, write_atomically
+from src.utils.asset_sync import plan_asset_names
+from src.utils.highlight import HIGHLIGHT_CACHE, HighlightCache, highlight_file, highlight_preamble
+
+# py_asciimath calls logging.basicConfig(level=DEBUG) on import and then logs every
+# translation ("INFO:Translating...") through the root logger. Logging setup belongs
+# to the application, so that is undone here.
+_root_handlers, _root_level = list(logging.root.handlers), logging.root.level
+from py_asciimath.translator.translator import ASCIIMath2Tex as AsciiMath  # noqa: E402
+logging.root.handlers[:] = _root_handlers
+logging.root.setLevel(_root_level)
 
 LISTINGS_PREAMBLE = r"""
 \usepackage{listings}
@@ -30,27 +47,116 @@ LISTINGS_PREAMBLE = r"""
 \lstset{style=mystyle}
 """
 
+SECTION_COMMANDS = ["section", "subsection", "subsubsection"]
+
+# Building the AsciiMath grammar takes a while, so one translator is shared by
+# every renderer in the process (and built before forking, see warm_up()).
+_asciimath = None
+_asciimath_lock = threading.Lock()
+
+
+def translate_asciimath(content: str, displaystyle: bool = False) -> str:
+    """Translates AsciiMath to LaTeX math with the shared translator, creating it on first use."""
+    global _asciimath
+    # Only the construction is locked: the Lark LALR parser keeps its parse state
+    # per call and the transformer sets no attributes after __init__, so threads
+    # can translate with the same instance concurrently.
+    if _asciimath is None:
+        with _asciimath_lock:
+            if _asciimath is None:
+                _asciimath = AsciiMath(log=False)
+    return _asciimath.translate(content, displaystyle=displaystyle) or ""
+
+
+def number_headings(document_node: ast.DocumentNode) -> Dict[int, Tuple[ast.HeadingNode, str]]:
+    """
+    Numbers the headings the way LaTeX's section counters would (1, 1.1, 1.1.1),
+    keyed by id(node) in document order.
+    """
+    counters = [0, 0, 0]
+    numbers = {}
+    for node in document_node.children:
+        if isinstance(node, ast.HeadingNode):
+            depth = min(node.level, 3)
+            counters[depth - 1] += 1
+            counters[depth:] = [0] * (3 - depth)
+            numbers[id(node)] = (node, ".".join(str(c) for c in counters[:depth]))
+    return numbers
+
+
+def _file_safe(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "-", text).strip("-") or "text"
+
+
+def _longtable_lines(source: SpilledBlock) -> Iterator[str]:
+    """LaTeX for a spilled table, generated while its rows are read; the caption may come last."""
+    caption, header_seen = "", False
+    for kind, value in iter_table(source):
+        if kind == "meta":
+            if value[0] == "caption":
+                caption = value[1]
+        elif kind == "header":
+            header_seen = True
+            yield "\\begingroup\\small"
+            yield "\\begin{{longtable}}{{{}}}".format("|" + "|".join(["l"] * len(value)) + "|")
+            yield "\\toprule"
+            yield "{} \\\\".format(" & ".join(f"\\textbf{{{h}}}" for h in value))
+            yield "\\midrule"
+            yield "\\endhead"
+        else:
+            yield "{} \\\\".format(" & ".join(value))
+    if header_seen:
+        yield "\\bottomrule"
+        if caption:
+            yield f"\\caption{{{caption}}} \\\\"
+        yield "\\end{longtable}"
+        yield "\\endgroup"
+
+
+class SplitDocument:
+    """A master .tex file plus one \\include'd file per top-level section."""
+
+    def __init__(self, master: str, sections: List[Tuple[str, str]]):
+        self.master = master
+        self.sections = sections  # (path relative to the master, without .tex; content)
+
+
 class LatexRenderer:
     """
     Implements the Visitor pattern. It walks the AST and generates a complete
     LaTeX document string, including the preamble and metadata.
+
+    The instance only holds configuration: every render works on a private
+    copy carrying the per-document state, so one renderer can serve
+    concurrent requests.
     """
-    def __init__(self):
-        # self.am_parser = AsciiMath(log=False, inplace=True)
+    def __init__(self, toc_mode: str = 'latex', code_mode: str = 'listings',
+                 highlighter: Optional[HighlightCache] = None):
         self.math_mode = 'latex'
-        self.am_parser = None
+        # 'latex' uses \tableofcontents (needs a second pdflatex pass);
+        # 'python' builds the table of contents from the AST in a single pass.
+        self.default_toc_mode = toc_mode
+        self.toc_mode = toc_mode
+        # 'listings' leaves highlighting to TeX; 'pygments' emits pre-colored Verbatim blocks.
+        self.default_code_mode = code_mode
+        self.code_mode = code_mode
+        self.highlighter = highlighter or HIGHLIGHT_CACHE
+        self.asset_names = {}
+        self.heading_numbers = {}
 
-    def render(self, document_node: ast.DocumentNode, metadata: dict) -> str:
+    def render(self, document_node: ast.DocumentNode, metadata: dict,
+               extra_preamble: Optional[List[str]] = None,
+               asset_names: Optional[Dict[str, str]] = None) -> str:
         """
         The main public method. Takes the AST root and metadata, and returns
         the complete, final LaTeX document as a single string.
         """
-        self.math_mode = metadata.get('math_mode', 'latex').lower()
+        renderer = self._for_document(document_node, metadata, asset_names)
         
-        preamble = self._generate_preamble(metadata)
+        preamble = renderer._generate_preamble(metadata, extra_preamble)
 
         # This is the main visitor entry point, which generates the document body
-        body_lines = document_node.accept(self)
+        body_lines = document_node.accept(renderer)
 
         # We join the body lines, preserving the blank lines from BlankLineNode
         body = "\n".join(body_lines)
@@ -59,20 +165,52 @@ class LatexRenderer:
 
         return preamble + body + postamble
     
-    def _get_asciimath_parser(self):
+    def render_split(self, document_node: ast.DocumentNode, metadata: dict,
+                     only: Optional[List[str]] = None, directory: str = "sections") -> SplitDocument:
         """
-        Returns the existing AsciiMath parser instance.
-        If one doesn't exist, it creates it first.
+        Renders a master document that \\include's one file per top-level
+        section, placed in `directory` next to the master. `only` selects
+        sections (by number, name or heading text) for \\includeonly; the
+        others keep their page numbers and references from the .aux files
+        of the last full build.
         """
-        # If we haven't created the parser yet...
-        if self.am_parser is None:
-            print("INFO: Initializing AsciiMath translator...")
-            # ...create it now and save it for future use.
-            self.am_parser = AsciiMath(log=False)
-        # Return the (now guaranteed to exist) parser.
-        return self.am_parser
-
-    def _generate_preamble(self, metadata: dict) -> str:
+        renderer = self._for_document(document_node, metadata)
+
+        front, sections = split_sections(document_node)
+        extra_lines = []
+        if only:
+            selected = [f"{directory}/{section.name}" for section in select_sections(sections, only)]
+            extra_lines.append(f"\\includeonly{{{','.join(selected)}}}")
+        preamble = renderer._generate_preamble(metadata, extra_lines)
+
+        body_lines = renderer._render_nodes(front)
+        body_lines.extend(f"\\include{{{directory}/{section.name}}}" for section in sections)
+        master = preamble + "\n".join(body_lines) + "\n\\end{document}"
+
+        section_files = [(f"{directory}/{section.name}", "\n".join(renderer._render_nodes(section.nodes)) + "\n")
+                         for section in sections]
+        return SplitDocument(master, section_files)
+
+    def _for_document(self, document_node: ast.DocumentNode, metadata: dict,
+                      asset_names: Optional[Dict[str, str]] = None) -> "LatexRenderer":
+        """Returns a copy of this renderer set up with the per-document state used by the visit methods."""
+        renderer = copy.copy(self)
+        renderer.math_mode = metadata.get('math_mode', 'latex').lower()
+        renderer.toc_mode = metadata.get('toc_mode', self.default_toc_mode).lower()
+        renderer.code_mode = metadata.get('code_highlight', self.default_code_mode).lower()
+        # Output file names for the images, shared with CopyAssetsStage.
+        # Callers rendering part of a document pass the names planned for the whole.
+        renderer.asset_names = asset_names if asset_names is not None else plan_asset_names(document_node)
+        renderer.heading_numbers = number_headings(document_node)
+        return renderer
+
+    def _render_nodes(self, nodes: List[ast.Node]) -> List[str]:
+        rendered_lines = []
+        for node in nodes:
+            rendered_lines.extend(node.accept(self))
+        return rendered_lines
+
+    def _generate_preamble(self, metadata: dict, extra_lines: Optional[List[str]] = None) -> str:
         """Generates the LaTeX preamble using the provided metadata."""
         title = metadata.get("title", "Untitled")
         author = metadata.get("author", "Unknown")
@@ -87,7 +225,8 @@ class LatexRenderer:
             "\\usepackage{amsmath}",
             "\\usepackage{booktabs}",
             "\\usepackage{float}",
-            LISTINGS_PREAMBLE,
+            "\\usepackage{longtable}",  # spilled tables, which may span pages
+            highlight_preamble() if self.code_mode == 'pygments' else LISTINGS_PREAMBLE,
         ]
         
         if geometry:
@@ -100,9 +239,14 @@ class LatexRenderer:
             "    colorlinks=true,",
             "    urlcolor=blue,",
             "}",
+            "\\usepackage{bookmark}",  # PDF outline on the first pass, no .out file round trip
             f"\\title{{\\textbf{{{title}}}}}",
             f"\\author{{{author}}}",
             f"\\date{{{date}}}",
+        ])
+        if extra_lines:
+            preamble_lines.extend(extra_lines)
+        preamble_lines.extend([
             "\\begin{document}",
             "\\maketitle",
             "",  # Adds a blank line after the title block for spacing
@@ -111,18 +255,13 @@ class LatexRenderer:
 
     def visit_document(self, node: ast.DocumentNode) -> list[str]:
         """Visits the root DocumentNode and renders all its children."""
-        rendered_lines = []
-        for child in node.children:
-            rendered_lines.extend(child.accept(self))
-        return rendered_lines
+        return self._render_nodes(node.children)
 
     def visit_heading(self, node: ast.HeadingNode) -> list[str]:
-        if node.level == 1:
-            return [f"\\section{{{node.text}}}", ""]
-        elif node.level == 2:
-            return [f"\\subsection{{{node.text}}}", ""]
-        else:
-            return [f"\\subsubsection{{{node.text}}}", ""]
+        command = SECTION_COMMANDS[min(node.level, 3) - 1]
+        entry = self.heading_numbers.get(id(node))
+        label = f"\\label{{sec:{entry[1]}}}" if entry else ""
+        return [f"\\{command}{{{node.text}}}{label}", ""]
 
     def visit_paragraph(self, node: ast.ParagraphNode) -> list[str]:
         content = "".join(child.accept(self) for child in node.children)
@@ -198,7 +337,7 @@ class LatexRenderer:
         return f"\\href{{{node.url}}}{{{content}}}"
 
     def visit_image(self, node: ast.ImageNode) -> list[str]:
-        image_filename = Path(node.url).name
+        image_filename = self.asset_names.get(node.url, Path(node.url).name)
         
         # alt_text = node.alt_text
         # figure_type = "Image" #default
@@ -223,6 +362,10 @@ class LatexRenderer:
         return lines
     
     def visit_code_block(self, node: ast.CodeBlockNode) -> list[str]:
+        if node.source is not None:
+            return self._render_spilled_code(node)
+        if self.code_mode == 'pygments':
+            return [self.highlighter.highlight(node.content, node.language), ""]
         lines = [
             f"\\begin{{lstlisting}}[language={node.language}]",
             node.content,
@@ -231,19 +374,27 @@ class LatexRenderer:
         ]
         return lines
     
+    def _render_spilled_code(self, node: ast.CodeBlockNode) -> list[str]:
+        """A spilled block is read from its side file by pdflatex instead of being inlined."""
+        if self.code_mode == 'pygments':
+            # Highlighted once per content and language, next to the raw file.
+            target, name = node.source.derived(f".{_file_safe(node.language)}.tex")
+            if not target.exists():
+                highlight_file(node.source.path, node.language, target)
+            return [f"\\input{{{name}}}", ""]
+        return [f"\\lstinputlisting[language={node.language}]{{{node.source.name}}}", ""]
+
     def visit_inline_math(self, node: ast.InlineMathNode) -> str:
         """Renders an InlineMathNode into $...$"""
         if self.math_mode == 'asciimath':
-            parser = self._get_asciimath_parser()
-            return parser.translate(node.content) or ""
+            return translate_asciimath(node.content)
         else:
             return f"${node.content}$"
 
     def visit_block_math(self, node: ast.BlockMathNode) -> list[str]:
         """Renders a BlockMathNode into a LaTeX block math environment."""
         if self.math_mode == 'asciimath':
-            parser = self._get_asciimath_parser()
-            content = parser.translate(node.content, displaystyle=True) or ""
+            content = translate_asciimath(node.content, displaystyle=True)
             return [content, ""]
         else:
             lines = [
@@ -255,6 +406,8 @@ class LatexRenderer:
             return lines
 
     def visit_table(self, node: ast.TableNode) -> list[str]:
+        if node.source is not None:
+            return self._render_spilled_table(node)
         if not node.headers:
             return []
             
@@ -291,8 +444,79 @@ class LatexRenderer:
         
         return lines
     
+    def _render_spilled_table(self, node: ast.TableNode) -> list[str]:
+        """
+        Streams a spilled table into a longtable side file, row by row, and
+        inputs it. Unlike the floating tabular of small tables, a longtable
+        breaks across pages and TeX sets it in chunks.
+        """
+        target, name = node.source.derived(".tex")
+        if not target.exists():
+            write_atomically(target, _longtable_lines(node.source))
+        return [f"\\input{{{name}}}", ""]
+
     def visit_toc(self, node: ast.TocNode) -> list[str]:
         """Renders a TocNode into a table of contents."""
+        if self.toc_mode == 'python':
+            return self._render_python_toc()
+
         table_of_contents = "\\tableofcontents\n"
 
-        return table_of_contents.splitlines()
\ No newline at end of file
+        return table_of_contents.splitlines()
+
+    def _render_python_toc(self) -> list[str]:
+        """
+        Builds the table of contents from the numbered headings. Entries link to
+        hyperref's own section anchors (e.g. 'subsection.1.2'), which exist on
+        the first pdflatex pass, so no .toc file or second pass is needed.
+        """
+        lines = ["\\section*{\\contentsname}", "\\begingroup", "\\setlength{\\parskip}{2pt}"]
+        for heading, number in self.heading_numbers.values():
+            command = SECTION_COMMANDS[min(heading.level, 3) - 1]
+            indent = 1.5 * (min(heading.level, 3) - 1)
+            text = f"{number}\\quad {heading.text}"
+            if heading.level == 1:
+                text = f"\\textbf{{{text}}}"
+            lines.append(f"\\noindent\\hspace*{{{indent}em}}\\hyperlink{{{command}.{number}}}{{{text}}}\\par")
+        lines.extend(["\\endgroup", ""])
+        return lines
+
+    def visit_include(self, node: ast.IncludeNode) -> list[str]:
+        """Renders the included document's nodes (empty if the include was never resolved)."""
+        return self._render_nodes(node.children)
+
+    def visit_citation(self, node: ast.CitationNode) -> str:
+        """
+        Renders numbered citation labels as links to the reference list.
+        Plain \\hyperlink instead of \\cite, so no .aux round trip is needed.
+        """
+        labels = node.labels or [UNKNOWN_LABEL] * len(node.keys)
+        parts = [label if label == UNKNOWN_LABEL else f"\\hyperlink{{cite.{key}}}{{{label}}}"
+                 for key, label in zip(node.keys, labels)]
+        return f"[{', '.join(parts)}]"
+
+    def visit_bibliography(self, node: ast.BibliographyNode) -> list[str]:
+        """Renders the reference list, already numbered and formatted in Python."""
+        lines = [
+            f"\\section*{{{node.title}}}",
+            "\\begin{list}{}{\\setlength{\\leftmargin}{2.5em}\\setlength{\\labelwidth}{2em}}",
+        ]
+        for label, entry in node.entries:
+            lines.append(f"\\item[\\hypertarget{{cite.{entry.key}}}{{[{label}]}}] {format_reference(entry)}")
+        lines.extend(["\\end{list}", ""])
+        return lines
+
+
+_renderers: Dict[Tuple[str, str, Optional[HighlightCache]], LatexRenderer] = {}
+_renderers_lock = threading.Lock()
+
+
+def shared_renderer(toc_mode: str = 'latex', code_mode: str = 'listings',
+                    highlighter: Optional[HighlightCache] = None) -> LatexRenderer:
+    """Returns the process-wide renderer for these options, creating it on first use."""
+    key = (toc_mode, code_mode, highlighter)
+    renderer = _renderers.get(key)
+    if renderer is None:
+        with _renderers_lock:
+            renderer = _renderers.setdefault(key, LatexRenderer(toc_mode, code_mode, highlighter))
+    return renderer
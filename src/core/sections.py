@@ -0,0 +1,56 @@
+"""Helpers for cutting a document into its top-level (# heading) sections."""
+
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from . import ast
+
+
+def slugify(text: str, max_length: int = 40) -> str:
+    """Lower-case ASCII slug that is safe in file names and \\include arguments."""
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:max_length].strip("-")
+
+
+class Section:
+    """A top-level heading and the nodes that follow it up to the next one."""
+
+    def __init__(self, index: int, heading: ast.HeadingNode, nodes: List[ast.Node]):
+        self.index = index      # 1-based position in the document
+        self.heading = heading
+        self.nodes = nodes      # includes the heading itself
+
+    @property
+    def name(self) -> str:
+        """A file-name safe identifier, e.g. 'sec01-introduction'."""
+        slug = slugify(self.heading.text)
+        return f"sec{self.index:02d}-{slug}" if slug else f"sec{self.index:02d}"
+
+    def matches(self, selector: str) -> bool:
+        """True if `selector` is this section's number, name or heading text."""
+        selector = selector.strip()
+        return (selector == str(self.index) or selector == self.name
+                or selector.lower() == self.heading.text.strip().lower())
+
+
+def split_sections(document: ast.DocumentNode) -> Tuple[List[ast.Node], List[Section]]:
+    """Returns the nodes before the first level-1 heading, and one Section per level-1 heading."""
+    front: List[ast.Node] = []
+    sections: List[Section] = []
+    for node in document.children:
+        if isinstance(node, ast.HeadingNode) and node.level == 1:
+            sections.append(Section(len(sections) + 1, node, [node]))
+        elif sections:
+            sections[-1].nodes.append(node)
+        else:
+            front.append(node)
+    return front, sections
+
+
+def select_sections(sections: Sequence[Section], selectors: Optional[Sequence[str]]) -> List[Section]:
+    """Filters sections by number, name or heading text; no selectors means all of them."""
+    if not selectors:
+        return list(sections)
+    unknown = [s for s in selectors if not any(section.matches(s) for section in sections)]
+    if unknown:
+        raise ValueError(f"Unknown section(s): {', '.join(unknown)}")
+    return [section for section in sections if any(section.matches(s) for s in selectors)]
@@ -0,0 +1,134 @@
+"""
+Side files for oversized code and table blocks. Above a size threshold the
+tokenizer streams a block's body into a file in the output directory
+instead of carrying it as a string through tokens, nodes and rendered
+lines; the .tex file then references it (\\lstinputlisting, \\input), so
+pdflatex reads it line by line too.
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+SPILL_DIR = "littletex-blocks"
+DEFAULT_SPILL_THRESHOLD = 1024 * 1024  # characters of block body
+
+
+class SpilledBlock:
+    """A block body stored in a side file, named after its content."""
+
+    def __init__(self, path: Path, name: str, size: int):
+        self.path = path  # where the file is
+        self.name = name  # how the .tex file refers to it: relative to the output directory
+        self.size = size  # characters in the body
+
+    def derived(self, suffix: str) -> Tuple[Path, str]:
+        """Path and .tex name of a file generated from this one, e.g. its rendered LaTeX."""
+        stem = self.path.name.rsplit(".", 1)[0]
+        return self.path.with_name(stem + suffix), self.name.rsplit("/", 1)[0] + "/" + stem + suffix
+
+    def __repr__(self) -> str:
+        return f"SpilledBlock({self.name!r}, {self.size})"
+
+
+class BlockSpill:
+    """Tells the tokenizer from what size, and into which output directory, block bodies are spilled."""
+
+    def __init__(self, output_dir: Path, threshold: int = DEFAULT_SPILL_THRESHOLD):
+        self.output_dir = Path(output_dir)
+        self.threshold = threshold
+
+    @property
+    def directory(self) -> Path:
+        return self.output_dir / SPILL_DIR
+
+    def writer(self, kind: str, suffix: str) -> "SpillWriter":
+        return SpillWriter(self.directory, kind, suffix)
+
+
+class SpillWriter:
+    """
+    Streams the lines of one block to a temporary file while hashing them;
+    `close` renames it after the hash. Files are content-addressed, so an
+    unchanged block keeps its file (and mtime) across builds.
+    """
+
+    def __init__(self, directory: Path, kind: str, suffix: str):
+        self.directory = directory
+        self.kind = kind
+        self.suffix = suffix
+        self.size = 0
+        self._digest = hashlib.sha256()
+        directory.mkdir(parents=True, exist_ok=True)
+        self._temp_path = directory / f".{kind}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._file = open(self._temp_path, "w", encoding="utf-8", newline="\n")
+
+    def write_line(self, line: str) -> None:
+        text = line + "\n"
+        self._digest.update(text.encode("utf-8"))
+        self._file.write(text)
+        self.size += len(text)
+
+    def close(self) -> SpilledBlock:
+        self._file.close()
+        name = f"{self.kind}-{self._digest.hexdigest()[:16]}{self.suffix}"
+        path = self.directory / name
+        if path.exists():
+            os.remove(self._temp_path)
+        else:
+            os.replace(self._temp_path, path)
+        return SpilledBlock(path, f"{SPILL_DIR}/{name}", self.size)
+
+    def discard(self) -> None:
+        self._file.close()
+        if self._temp_path.exists():
+            os.remove(self._temp_path)
+
+
+def split_row(line: str) -> List[str]:
+    return [cell.strip() for cell in line.strip("| \t").split("|")]
+
+
+def iter_table(block: SpilledBlock) -> Iterator[Tuple[str, object]]:
+    """
+    Reads a spilled `::: table` body one line at a time, with the parser's
+    rules: yields ("meta", (key, value)) for `key: value` lines,
+    ("header", cells) for the first row and ("row", cells) for the rest
+    (the separator line after the header is skipped).
+    """
+    data_lines = 0
+    with open(block.path, encoding="utf-8") as source:
+        for line in source:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            if ":" in line and "|" not in line:
+                key, value = line.split(":", 1)
+                yield "meta", (key.strip().lower(), value.strip())
+                continue
+            data_lines += 1
+            if data_lines == 1:
+                yield "header", split_row(line)
+            elif data_lines > 2:
+                yield "row", split_row(line)
+
+
+def write_atomically(path: Path, lines: Iterator[str]) -> None:
+    """Writes generated lines to `path` through a temporary file, so readers never see half a file."""
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_path, "w", encoding="utf-8", newline="\n") as out:
+            for line in lines:
+                out.write(line + "\n")
+        os.replace(temp_path, path)
+    except BaseException:
+        if temp_path.exists():
+            os.remove(temp_path)
+        raise
+
+
+def spilled_text(block: Optional[SpilledBlock]) -> str:
+    """The whole body of a spilled block (for outputs that need it as one string)."""
+    return block.path.read_text(encoding="utf-8").rstrip("\n") if block is not None else ""
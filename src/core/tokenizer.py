@@ -2,6 +2,8 @@ import re
 from typing import List, Tuple, Optional
 from enum import Enum, auto
 
+from .spill import BlockSpill
+
 
 class TokenType(Enum):
     HEADING = auto()
@@ -18,6 +20,7 @@ class TokenType(Enum):
     TABLE = auto()
     PAGE_BREAK = auto()
     TOC = auto()
+    INCLUDE = auto()
     EOF = auto()
 
 
@@ -44,6 +47,11 @@ class Token:
 
 
 class Tokenizer:
+    """
+    Turns Markdown into tokens. With a BlockSpill, code and table blocks
+    longer than its threshold are streamed to side files and their tokens
+    carry a SpilledBlock instead of the body.
+    """
 
     MULTI_LINE_BLOCK_RULES = {
         "```": (TokenType.CODE_BLOCK, "```"),
@@ -53,6 +61,7 @@ class Tokenizer:
 
     SINGLE_LINE_TOKEN_RULES = [
         (TokenType.TOC, re.compile(r"^@toc$")),
+        (TokenType.INCLUDE, re.compile(r"^@include:\s*(.+)$")),
         (TokenType.PAGE_BREAK, re.compile(r"^@newpage.*$")),
         (TokenType.HEADING, re.compile(r"^(#{1,3})\s*(.*)")),
         (TokenType.IMAGE, re.compile(r"^!\[(.*?)\]\((.*?)\)$")),
@@ -62,6 +71,15 @@ class Tokenizer:
         (TokenType.INDENTED_TEXT, re.compile(r"^>>\s(.*)")),
     ]
 
+    # Block types that may be spilled, with the kind and suffix of their side files.
+    SPILLED_BLOCKS = {
+        TokenType.CODE_BLOCK: ("code", ".txt"),
+        TokenType.TABLE: ("table", ".md"),
+    }
+
+    def __init__(self, spill: Optional[BlockSpill] = None):
+        self.spill = spill
+
     def tokenize(self, markdown_content: str) -> List[Token]:
         """Tokenizes the entire document using a state machine approach."""
         tokens: List[Token] = []
@@ -110,17 +128,38 @@ class Tokenizer:
 
                 # Start consuming lines from the next line
                 i = current_index + 1
-                while i < len(lines) and not lines[i].strip() == end_sequence:
-                    block_lines.append(lines[i])
-                    i += 1
+                size = 0
+                writer = None
+                try:
+                    while i < len(lines) and not lines[i].strip() == end_sequence:
+                        if writer is not None:
+                            writer.write_line(lines[i])
+                        else:
+                            block_lines.append(lines[i])
+                            size += len(lines[i]) + 1
+                            if (self.spill is not None and token_type in self.SPILLED_BLOCKS
+                                    and size > self.spill.threshold):
+                                # Too big to carry around: the rest goes straight to a side file.
+                                writer = self.spill.writer(*self.SPILLED_BLOCKS[token_type])
+                                for pending in block_lines:
+                                    writer.write_line(pending)
+                                block_lines = []
+                        i += 1
+                    spilled = writer.close() if writer is not None else None
+                except BaseException:
+                    if writer is not None:
+                        writer.discard()
+                    raise
 
                 content = "\n".join(block_lines)
 
                 # Create the correct token with the right value format
                 if token_type == TokenType.CODE_BLOCK:
                     value = {"language": language, "content": content}
+                    if spilled is not None:
+                        value["spilled"] = spilled
                 else:
-                    value = content
+                    value = content if spilled is None else spilled
 
                 token = Token(token_type, value=value)
                 lines_consumed = (i - current_index) + 1
@@ -150,8 +189,8 @@ class Tokenizer:
             return Token(token_type, value={"alt": alt_text, "url": url})
         if token_type in [TokenType.BULLET_ITEM, TokenType.NUMBERED_ITEM]:
             return Token(token_type, value=match.group(1), indent=indent)
-        if token_type == TokenType.INDENTED_TEXT:
-            return Token(token_type, value=match.group(1))
+        if token_type in [TokenType.INDENTED_TEXT, TokenType.INCLUDE]:
+            return Token(token_type, value=match.group(1).strip())
         if token_type in [
             TokenType.HORIZONTAL_RULE,
             TokenType.PAGE_BREAK,
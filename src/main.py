@@ -1,9 +1,58 @@
 """Entry point for the LittleTex application."""
 
 import sys
+from pathlib import Path
+from typing import List, Optional
 from src.cli.splash import show_splash_screen
-from src.cli.argument_parser import ArgumentParser
-from src.core.app import LittleTexApp
+from src.cli.daemon import run_via_daemon, serve_main
+from src.core.errors import AssetError, CompileError, LittleTexError, ParseError, RenderError
+from src.utils.pdf_generator import PdfCancelledError, PdfTimeoutError
+
+# Exit status per failure kind, most specific first (2 is argparse's usage error).
+EXIT_CODES = [
+    (PdfTimeoutError, 124),
+    (PdfCancelledError, 130),
+    (ParseError, 3),
+    (RenderError, 4),
+    (AssetError, 5),
+    (CompileError, 6),
+    (LittleTexError, 1),
+]
+
+
+def report_error(error: LittleTexError) -> int:
+    """Print a conversion error and return the exit status for it."""
+    if isinstance(error, PdfTimeoutError):
+        print(f"⏱️  Timeout: {error}")
+    elif isinstance(error, PdfCancelledError):
+        print(f"🛑 Cancelled: {error}")
+    else:
+        print(f"🚨 {type(error).__name__}: {error}")
+    return next(code for error_type, code in EXIT_CODES if isinstance(error, error_type))
+
+
+def convert(argv: Optional[List[str]] = None, cwd: Optional[str] = None) -> int:
+    """Run one command-line conversion in this process and return its exit status."""
+    # Imported here, so commands answered by the daemon never load the pipeline.
+    from src.cli.argument_parser import ArgumentParser
+    from src.core.app import LittleTexApp
+
+    config = ArgumentParser.parse_args(argv, cwd)
+    try:
+        LittleTexApp(config).run()
+    except LittleTexError as e:
+        return report_error(e)
+    return 0
+
+
+def _daemon_socket(argv: List[str]) -> Optional[str]:
+    """The --socket value from the command line, if any (without loading the full parser)."""
+    for index, arg in enumerate(argv):
+        if arg == "--socket" and index + 1 < len(argv):
+            return argv[index + 1]
+        if arg.startswith("--socket="):
+            return arg.split("=", 1)[1]
+    return None
 
 
 def run_app() -> None:
@@ -12,9 +61,17 @@ def run_app() -> None:
         show_splash_screen()
         return
 
-    config = ArgumentParser.parse_args()
-    app = LittleTexApp(config)
-    app.run()
+    argv = sys.argv[1:]
+    if argv[0] == "serve":
+        sys.exit(serve_main(argv[1:], convert))
+
+    # A running daemon converts with warm caches; without one, convert here.
+    if "--no-daemon" not in argv:
+        socket = _daemon_socket(argv)
+        status = run_via_daemon(argv, Path(socket) if socket else None)
+        if status is not None:
+            sys.exit(status)
+    sys.exit(convert(argv))
 
 
 if __name__ == "__main__":
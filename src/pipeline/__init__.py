@@ -1,4 +1,5 @@
 from .core import Stage, Pipeline
+from .scheduler import DagPipeline
 from .builder import PipelineBuilder
 from .config import PipelineConfig
 from .stages import (
@@ -8,12 +9,20 @@ from .stages import (
     ParseStage,
     RenderStage, 
     WriteFileStage,
-    PdfStage
+    PdfStage,
+    CopyAssetsStage,
+    OptimizeImagesStage,
+    ResolveIncludesStage,
+    DependencyFileStage,
+    PreviewStage,
+    BibliographyStage,
+    HtmlStage,
 )
 
 __all__ = [
     "Stage",
     "Pipeline",
+    "DagPipeline",
     "PipelineBuilder",
     "PipelineConfig",
     "ReadFileStage",
@@ -22,5 +31,12 @@ __all__ = [
     "ParseStage",
     "RenderStage",
     "WriteFileStage",
-    "PdfStage"
+    "PdfStage",
+    "CopyAssetsStage",
+    "OptimizeImagesStage",
+    "ResolveIncludesStage",
+    "DependencyFileStage",
+    "PreviewStage",
+    "BibliographyStage",
+    "HtmlStage",
 ]
\ No newline at end of file
@@ -1,7 +1,12 @@
 """Pipeline construction logic."""
 
+from concurrent.futures import Executor
+from typing import Optional
+
+from src.core.spill import BlockSpill
 from src.pipeline.config import PipelineConfig
 from .core import Pipeline
+from .scheduler import DagPipeline
 from .stages import (
     ReadFileStage,
     MetadataStage,
@@ -11,7 +16,14 @@ from .stages import (
     WriteFileStage,
     PdfStage,
     CopyAssetsStage,
+    OptimizeImagesStage,
+    ResolveIncludesStage,
+    DependencyFileStage,
+    PreviewStage,
+    BibliographyStage,
+    HtmlStage,
 )
+from src.utils.image_optimizer import ImageOptimizer
 
 
 class PipelineBuilder:
@@ -28,21 +40,57 @@ class PipelineBuilder:
         self.stages.extend([
             ReadFileStage(self.config.input_path),
             MetadataStage(),
-            TokenizeStage(),
+            TokenizeStage(BlockSpill(self.config.output_dir, self.config.spill_threshold)
+                          if self.config.spill_threshold else None),
             ParseStage(),
-            CopyAssetsStage(input_dir, self.config.output_dir),
-            RenderStage(),
+            ResolveIncludesStage(self.config.input_path),
+            BibliographyStage(input_dir),
+        ])
+        image_dirs = []
+        if self.config.optimize_images:
+            optimizer = ImageOptimizer(target_dpi=self.config.image_dpi)
+            self.stages.append(OptimizeImagesStage(input_dir, optimizer))
+            image_dirs.append(optimizer.cache_path)
+        self.stages.extend([
+            CopyAssetsStage(input_dir, self.config.output_dir, image_dirs=image_dirs),
+        ])
+        if self.config.preview:
+            self.stages.append(PreviewStage(self.config.output_dir,
+                                            max_workers=self.config.preview_workers,
+                                            limits=self.config.compile_limits,
+                                            cancel_token=self.config.cancel_token,
+                                            code_mode=self.config.code_mode))
+        if self.config.html:
+            self.stages.append(HtmlStage(self.config.output_dir))
+        self.stages.extend([
+            RenderStage(split=self.config.split_sections, only_sections=self.config.only_sections,
+                        toc_mode=self.config.toc_mode, code_mode=self.config.code_mode),
             WriteFileStage(self.config.output_dir),
         ])
+        if self.config.depfile:
+            self.stages.append(DependencyFileStage(list(self.stages), self.config.depfile_path,
+                                                   include_pdf=self.config.generate_pdf,
+                                                   working_dir=self.config.working_dir))
         return self
     
     def add_pdf_stage_if_needed(self) -> "PipelineBuilder":
         """Add PDF generation stage if requested."""
         if self.config.generate_pdf:
-            self.stages.append(PdfStage(self.config.output_dir))
+            self.stages.append(PdfStage(self.config.output_dir,
+                                        limits=self.config.compile_limits,
+                                        cancel_token=self.config.cancel_token,
+                                        isolated=self.config.isolated_build,
+                                        keep_log=self.config.keep_log,
+                                        on_timing=self.config.on_timing))
         return self
     
     def build(self) -> Pipeline:
         """Build the configured pipeline."""
-        return Pipeline(self.stages)
+        return Pipeline(self.stages, on_timing=self.config.on_timing)
+
+    def build_concurrent(self, max_workers: Optional[int] = None,
+                         executor: Optional[Executor] = None) -> DagPipeline:
+        """Build a pipeline that runs independent stages concurrently."""
+        return DagPipeline(self.stages, max_workers=max_workers, executor=executor,
+                           on_timing=self.config.on_timing)
 
@@ -1,11 +1,46 @@
 from pathlib import Path
+from typing import List, Optional
+
+from src.core.spill import DEFAULT_SPILL_THRESHOLD
+from src.utils.image_optimizer import DEFAULT_DPI
+from src.utils.pdf_generator import CancelToken, CompileLimits, TimingCallback
 
 class PipelineConfig:
     """Configuration for pipeline execution."""
 
-    def __init__(self, input_path: Path, output_path: Path, generate_pdf: bool = False):
+    def __init__(self, input_path: Path, output_path: Path, generate_pdf: bool = False,
+                 concurrent: bool = False, compile_limits: Optional[CompileLimits] = None,
+                 cancel_token: Optional[CancelToken] = None, isolated_build: bool = False,
+                 keep_log: bool = False, optimize_images: bool = False,
+                 image_dpi: int = DEFAULT_DPI, depfile: bool = False,
+                 depfile_path: Optional[Path] = None, split_sections: bool = False,
+                 only_sections: Optional[List[str]] = None, preview: bool = False,
+                 preview_workers: Optional[int] = None, toc_mode: str = "latex",
+                 code_mode: str = "listings", html: bool = False,
+                 on_timing: Optional[TimingCallback] = None,
+                 spill_threshold: Optional[int] = DEFAULT_SPILL_THRESHOLD,
+                 working_dir: Optional[Path] = None):
         self.input_path = input_path            # path to the input Markdown file
         self.output_path = output_path          # path to the output LaTeX file
         self.output_dir = (output_path.parent)  # directory where the output file will be saved
         self.generate_pdf = generate_pdf        # whether to generate PDF from LaTeX
+        self.concurrent = concurrent            # whether to run independent stages concurrently
+        self.compile_limits = compile_limits or CompileLimits()  # timeouts and resource limits for pdflatex
+        self.cancel_token = cancel_token or CancelToken()        # lets callers abort a running compile
+        self.isolated_build = isolated_build    # compile in a private scratch directory
+        self.keep_log = keep_log                # keep the pdflatex .log next to the PDF
+        self.optimize_images = optimize_images  # downsample and convert raster images before compiling
+        self.image_dpi = image_dpi              # target resolution of optimized images
+        self.depfile = depfile                  # whether to write a Make-compatible .d file
+        self.depfile_path = depfile_path        # where to write it (default: next to the .tex)
+        self.split_sections = split_sections    # write one \include'd .tex file per top-level section
+        self.only_sections = only_sections      # sections to compile via \includeonly (split mode)
+        self.preview = preview                  # compile one draft PDF per top-level section
+        self.preview_workers = preview_workers  # concurrent preview compiles (default: CPU count)
+        self.toc_mode = toc_mode                # "latex" (\tableofcontents) or "python" (single pass)
+        self.code_mode = code_mode              # "listings" (highlighted by TeX) or "pygments" (in Python)
+        self.html = html                        # also write a standalone HTML preview from the same AST
+        self.on_timing = on_timing              # called with (stage or pdflatex pass, seconds), e.g. for metrics
+        self.spill_threshold = spill_threshold  # code/table blocks longer than this go to side files (None: never)
+        self.working_dir = working_dir          # the user's directory, for relative paths in the depfile (None: ours)
 
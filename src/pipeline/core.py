@@ -1,21 +1,54 @@
+import re
+import time
 from abc import ABC, abstractmethod
-from typing import Any, List
+from typing import Any, List, Optional, Tuple, Type
+
+from src.core.errors import LittleTexError, wrap_errors
+from src.utils.pdf_generator import TimingCallback
 
 
 class Stage(ABC):
     """A processing stage takes an input, does work, and returns an output for the next stage."""
-    
+
+    # Named artifacts this stage consumes and produces. A linear Pipeline ignores
+    # them; the DagPipeline uses them to work out which stages can run concurrently.
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    # Artifacts that must exist before the stage runs but are not passed to it.
+    after: Tuple[str, ...] = ()
+    # What an unexpected exception from `run` is reported as (ParseError, RenderError, ...).
+    error_type: Type[LittleTexError] = LittleTexError
+
     @abstractmethod
     def run(self, data: Any) -> Any:
         pass
 
+    @property
+    def name(self) -> str:
+        """Short name used in timings, e.g. 'tokenize' for TokenizeStage."""
+        name = re.sub(r"Stage$", "", type(self).__name__)
+        return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+def run_stage(stage: Stage, data: Any, on_timing: Optional[TimingCallback] = None) -> Any:
+    """Runs one stage; any failure surfaces as a LittleTexError naming the stage."""
+    start = time.perf_counter()
+    try:
+        with wrap_errors(stage.error_type, type(stage).__name__):
+            return stage.run(data)
+    finally:
+        if on_timing is not None:
+            on_timing(stage.name, time.perf_counter() - start)
+
+
 class Pipeline:
-    def __init__(self, stages: List[Stage]):
+    def __init__(self, stages: List[Stage], on_timing: Optional[TimingCallback] = None):
         self.stages = stages
-    
+        self.on_timing = on_timing
+
     def execute(self, input_data: Any = None) -> Any:
         """Run the pipeline through all stages."""
         result = input_data
         for stage in self.stages:
-            result = stage.run(result)
-        return result
\ No newline at end of file
+            result = run_stage(stage, result, self.on_timing)
+        return result
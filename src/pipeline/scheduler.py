@@ -0,0 +1,155 @@
+"""Dependency-driven pipeline execution."""
+
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .core import Stage, TimingCallback, run_stage
+
+INPUT_ARTIFACT = "input"
+INPUT_INDEX = -1
+
+
+class DagPipeline:
+    """
+    Runs stages as a dependency graph. Each stage declares the artifacts it
+    consumes (`inputs`, `after`) and produces (`outputs`); every stage whose
+    dependencies are available is started at once on the executor.
+
+    An input refers to the latest *earlier* stage in the list that produces
+    it, so an optional stage can refine an artifact in place (e.g. consume
+    and produce "ast") and later stages pick up the refined version.
+
+    The result is the output of the last stage in the list, so a DagPipeline is
+    a drop-in replacement for a linear Pipeline built from the same stages.
+    """
+
+    def __init__(self, stages: List[Stage], max_workers: Optional[int] = None,
+                 executor: Optional[Executor] = None, on_timing: Optional[TimingCallback] = None):
+        self.stages = stages
+        self.max_workers = max_workers
+        self.on_timing = on_timing
+        # A shared executor lets several documents' pipelines overlap their I/O and CPU work.
+        self.executor = executor
+        self._sources = self._resolve()
+
+    def _resolve(self) -> List[Dict[str, int]]:
+        """
+        For every stage, map each dependency to the index of the stage producing
+        it. Rejects missing producers and dependencies on later stages, which
+        is what a cycle amounts to once inputs resolve backwards.
+        """
+        produced = {name for stage in self.stages for name in stage.outputs}
+        unknown = sorted({name for stage in self.stages for name in (*stage.inputs, *stage.after)}
+                         - produced - {INPUT_ARTIFACT})
+        if unknown:
+            raise ValueError(f"No stage produces the artifact(s): {', '.join(unknown)}")
+
+        latest: Dict[str, int] = {INPUT_ARTIFACT: INPUT_INDEX}
+        sources = []
+        for index, stage in enumerate(self.stages):
+            if not stage.outputs:
+                raise ValueError(f"{type(stage).__name__} does not declare any outputs.")
+            if INPUT_ARTIFACT in stage.outputs:
+                raise ValueError(f"Artifact '{INPUT_ARTIFACT}' is reserved for the pipeline input.")
+            stage_sources = {}
+            for name in (*stage.inputs, *stage.after):
+                if name not in latest:
+                    raise ValueError(f"Stage dependencies form a cycle: {type(stage).__name__} needs "
+                                     f"'{name}', which only a later stage produces.")
+                stage_sources[name] = latest[name]
+            sources.append(stage_sources)
+            for name in stage.outputs:
+                latest[name] = index
+        return sources
+
+    def _ready(self, index: int, finished: Set[int]) -> bool:
+        return all(producer in finished for producer in self._sources[index].values())
+
+    def _gather_input(self, index: int, artifacts: Dict[Tuple[int, str], Any]) -> Any:
+        """Build the single `data` argument passed to `Stage.run`."""
+        sources = self._sources[index]
+        values = [artifacts[(sources[name], name)] for name in self.stages[index].inputs]
+        if not values:
+            return None
+        if len(values) == 1:
+            return values[0]
+        return tuple(values)
+
+    def _store_output(self, index: int, result: Any, artifacts: Dict[Tuple[int, str], Any]) -> None:
+        outputs = self.stages[index].outputs
+        if len(outputs) == 1:
+            artifacts[(index, outputs[0])] = result
+        else:
+            artifacts.update(((index, name), value) for name, value in zip(outputs, result))
+
+    def _final_result(self, artifacts: Dict[Tuple[int, str], Any], input_data: Any) -> Any:
+        if not self.stages:
+            return input_data
+        last = len(self.stages) - 1
+        return artifacts[(last, self.stages[last].outputs[0])]
+
+    def execute(self, input_data: Any = None) -> Any:
+        """Run every stage as soon as its dependencies are available."""
+        if self.executor is not None:
+            return self._execute_on(self.executor, input_data)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return self._execute_on(executor, input_data)
+
+    def _execute_on(self, executor: Executor, input_data: Any) -> Any:
+        artifacts: Dict[Tuple[int, str], Any] = {(INPUT_INDEX, INPUT_ARTIFACT): input_data}
+        finished: Set[int] = {INPUT_INDEX}
+        pending = list(range(len(self.stages)))
+        running: Dict[Future, int] = {}
+
+        while pending or running:
+            for index in [i for i in pending if self._ready(i, finished)]:
+                pending.remove(index)
+                future = executor.submit(run_stage, self.stages[index], self._gather_input(index, artifacts),
+                                         self.on_timing)
+                running[future] = index
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception:
+                    # Stop scheduling new work and let in-flight stages finish.
+                    for other in running:
+                        other.cancel()
+                    wait(running)
+                    raise
+                self._store_output(index, result, artifacts)
+                finished.add(index)
+
+        return self._final_result(artifacts, input_data)
+
+    async def execute_async(self, input_data: Any = None) -> Any:
+        """Asyncio variant of `execute`; stages run in the loop's default executor."""
+        loop = asyncio.get_running_loop()
+        artifacts: Dict[Tuple[int, str], Any] = {(INPUT_INDEX, INPUT_ARTIFACT): input_data}
+        finished: Set[int] = {INPUT_INDEX}
+        pending = list(range(len(self.stages)))
+        running: Dict[asyncio.Future, int] = {}
+
+        while pending or running:
+            for index in [i for i in pending if self._ready(i, finished)]:
+                pending.remove(index)
+                future = loop.run_in_executor(self.executor, run_stage, self.stages[index],
+                                              self._gather_input(index, artifacts), self.on_timing)
+                running[future] = index
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception:
+                    if running:
+                        await asyncio.wait(running)
+                    raise
+                self._store_output(index, result, artifacts)
+                finished.add(index)
+
+        return self._final_result(artifacts, input_data)
@@ -1,17 +1,46 @@
-import shutil
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 from .core import Stage
-from src.core.ast import DocumentNode, ImageNode
+from src.core.ast import DocumentNode
 from src.core.tokenizer import Tokenizer, Token
 from src.core.parser import Parser
-from src.core.renderer import LatexRenderer
+from src.core.includes import IncludeResolver, ParseCache
+from src.core.citations import resolve_citations
+from src.core.errors import AssetError, CompileError, ParseError, RenderError
+from src.core.html_renderer import HtmlRenderer
+from src.core.renderer import SplitDocument, shared_renderer
+from src.core.sections import slugify, split_sections
+from src.core.spill import BlockSpill
 from src.utils.text_processing import extract_metadata
-from src.utils.pdf_generator import generate_pdf_from_latex
+from src.utils.asset_sync import SyncReport, iter_images, plan_asset_names, sync_assets
+from src.utils.bibtex import load_bibliography
+from src.utils.image_optimizer import ImageOptimizer
+from src.utils.file_io import format_depfile, is_within, write_if_changed
+from src.utils.pdf_generator import (
+    CancelToken,
+    CompileLimits,
+    PdfCancelledError,
+    TimingCallback,
+    PdfTimeoutError,
+    generate_pdf_from_latex,
+)
+
+
+def _image_source(url: str, input_dir: Path, allowed_dirs: Sequence[Path] = ()) -> Path:
+    """The file an image url points to, which must lie inside the document's directory (or `allowed_dirs`)."""
+    source = input_dir / url
+    if not any(is_within(source, directory) for directory in (input_dir, *allowed_dirs)):
+        raise AssetError(f"Image {url} is outside the document's directory.")
+    return source
 
 
 class ReadFileStage(Stage):
+    outputs = ("source",)
+    error_type = AssetError
+
     def __init__(self, path: Path):
         self.path = path
     
@@ -19,23 +48,41 @@ class ReadFileStage(Stage):
         """Read the entire markdown file as a string."""
         return self.path.read_text(encoding="utf-8")
 
+    @property
+    def dependencies(self) -> List[Path]:
+        return [self.path]
+
 
 class MetadataStage(Stage):
+    inputs = ("source",)
+    outputs = ("document",)
+    error_type = ParseError
+
     def run(self, content: str) -> Tuple[Dict[str, str], str]:
         """Extract metadata and return (metadata, clean_markdown)"""
         return extract_metadata(content)
 
 
 class TokenizeStage(Stage):
+    inputs = ("document",)
+    outputs = ("tokens",)
+    error_type = ParseError
+
+    def __init__(self, spill: Optional[BlockSpill] = None):
+        self.tokenizer = Tokenizer(spill)
+
     def run(self, data: Tuple[Dict[str, str], str]) -> Tuple[Dict[str, str], List[Token]]:
-        """Tokenize the markdown into a list of tokens."""
+        """Tokenize the markdown into a list of tokens (oversized blocks go to side files)."""
         metadata, markdown = data
-        tokenizer = Tokenizer()
-        tokens = tokenizer.tokenize(markdown)
+        tokens = self.tokenizer.tokenize(markdown)
         return metadata, tokens
 
 
 class ParseStage(Stage):
+    inputs = ("tokens",)
+    outputs = ("ast",)
+    error_type = ParseError
+
     def run(self, data: Tuple[Dict[str, str], List[Token]]) -> Tuple[Dict[str, str], DocumentNode]:
         """Parse tokens into an AST."""
         metadata, tokens = data
@@ -44,79 +91,363 @@ class ParseStage(Stage):
         return metadata, ast    
 
 
+class ResolveIncludesStage(Stage):
+    inputs = ("ast",)
+    outputs = ("ast",)
+    error_type = ParseError
+
+    def __init__(self, input_path: Path, cache: Optional[ParseCache] = None):
+        self.input_path = input_path
+        self.cache = cache
+        self.resolver: Optional[IncludeResolver] = None
+
+    def run(self, data: Tuple[Dict[str, str], DocumentNode]) -> Tuple[Dict[str, str], DocumentNode]:
+        """Splice @include:d documents into the AST and record the include graph."""
+        metadata, ast_root = data
+        self.resolver = IncludeResolver(self.input_path, self.cache)
+        return metadata, self.resolver.resolve(ast_root)
+
+    @property
+    def dependencies(self) -> List[Path]:
+        return sorted(self.resolver.files) if self.resolver else []
+
+
+class BibliographyStage(Stage):
+    inputs = ("ast",)
+    outputs = ("ast",)
+    error_type = ParseError
+
+    def __init__(self, input_dir: Path):
+        self.input_dir = input_dir
+        self.bib_path: Optional[Path] = None
+
+    def run(self, data: Tuple[Dict[str, str], DocumentNode]) -> Tuple[Dict[str, str], DocumentNode]:
+        """
+        Numbers @cite[...] references against the .bib file named by the
+        `@bibliography:` metadata key and appends the formatted reference list.
+        Everything is resolved here, so pdflatex needs no bibtex/biber runs.
+        """
+        metadata, ast_root = data
+        entries = {}
+        self.bib_path = None
+        if metadata.get("bibliography"):
+            self.bib_path = self.input_dir / metadata["bibliography"]
+            if not is_within(self.bib_path, self.input_dir):
+                raise AssetError(f"Bibliography {metadata['bibliography']} is outside the document's directory.")
+            if self.bib_path.is_file():
+                entries = load_bibliography(self.bib_path)
+            else:
+                print(f"Warning: Bibliography file not found at {self.bib_path}")
+        missing = resolve_citations(ast_root, entries, metadata.get("bibliography_title", "References"))
+        if missing:
+            print(f"Warning: Unknown citation keys: {', '.join(missing)}")
+        return metadata, ast_root
+
+    @property
+    def dependencies(self) -> List[Path]:
+        return [self.bib_path] if self.bib_path and self.bib_path.is_file() else []
+
+
 class RenderStage(Stage):
-    def __init__(self):
-        self.renderer = LatexRenderer()
+    inputs = ("ast",)
+    outputs = ("latex",)
+    error_type = RenderError
+
+    def __init__(self, split: bool = False, only_sections: Optional[List[str]] = None,
+                 toc_mode: str = "latex", code_mode: str = "listings"):
+        self.renderer = shared_renderer(toc_mode=toc_mode, code_mode=code_mode)
+        self.split = split
+        self.only_sections = only_sections
     
-    def run(self, data: Tuple[Dict[str, str], DocumentNode]) -> Tuple[Dict[str, str], str]:
-        """Render the AST and metadata to a LaTeX string."""
+    def run(self, data: Tuple[Dict[str, str], DocumentNode]) -> Tuple[Dict[str, str], Union[str, SplitDocument]]:
+        """Render the AST and metadata to a LaTeX string (or a master plus per-section files)."""
         metadata, ast = data
-        latex_document = self.renderer.render(ast, metadata)
+        if self.split:
+            directory = f"{slugify(metadata.get('title', 'output')) or 'output'}-sections"
+            latex_document = self.renderer.render_split(ast, metadata, self.only_sections, directory)
+        else:
+            latex_document = self.renderer.render(ast, metadata)
         return metadata, latex_document
 
 
+class HtmlStage(Stage):
+    inputs = ("ast",)
+    outputs = ("html",)
+    error_type = RenderError
+
+    def __init__(self, output_dir: Path):
+        self.output_dir = output_dir
+        self.renderer = HtmlRenderer()
+        self.html_path: Optional[Path] = None
+
+    def run(self, data: Tuple[Dict[str, str], DocumentNode]) -> Tuple[Dict[str, str], DocumentNode]:
+        """
+        Render the same AST to a standalone HTML preview next to the .tex file.
+        Passes the data through unchanged.
+        """
+        metadata, ast = data
+        self.html_path = self.output_dir / f"{metadata.get('title', 'output')}.html"
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if write_if_changed(self.html_path, self.renderer.render(ast, metadata)):
+            print(f"🌐 HTML preview written to {self.html_path}")
+        return metadata, ast
+
+
 class WriteFileStage(Stage):
+    inputs = ("latex",)
+    outputs = ("tex_path",)
+    error_type = AssetError
+
     def __init__(self, output_dir: Path):
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
-    def run(self, data: Tuple[Dict[str, str], str]) -> Path:
+    def run(self, data: Tuple[Dict[str, str], Union[str, SplitDocument]]) -> Path:
         """Write the LaTex string to a .tex file. Returns its path."""
         metadata, tex_content = data
         title = metadata.get("title", "output")
         tex_path = self.output_dir / f"{title}.tex"
-        tex_path.write_text(tex_content, encoding="utf-8")
-        print(f"📝 LaTeX document written to {tex_path}")
+        if isinstance(tex_content, SplitDocument):
+            changed = [name for name, content in tex_content.sections
+                       if self._write_section(name, content)]
+            if changed:
+                print(f"📝 {len(changed)} of {len(tex_content.sections)} section files updated")
+            tex_content = tex_content.master
+        if write_if_changed(tex_path, tex_content):
+            print(f"📝 LaTeX document written to {tex_path}")
+        else:
+            print(f"📝 LaTeX document unchanged: {tex_path}")
+        return tex_path
+
+    def _write_section(self, name: str, content: str) -> bool:
+        section_path = self.output_dir / f"{name}.tex"
+        section_path.parent.mkdir(parents=True, exist_ok=True)
+        return write_if_changed(section_path, content)
+
+
+class DependencyFileStage(Stage):
+    inputs = ("tex_path",)
+    outputs = ("tex_path",)
+    # Asset and include discovery must be finished before the file list is complete.
+    after = ("assets",)
+    error_type = AssetError
+
+    def __init__(self, stages: List[Stage], depfile_path: Optional[Path] = None,
+                 include_pdf: bool = False, working_dir: Optional[Path] = None):
+        self.stages = stages
+        self.depfile_path = depfile_path
+        self.include_pdf = include_pdf
+        # Paths are written relative to the directory make runs in, which for a
+        # daemon conversion is the client's, not this process's.
+        self.working_dir = working_dir
+
+    def run(self, tex_path: Path) -> Path:
+        """Write a Make-compatible .d file listing every file the output was built from."""
+        depfile_path = self.depfile_path or tex_path.with_suffix(".d")
+        targets = [tex_path]
+        if self.include_pdf:
+            targets.append(tex_path.with_suffix(".pdf"))
+        prerequisites = [path for stage in self.stages
+                         for path in getattr(stage, "dependencies", [])]
+        write_if_changed(depfile_path, format_depfile(targets, prerequisites, self.working_dir))
         return tex_path
 
 
 class PdfStage(Stage):
-    def __init__(self, output_dir: Path):
+    inputs = ("tex_path",)
+    outputs = ("pdf_path",)
+    # pdflatex needs the images in place, but not the data CopyAssetsStage passes on.
+    after = ("assets",)
+    error_type = CompileError
+
+    def __init__(self, output_dir: Path, limits: Optional[CompileLimits] = None,
+                 cancel_token: Optional[CancelToken] = None, isolated: bool = False,
+                 keep_log: bool = False, on_timing: Optional[TimingCallback] = None):
         self.output_dir = output_dir
+        self.limits = limits
+        self.cancel_token = cancel_token
+        self.isolated = isolated
+        self.keep_log = keep_log
+        self.on_timing = on_timing
         
     def run(self, tex_path: Path) -> Path:
         """Compile the .tex file file into a PDF and return its path."""
-        success, pdf_path_or_error = generate_pdf_from_latex(tex_path)
+        success, pdf_path_or_error = generate_pdf_from_latex(
+            tex_path, self.limits, self.cancel_token,
+            isolated=self.isolated, keep_log=self.keep_log, on_timing=self.on_timing,
+        )
         if not success:
-            raise RuntimeError(f"Failed to generate PDF: {pdf_path_or_error}")
+            raise CompileError(f"Failed to generate PDF: {pdf_path_or_error}")
         
         # pdf_path_or_error is now the actual path when success is True
         pdf_path = Path(pdf_path_or_error) if pdf_path_or_error else tex_path.with_suffix('.pdf')
         return pdf_path
         
 
+class OptimizeImagesStage(Stage):
+    inputs = ("ast",)
+    outputs = ("ast",)
+    error_type = AssetError
+
+    def __init__(self, input_dir: Path, optimizer: Optional[ImageOptimizer] = None):
+        self.input_dir = input_dir
+        self.optimizer = optimizer or ImageOptimizer()
+        self.sources: List[Path] = []
+
+    def run(self, data: Tuple[Dict[str, str], DocumentNode]) -> Tuple[Dict[str, str], DocumentNode]:
+        """Point image nodes at downsampled, pdflatex-friendly derivatives."""
+        metadata, ast_root = data
+        if not self.optimizer.available:
+            print("Warning: Pillow is not installed, skipping image optimization.")
+            return metadata, ast_root
+
+        optimizer = self.optimizer
+        dpi = self._metadata_dpi(metadata)
+        if dpi is not None:
+            optimizer = ImageOptimizer(self.optimizer.cache_path, dpi,
+                                       self.optimizer.display_width_in, self.optimizer.jpeg_quality)
+
+        self.sources = []
+        for node in iter_images(ast_root):
+            source = _image_source(node.url, self.input_dir)
+            if source.is_file():
+                self.sources.append(source)
+                derivative = optimizer.optimize(source)
+                if derivative != source:
+                    node.url = str(derivative)
+        return metadata, ast_root
+
+    def _metadata_dpi(self, metadata: Dict[str, str]) -> Optional[int]:
+        """The `@image_dpi` override, or None (with a warning) if it is missing or not a positive number."""
+        value = metadata.get("image_dpi")
+        if value is None:
+            return None
+        try:
+            dpi = int(value)
+        except ValueError:
+            dpi = 0
+        if dpi <= 0:
+            print(f"Warning: Ignoring @image_dpi '{value}', it must be a positive whole number; "
+                  f"using {self.optimizer.target_dpi}.")
+            return None
+        return dpi
+
+    @property
+    def dependencies(self) -> List[Path]:
+        return self.sources
+
+
+class PreviewStage(Stage):
+    inputs = ("ast",)
+    outputs = ("preview",)
+    # The previews include the images, so they must be in place first.
+    after = ("assets",)
+    error_type = RenderError
+
+    def __init__(self, output_dir: Path, max_workers: Optional[int] = None,
+                 limits: Optional[CompileLimits] = None, cancel_token: Optional[CancelToken] = None,
+                 code_mode: str = "listings"):
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.code_mode = code_mode
+        self.limits = limits
+        self.cancel_token = cancel_token
+        self.manifest_path: Optional[Path] = None
+
+    def run(self, data: Tuple[Dict[str, str], DocumentNode]) -> Tuple[Dict[str, str], DocumentNode]:
+        """
+        Renders every top-level section as its own small document and compiles
+        them concurrently into draft PDFs, plus a manifest.json mapping headings
+        to files. Passes the data through unchanged.
+        """
+        metadata, ast_root = data
+        title = metadata.get("title", "output")
+        preview_dir = self.output_dir / f"{slugify(title) or 'output'}-preview"
+        preview_dir.mkdir(parents=True, exist_ok=True)
+
+        asset_names = plan_asset_names(ast_root)
+        _, sections = split_sections(ast_root)
+        jobs = []
+        for section in sections:
+            document = DocumentNode()
+            document.children = section.nodes
+            extra_preamble = [
+                "\\graphicspath{{../}}",  # images live next to the main .tex file
+                "\\makeatletter\\def\\input@path{{../}}\\makeatother",  # and so do spilled blocks
+                f"\\setcounter{{section}}{{{section.index - 1}}}",
+            ]
+            tex_content = shared_renderer(code_mode=self.code_mode).render(
+                document, metadata, extra_preamble, asset_names)
+            tex_path = preview_dir / f"{section.name}.tex"
+            write_if_changed(tex_path, tex_content)
+            jobs.append((section, tex_path))
+
+        entries = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._compile, tex_path): (section, tex_path)
+                       for section, tex_path in jobs}
+            for future in as_completed(futures):
+                section, tex_path = futures[future]
+                error = future.result()
+                entries[section.index] = {
+                    "index": section.index,
+                    "heading": section.heading.text,
+                    "tex": tex_path.name,
+                    "pdf": None if error else tex_path.with_suffix(".pdf").name,
+                    "error": error,
+                }
+                print(f"👀 Preview {'failed' if error else 'ready'}: {section.heading.text}")
+
+        manifest = {"title": title, "sections": [entries[i] for i in sorted(entries)]}
+        self.manifest_path = preview_dir / "manifest.json"
+        write_if_changed(self.manifest_path, json.dumps(manifest, indent=2))
+        return metadata, ast_root
+
+    def _compile(self, tex_path: Path) -> Optional[str]:
+        """Compiles one preview in a single pass; returns an error message or None."""
+        try:
+            success, pdf_path_or_error = generate_pdf_from_latex(
+                tex_path, self.limits, self.cancel_token, passes=1)
+        except (PdfTimeoutError, PdfCancelledError) as e:
+            return str(e)
+        return None if success else pdf_path_or_error
+
+
 class CopyAssetsStage(Stage):
-    def __init__(self, input_dir: Path, output_dir: Path):
+    inputs = ("ast",)
+    outputs = ("assets",)
+    error_type = AssetError
+
+    def __init__(self, input_dir: Path, output_dir: Path, max_workers: Optional[int] = None,
+                 image_dirs: Sequence[Path] = ()):
         self.input_dir = input_dir
         self.output_dir = output_dir
+        self.max_workers = max_workers
+        # Where images may come from besides the document's directory (the optimizer's cache).
+        self.image_dirs = list(image_dirs)
+        self.report: Optional[SyncReport] = None
+        self.asset_names: Dict[str, str] = {}
 
     def run(self, data: Tuple[Dict[str, str], DocumentNode]) -> Tuple[Dict[str, str], DocumentNode]:
         """
-        Scans the AST for image nodes and copies the image files to the output directory.
+        Syncs the images referenced in the AST into the output directory.
         """
         metadata, ast_root = data
-        self._find_and_copy_images(ast_root)
+        names = plan_asset_names(ast_root)
+        # Checked before anything is copied: uploaded documents must not pull in server files.
+        pairs = [(_image_source(url, self.input_dir, self.image_dirs), self.output_dir / name)
+                 for url, name in names.items()]
+        self.asset_names = names
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.report = sync_assets(pairs, self.max_workers)
+
+        for source in self.report.missing:
+            print(f"Warning: Image file not found at {source}")
+        if pairs:
+            print(f"> Assets: {self.report.summary()}")
         # Pass the data through to the next stage unmodified.
         return metadata, ast_root
 
-    def _find_and_copy_images(self, node: Any):
-        """Recursively traverses the AST to find and copy images."""
-        if isinstance(node, DocumentNode):
-            for child in node.children:
-                self._find_and_copy_images(child)
-        elif hasattr(node, "children"):
-            for child in node.children:
-                self._find_and_copy_images(child)
-        elif isinstance(node, ImageNode):
-            # We have an image. Construct the source path and copy it.
-            source_path = self.input_dir / node.url
-            dest_path = self.output_dir / Path(node.url).name
-
-            if source_path.resolve() != dest_path.resolve():
-                if source_path.is_file():
-                    print(f"> Copying asset: {source_path} to {dest_path}")
-                    shutil.copy(source_path, dest_path)
-                else:
-                    print(f"Warning: Image file not found at {source_path}")
-            else:
-                print(f"> Asset already in destination, skipping copy: {source_path}")
\ No newline at end of file
+    @property
+    def dependencies(self) -> List[Path]:
+        return self.report.sources if self.report else []
@@ -0,0 +1,138 @@
+"""Incremental, parallel syncing of image assets into the output directory."""
+
+import hashlib
+import os
+import posixpath
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.core import ast
+from src.utils.cache import hash_file
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+# ioctl request number for FICLONE (copy-on-write clone) on Linux.
+FICLONE = getattr(fcntl, "FICLONE", 0x40049409)
+
+
+def iter_images(node: ast.Node) -> Iterator[ast.ImageNode]:
+    """Yields every ImageNode in the tree, in document order."""
+    if isinstance(node, ast.ImageNode):
+        yield node
+        return
+    for child in getattr(node, "children", []):
+        yield from iter_images(child)
+    for item in getattr(node, "items", []):
+        yield from iter_images(item)
+
+
+def plan_asset_names(document: ast.Node) -> Dict[str, str]:
+    """
+    Maps each image url to the file name it gets in the output directory.
+    Images keep their base name unless another image already claimed it, in
+    which case a short hash of the url is appended. The mapping only depends
+    on the document, so the renderer and the asset stage agree on it.
+    """
+    names: Dict[str, str] = {}
+    taken: Dict[str, str] = {}
+    for image in iter_images(document):
+        url = posixpath.normpath(image.url.replace("\\", "/"))
+        if image.url in names:
+            continue
+        name = Path(url).name
+        if taken.get(name, url) != url:
+            digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:8]
+            name = f"{Path(name).stem}-{digest}{Path(name).suffix}"
+        taken[name] = url
+        names[image.url] = name
+    return names
+
+
+def is_up_to_date(source: Path, dest: Path) -> bool:
+    """Cheap size/mtime check first; only hash when the mtimes disagree."""
+    try:
+        src_stat, dst_stat = source.stat(), dest.stat()
+    except FileNotFoundError:
+        return False
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if (src_stat.st_dev, src_stat.st_ino) == (dst_stat.st_dev, dst_stat.st_ino):
+        return True
+    if int(src_stat.st_mtime) == int(dst_stat.st_mtime):
+        return True
+    if hash_file(source) == hash_file(dest):
+        # Same content; align the mtime so the next check is cheap again.
+        shutil.copystat(source, dest)
+        return True
+    return False
+
+
+def _reflink(source: Path, dest: Path) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(source, "rb") as src, open(dest, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError:
+        dest.unlink(missing_ok=True)
+        return False
+    shutil.copystat(source, dest)
+    return True
+
+
+def _place(source: Path, dest: Path) -> str:
+    """Puts one asset in place, preferring a reflink, then a hardlink, then a copy."""
+    if is_up_to_date(source, dest):
+        return "unchanged"
+    dest.unlink(missing_ok=True)
+    if source.stat().st_dev == dest.parent.stat().st_dev:
+        if _reflink(source, dest):
+            return "linked"
+        try:
+            os.link(source, dest)
+            return "linked"
+        except OSError:
+            pass
+    shutil.copy2(source, dest)
+    return "copied"
+
+
+class SyncReport:
+    """Outcome of an asset sync, one list of destination paths per result."""
+
+    def __init__(self):
+        self.copied: List[Path] = []
+        self.linked: List[Path] = []
+        self.unchanged: List[Path] = []
+        self.missing: List[Path] = []
+        self.sources: List[Path] = []  # every source file that was found
+
+    def summary(self) -> str:
+        return (f"{len(self.copied)} copied, {len(self.linked)} linked, "
+                f"{len(self.unchanged)} unchanged, {len(self.missing)} missing")
+
+
+def sync_assets(pairs: List[Tuple[Path, Path]], max_workers: Optional[int] = None) -> SyncReport:
+    """Syncs (source, dest) pairs in parallel, skipping destinations that are already current."""
+    report = SyncReport()
+    todo = []
+    for source, dest in pairs:
+        if not source.is_file():
+            report.missing.append(source)
+        elif source.resolve() == dest.resolve():
+            report.sources.append(source)
+            report.unchanged.append(dest)
+        else:
+            report.sources.append(source)
+            todo.append((source, dest))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        outcomes = executor.map(lambda pair: _place(*pair), todo)
+        for (_, dest), outcome in zip(todo, outcomes):
+            getattr(report, outcome).append(dest)
+    return report
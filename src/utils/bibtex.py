@@ -0,0 +1,163 @@
+"""A small BibTeX reader, so citations can be formatted without bibtex/biber runs."""
+
+import json
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.core.errors import ParseError
+from src.utils.cache import cache_dir, hash_bytes
+from src.utils.file_io import write_if_changed
+
+ENTRY_START = re.compile(r"@\s*([A-Za-z]+)\s*[{(]")
+# Bump when the parsed representation changes, so stale disk cache entries are ignored.
+CACHE_VERSION = "1"
+
+
+class BibEntry:
+    """A single bibliography entry (e.g. @article{key, ...})."""
+
+    def __init__(self, entry_type: str, key: str, fields: Dict[str, str]):
+        self.entry_type = entry_type.lower()
+        self.key = key
+        self.fields = fields  # lower-case field name -> raw LaTeX value
+
+    def get(self, field: str, default: str = "") -> str:
+        return self.fields.get(field, default)
+
+
+class BibParseError(ParseError, ValueError):
+    """Raised for .bib content that cannot be read."""
+
+
+def _read_braced(text: str, start: int) -> int:
+    """Returns the index just past the brace group that opens at `start`."""
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == "{":
+            depth += 1
+        elif text[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    raise BibParseError("Unbalanced braces in .bib file")
+
+
+def _read_value(text: str, pos: int, strings: Dict[str, str]):
+    """Reads a field value (braced, quoted, number or @string macro, joined with #)."""
+    parts: List[str] = []
+    while True:
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos >= len(text):
+            raise BibParseError("Unexpected end of .bib file")
+        char = text[pos]
+        if char == "{":
+            end = _read_braced(text, pos)
+            parts.append(text[pos + 1:end - 1])
+            pos = end
+        elif char == '"':
+            end, depth = pos + 1, 0
+            while end < len(text) and not (text[end] == '"' and depth == 0):
+                depth += {"{": 1, "}": -1}.get(text[end], 0)
+                end += 1
+            parts.append(text[pos + 1:end])
+            pos = end + 1
+        else:
+            match = re.compile(r"[^\s,#})]+").match(text, pos)
+            if not match:
+                raise BibParseError(f"Unexpected character {char!r} in .bib file")
+            word = match.group(0)
+            parts.append(strings.get(word.lower(), word))
+            pos = match.end()
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos < len(text) and text[pos] == "#":
+            pos += 1
+            continue
+        return " ".join(" ".join(parts).split()), pos
+
+
+def parse_bibtex(text: str) -> Dict[str, BibEntry]:
+    """Parses .bib content into entries keyed by citation key."""
+    entries: Dict[str, BibEntry] = {}
+    strings: Dict[str, str] = {}
+    pos = 0
+    while True:
+        match = ENTRY_START.search(text, pos)
+        if not match:
+            return entries
+        entry_type = match.group(1).lower()
+        pos = match.end()
+        if entry_type in ("comment", "preamble"):
+            pos = _read_braced(text, match.end() - 1) if text[match.end() - 1] == "{" else pos
+            continue
+
+        fields: Dict[str, str] = {}
+        key = ""
+        if entry_type != "string":
+            key_match = re.compile(r"\s*([^,\s]+)\s*,").match(text, pos)
+            if not key_match:
+                raise BibParseError(f"Missing citation key near: {text[pos:pos + 30]!r}")
+            key = key_match.group(1)
+            pos = key_match.end()
+
+        while True:
+            field_match = re.compile(r"\s*([A-Za-z][\w:-]*)\s*=").match(text, pos)
+            if not field_match:
+                break
+            value, pos = _read_value(text, field_match.end(), strings)
+            fields[field_match.group(1).lower()] = value
+            while pos < len(text) and (text[pos].isspace() or text[pos] == ","):
+                pos += 1
+
+        close = re.compile(r"\s*[})]").match(text, pos)
+        if not close:
+            raise BibParseError(f"Malformed entry '{key or entry_type}' in .bib file")
+        pos = close.end()
+
+        if entry_type == "string":
+            strings.update(fields)
+        else:
+            entries[key] = BibEntry(entry_type, key, fields)
+
+
+MEMORY_CACHE_ENTRIES = 32
+_memory_cache: "OrderedDict[str, Dict[str, BibEntry]]" = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def load_bibliography(path: Path, use_disk_cache: bool = True) -> Dict[str, BibEntry]:
+    """Loads a .bib file, reusing earlier parses of identical content from memory or disk."""
+    return parse_bibliography(Path(path).read_text(encoding="utf-8"), use_disk_cache)
+
+
+def parse_bibliography(text: str, use_disk_cache: bool = True) -> Dict[str, BibEntry]:
+    """Like parse_bibtex, but cached by content hash in memory and (optionally) on disk."""
+    key = hash_bytes(f"{CACHE_VERSION}:{text}")
+    with _memory_lock:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            return _memory_cache[key]
+
+    cache_file: Optional[Path] = cache_dir("bib") / f"{key}.json" if use_disk_cache else None
+    entries = None
+    if cache_file is not None and cache_file.exists():
+        try:
+            raw = json.loads(cache_file.read_text(encoding="utf-8"))
+            entries = {k: BibEntry(e["type"], k, e["fields"]) for k, e in raw.items()}
+        except (ValueError, KeyError):
+            entries = None
+    if entries is None:
+        entries = parse_bibtex(text)
+        if cache_file is not None:
+            raw = {k: {"type": e.entry_type, "fields": e.fields} for k, e in entries.items()}
+            write_if_changed(cache_file, json.dumps(raw))
+
+    with _memory_lock:
+        _memory_cache[key] = entries
+        while len(_memory_cache) > MEMORY_CACHE_ENTRIES:
+            _memory_cache.popitem(last=False)
+    return entries
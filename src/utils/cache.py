@@ -0,0 +1,34 @@
+"""Locations and helpers for LittleTex's on-disk caches."""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Union
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def cache_dir(name: str) -> Path:
+    """Returns (and creates) a named cache directory, honouring LITTLETEX_CACHE_DIR and XDG_CACHE_HOME."""
+    root = os.getenv("LITTLETEX_CACHE_DIR")
+    if root:
+        base = Path(root)
+    else:
+        base = Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache") / "littletex"
+    path = base / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def hash_bytes(data: Union[bytes, str]) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
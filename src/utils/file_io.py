@@ -0,0 +1,66 @@
+"""Atomic, change-aware file writes."""
+
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+
+def write_if_changed(path: Path, content: Union[str, bytes], encoding: str = "utf-8") -> bool:
+    """
+    Atomically replaces `path` with `content`. If the file already holds exactly
+    these bytes it is left untouched, so its mtime does not trigger rebuilds.
+    Returns True if the file was written.
+    """
+    data = content.encode(encoding) if isinstance(content, str) else content
+    path = Path(path)
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+
+    # Unlike mkstemp, a plain open() honours the umask, so the file keeps normal permissions.
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return True
+
+
+def is_within(path: Path, directory: Path) -> bool:
+    """True if `path` (resolved, so symlinks and '..' are followed) lies inside `directory`."""
+    try:
+        Path(path).resolve().relative_to(Path(directory).resolve())
+    except ValueError:
+        return False
+    return True
+
+
+def _make_escape(path: Path, start: Optional[Path] = None) -> str:
+    """Escapes a path, relative to `start` (default: the working directory), for use in a Makefile rule."""
+    try:
+        text = os.path.relpath(path, start)
+    except ValueError:  # different drive on Windows
+        text = str(path)
+    text = text.replace(os.sep, "/")
+    return text.replace("$", "$$").replace("#", "\\#").replace(" ", "\\ ")
+
+
+def format_depfile(targets: Iterable[Path], prerequisites: Iterable[Path],
+                   start: Optional[Path] = None) -> str:
+    """
+    Formats a Make-compatible dependency file, with paths relative to `start`
+    (the directory make runs in; default: the working directory). Like
+    `gcc -MP`, every prerequisite also gets an empty rule so deleting it does
+    not break make.
+    """
+    prereqs: List[str] = list(dict.fromkeys(_make_escape(p, start) for p in prerequisites))
+    lines = [" ".join(_make_escape(t, start) for t in targets) + ":" + "".join(f" \\\n  {p}" for p in prereqs)]
+    lines.extend(f"\n{p}:" for p in prereqs)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,120 @@
+"""Syntax highlighting of code blocks in Python (Pygments), so pdflatex does not have to."""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from pygments import highlight
+from pygments.formatters import LatexFormatter
+from pygments.lexers import TextLexer, get_lexer_by_name
+from pygments.util import ClassNotFound
+
+from src.utils.cache import cache_dir, hash_bytes
+from src.utils.file_io import write_if_changed
+
+HIGHLIGHT_STYLE = "default"
+# Bump when the formatter options below change, so old cached output is not reused.
+CACHE_VERSION = "1"
+
+# Verbatim settings shared by every block, so the cached blocks only depend on the code.
+# They mirror the look of LISTINGS_PREAMBLE in the renderer.
+FANCYVRB_SETTINGS = (
+    "\\fvset{frame=single,framerule=0.2pt,rulecolor=\\color{black!20},fontsize=\\small,"
+    "numbers=left,numbersep=5pt,breaklines=true,tabsize=2}"
+)
+
+
+def highlight_preamble(style: str = HIGHLIGHT_STYLE) -> str:
+    """Packages and \\PY color macros needed by highlighted blocks."""
+    return "\n".join([
+        "\\usepackage{fvextra}",
+        "\\usepackage{xcolor}",
+        FANCYVRB_SETTINGS,
+        LatexFormatter(style=style).get_style_defs(),
+    ])
+
+
+class HighlightCache:
+    """
+    Thread-safe LRU cache of highlighted blocks keyed by (language, content
+    hash), backed by files in the littletex cache directory so repeated
+    builds skip Pygments entirely.
+    """
+
+    def __init__(self, max_entries: int = 1024, cache_path: Optional[Path] = None,
+                 use_disk: bool = True):
+        self.max_entries = max_entries
+        self.cache_path = cache_path
+        self.use_disk = use_disk
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def highlight(self, code: str, language: str) -> str:
+        """Returns a pre-colored Verbatim environment for `code`."""
+        language = (language or "text").lower()
+        key = hash_bytes(f"{CACHE_VERSION}:{language}:{code}")
+        with self._lock:
+            latex = self._entries.get(key)
+            if latex is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return latex
+
+        disk_file = self._disk_file(key)
+        if disk_file is not None and disk_file.exists():
+            latex = disk_file.read_text(encoding="utf-8")
+        else:
+            latex = self._format(code, language)
+            if disk_file is not None:
+                write_if_changed(disk_file, latex)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = latex
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return latex
+
+    def _disk_file(self, key: str) -> Optional[Path]:
+        if not self.use_disk:
+            return None
+        if self.cache_path is None:
+            self.cache_path = cache_dir("highlight")
+        return self.cache_path / f"{key}.tex"
+
+    @staticmethod
+    def _format(code: str, language: str) -> str:
+        return highlight(code, _lexer(language), LatexFormatter(style=HIGHLIGHT_STYLE)).rstrip("\n")
+
+
+def _lexer(language: str):
+    try:
+        return get_lexer_by_name((language or "text").lower())
+    except ClassNotFound:
+        return TextLexer()
+
+
+def highlight_file(source: Path, language: str, target: Path) -> None:
+    """
+    Highlights a code file into a LaTeX file for \\input. Used for blocks too
+    big for the cache; Pygments lexes the whole text at once, but the output
+    is written straight to `target`.
+    """
+    code = source.read_text(encoding="utf-8")
+    temp_path = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_path, "w", encoding="utf-8") as out:
+            highlight(code, _lexer(language), LatexFormatter(style=HIGHLIGHT_STYLE), out)
+        os.replace(temp_path, target)
+    except BaseException:
+        if temp_path.exists():
+            os.remove(temp_path)
+        raise
+
+
+# Shared across renderers so long-running processes reuse highlighted blocks.
+HIGHLIGHT_CACHE = HighlightCache()
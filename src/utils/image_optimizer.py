@@ -0,0 +1,113 @@
+"""Downsampling and re-encoding of raster images before they reach pdflatex."""
+
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from src.utils.cache import cache_dir, hash_bytes, hash_file
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it images are used as-is
+    Image = None
+
+# \includegraphics[width=0.8\textwidth] in the default article layout (345pt text width).
+DEFAULT_DISPLAY_WIDTH_IN = 0.8 * 345 / 72.27
+DEFAULT_DPI = 150
+DEFAULT_JPEG_QUALITY = 85
+
+# pdflatex cannot include these at all; they are converted to PNG.
+CONVERT_TO_PNG = {".gif", ".bmp", ".tif", ".tiff", ".webp"}
+# JPEGs are embedded by pdflatex as-is, so they only need work when oversized.
+JPEG_EXTENSIONS = {".jpg", ".jpeg"}
+RASTER_EXTENSIONS = CONVERT_TO_PNG | JPEG_EXTENSIONS | {".png"}
+# Bump when the processing below changes, so old derivatives are not reused.
+CACHE_VERSION = "1"
+
+
+def _png_is_slow(image) -> bool:
+    """
+    pdflatex can copy 8-bit, non-interlaced PNGs without gamma information
+    straight into the PDF; anything else is decoded and re-encoded in TeX.
+    """
+    return bool(image.info.get("interlace") or "gamma" in image.info
+                or image.mode not in ("1", "L", "P", "RGB", "RGBA", "LA"))
+
+
+class ImageOptimizer:
+    """Produces cached, right-sized derivatives of raster images."""
+
+    def __init__(
+        self,
+        cache_path: Optional[Path] = None,
+        target_dpi: int = DEFAULT_DPI,
+        display_width_in: float = DEFAULT_DISPLAY_WIDTH_IN,
+        jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+    ):
+        self.cache_path = cache_path or cache_dir("images")
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        self.target_dpi = target_dpi
+        self.display_width_in = display_width_in
+        self.jpeg_quality = jpeg_quality
+
+    @property
+    def available(self) -> bool:
+        return Image is not None
+
+    @property
+    def max_width_px(self) -> int:
+        return round(self.display_width_in * self.target_dpi)
+
+    def optimize(self, source: Path) -> Path:
+        """Returns the path of an optimized derivative, or `source` if it is already fine."""
+        extension = source.suffix.lower()
+        if Image is None or extension not in RASTER_EXTENSIONS:
+            return source
+
+        params = f"{CACHE_VERSION}:{self.max_width_px}:{self.jpeg_quality}"
+        key = hash_bytes(f"{hash_file(source)}:{params}")[:16]
+        target_extension = ".png" if extension in CONVERT_TO_PNG else extension
+        derivative = self.cache_path / f"{source.stem}-{key}{target_extension}"
+        if derivative.exists():
+            return derivative
+        # Records that the image needs no work, so it is not decoded again on the next build.
+        as_is = self.cache_path / f"{source.stem}-{key}.as-is"
+        if as_is.exists():
+            return source
+
+        try:
+            result = self._write_derivative(source, derivative, extension, target_extension)
+            if result == source:
+                as_is.touch()
+            return result
+        except OSError as e:
+            # Unreadable or truncated images are left for pdflatex to report.
+            print(f"Warning: Could not optimize image {source}: {e}")
+            return source
+
+    def _write_derivative(self, source: Path, derivative: Path, extension: str,
+                          target_extension: str) -> Path:
+        with Image.open(source) as image:
+            too_wide = image.width > self.max_width_px
+            if not too_wide and extension in JPEG_EXTENSIONS:
+                return source
+            if not too_wide and extension == ".png" and not _png_is_slow(image):
+                return source
+
+            image.seek(0)  # first frame of animated GIF/WebP
+            has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+            if image.mode not in ("1", "L", "RGB", "RGBA", "LA"):
+                image = image.convert("RGBA" if has_alpha else "RGB")
+            if too_wide:
+                height = max(1, round(image.height * self.max_width_px / image.width))
+                image = image.resize((self.max_width_px, height), Image.LANCZOS)
+
+            # Write under a temporary name so concurrent builds never see a partial file.
+            temp_path = derivative.with_name(f".{derivative.name}.{os.getpid()}.{threading.get_ident()}")
+            if target_extension in JPEG_EXTENSIONS:
+                image.convert("RGB").save(temp_path, "JPEG", quality=self.jpeg_quality, optimize=True)
+            else:
+                image.save(temp_path, "PNG", optimize=True)
+        os.replace(temp_path, derivative)
+        return derivative
@@ -1,66 +1,323 @@
 import subprocess
 import os
-from typing import Optional, Tuple
+import re
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
 
-def generate_pdf_from_latex(tex_file: str) -> Tuple[bool, Optional[str]]:
+from src.core.errors import CompileError
+from src.core.spill import SPILL_DIR
+
+# Called with a stage (or pdflatex pass) name and its duration in seconds.
+TimingCallback = Callable[[str, float], None]
+
+# How often a running pdflatex is checked for cancellation and deadlines.
+POLL_INTERVAL = 0.1
+# How long pdflatex gets to exit after SIGTERM before it is killed.
+KILL_GRACE_PERIOD = 2.0
+# Commands whose output depends on the .aux/.toc files of a previous pass. With
+# \includeonly the excluded sections' counters and labels come from their own .aux
+# files, which pdflatex only reads through the master .aux that the first pass writes.
+SECOND_PASS_COMMANDS = re.compile(
+    r"\\(?:tableofcontents|listoffigures|listoftables|ref|pageref|eqref|autoref|nameref|cite"
+    r"|includeonly)\b"
+    r"|\\hyperref\["
+)
+INCLUDED_FILES = re.compile(r"\\(?:include|input)\{([^}]+)\}")
+# Files pdflatex writes next to the .tex file.
+BUILD_EXTENSIONS = [".pdf", ".aux", ".log", ".out", ".toc"]
+
+
+class PdfTimeoutError(CompileError, TimeoutError):
+    """Raised when pdflatex runs past its per-pass or overall time limit."""
+
+
+class PdfCancelledError(CompileError, RuntimeError):
+    """Raised when a compile is aborted through its CancelToken."""
+
+
+class CancelToken:
+    """A handle that lets another thread abort a running compile."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class CompileLimits:
+    """Time and resource limits applied to each pdflatex run."""
+
+    def __init__(
+        self,
+        pass_timeout: Optional[float] = None,
+        total_timeout: Optional[float] = None,
+        memory_limit_mb: Optional[int] = None,
+        cpu_time_limit: Optional[int] = None,
+    ):
+        self.pass_timeout = pass_timeout        # seconds allowed for a single pdflatex pass
+        self.total_timeout = total_timeout      # seconds allowed for all passes together
+        self.memory_limit_mb = memory_limit_mb  # address space limit for the child process
+        self.cpu_time_limit = cpu_time_limit    # CPU seconds limit for the child process
+
+
+def _limited_command(command: List[str], limits: CompileLimits) -> List[str]:
+    """
+    Wraps the command in a shell that sets the resource limits and then execs
+    it. A preexec_fn would do the same in the forked child, but it is unsafe
+    while other threads run (web jobs, stage pools, the daemon).
+    """
+    if os.name != "posix" or not (limits.memory_limit_mb or limits.cpu_time_limit):
+        return command
+    settings = []
+    if limits.memory_limit_mb:
+        settings.append(f"ulimit -v {int(limits.memory_limit_mb) * 1024}")
+    if limits.cpu_time_limit:
+        settings.append(f"ulimit -t {int(limits.cpu_time_limit)}")
+    return ["/bin/sh", "-c", " && ".join(settings) + ' && exec "$@"', command[0], *command]
+
+
+def _kill_process_group(process: subprocess.Popen) -> None:
+    """Terminates pdflatex and anything it spawned, then reaps it."""
+    if hasattr(os, "killpg"):
+        for sig, grace in ((signal.SIGTERM, KILL_GRACE_PERIOD), (signal.SIGKILL, None)):
+            try:
+                os.killpg(process.pid, sig)
+            except ProcessLookupError:
+                break
+            try:
+                process.communicate(timeout=grace)
+                break
+            except subprocess.TimeoutExpired:
+                continue
+    else:
+        process.kill()
+        process.communicate()
+
+
+def _run_pass(
+    command: List[str],
+    cwd: str,
+    limits: CompileLimits,
+    cancel_token: Optional[CancelToken],
+    deadline: Optional[float],
+) -> subprocess.CompletedProcess:
+    """Runs one pdflatex pass, enforcing the deadlines and the cancel token."""
+    if limits.pass_timeout is not None:
+        pass_deadline = time.monotonic() + limits.pass_timeout
+        deadline = pass_deadline if deadline is None else min(deadline, pass_deadline)
+
+    process = subprocess.Popen(
+        _limited_command(command, limits),
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True,  # own process group, so the whole tree can be killed
+    )
+    while True:
+        try:
+            stdout, stderr = process.communicate(timeout=POLL_INTERVAL)
+        except subprocess.TimeoutExpired:
+            pass
+        else:
+            if hasattr(signal, "SIGXCPU") and process.returncode == -signal.SIGXCPU:
+                raise PdfTimeoutError("pdflatex exceeded its CPU time limit.")
+            return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+        if cancel_token is not None and cancel_token.cancelled:
+            _kill_process_group(process)
+            raise PdfCancelledError("PDF generation was cancelled.")
+        if deadline is not None and time.monotonic() >= deadline:
+            _kill_process_group(process)
+            raise PdfTimeoutError("pdflatex did not finish within the configured time limit.")
+
+
+def _remove_files(tex_dir: str, stem: str, extensions: List[str]) -> None:
+    for ext in extensions:
+        aux_path = os.path.join(tex_dir, stem + ext)
+        if os.path.exists(aux_path):
+            try:
+                os.remove(aux_path)
+            except PermissionError:
+                print(f"Warning: Could not delete auxiliary file {stem + ext}. It may be in use.")
+
+
+def required_passes(tex_file: str) -> int:
+    """
+    Two pdflatex passes are only needed when the document reads back what the
+    first pass wrote to the .aux/.toc files (contents lists, cross-references).
+    Files pulled in with \\include/\\input are checked too, except the spilled
+    code and table blocks: they only hold block content and can be large.
+    """
+    tex_dir = os.path.dirname(tex_file) or "."
+    pending, seen = [tex_file], set()
+    while pending:
+        path = pending.pop()
+        if path in seen or not os.path.exists(path):
+            continue
+        seen.add(path)
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if SECOND_PASS_COMMANDS.search(line):
+                    return 2
+                for name in INCLUDED_FILES.findall(line):
+                    if not name.startswith(SPILL_DIR + "/"):
+                        pending.append(os.path.join(tex_dir, name if name.endswith(".tex") else name + ".tex"))
+    return 1
+
+
+def scratch_root() -> Optional[str]:
+    """
+    Returns the directory private build directories are created in: the
+    LITTLETEX_SCRATCH_DIR override, else a RAM-backed tmpfs if one is
+    writable, else None for the system default temp directory.
+    """
+    for candidate in (os.getenv("LITTLETEX_SCRATCH_DIR"), "/dev/shm"):
+        if candidate and os.path.isdir(candidate) and os.access(candidate, os.W_OK):
+            return candidate
+    return None
+
+
+def _link_inputs(source_dir: str, work_dir: str, stem: str) -> None:
+    """Makes the .tex file and its assets visible inside the scratch directory."""
+    outputs = {stem + ext for ext in BUILD_EXTENSIONS}
+    for entry in os.scandir(source_dir):
+        if entry.name in outputs:
+            continue
+        target = os.path.join(work_dir, entry.name)
+        try:
+            os.symlink(os.path.abspath(entry.path), target, target_is_directory=entry.is_dir())
+        except OSError:
+            # Symlinks may be unavailable (e.g. unprivileged Windows); fall back to a copy.
+            if entry.is_dir():
+                shutil.copytree(entry.path, target)
+            else:
+                shutil.copy2(entry.path, target)
+
+
+def _move_into_place(source: str, destination: str) -> None:
+    """Copies a file next to its destination, then renames it over the destination atomically."""
+    temp_path = f"{destination}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        shutil.copyfile(source, temp_path)
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _run_passes(
+    command: List[str],
+    cwd: str,
+    limits: CompileLimits,
+    cancel_token: Optional[CancelToken],
+    passes: int,
+    on_timing: Optional[TimingCallback] = None,
+) -> subprocess.CompletedProcess:
+    deadline = None
+    if limits.total_timeout is not None:
+        deadline = time.monotonic() + limits.total_timeout
+    for number in range(1, passes + 1):
+        start = time.perf_counter()
+        try:
+            result = _run_pass(command, cwd, limits, cancel_token, deadline)
+        finally:
+            if on_timing is not None:
+                on_timing(f"pdflatex_pass_{number}", time.perf_counter() - start)
+    return result
+
+
+def generate_pdf_from_latex(
+    tex_file: str,
+    limits: Optional[CompileLimits] = None,
+    cancel_token: Optional[CancelToken] = None,
+    isolated: bool = False,
+    keep_log: bool = False,
+    passes: Optional[int] = None,
+    on_timing: Optional[TimingCallback] = None,
+) -> Tuple[bool, Optional[str]]:
     """Converts a .tex file to PDF using pdflatex
 
     Args:
         tex_file (str): path to the .tex file
+        limits (CompileLimits): optional time and resource limits for pdflatex
+        cancel_token (CancelToken): optional handle to abort the compile
+        isolated (bool): compile in a private scratch directory (tmpfs when available)
+            and move only the finished PDF next to the .tex file
+        keep_log (bool): keep the pdflatex .log file next to the PDF
+        passes (int): number of pdflatex runs; by default two if the document
+            uses a table of contents or cross-references, else one
+        on_timing (callable): optional callback receiving ("pdflatex_pass_<n>", seconds)
+            after each pass
 
     Returns:
         Tuple[bool, Optional[str]]: (success, pdf_path_or_error_message)
+
+    Raises:
+        PdfTimeoutError: if a pass or the whole compile exceeds its time limit
+        PdfCancelledError: if the cancel token is triggered
     """
-    
+
     if not os.path.exists(tex_file):
         return False, f"Error: File not found {tex_file}"
-    
+
+    limits = limits or CompileLimits()
     tex_dir = os.path.dirname(tex_file) or "."
     base_name = os.path.basename(tex_file)
-    
+    stem = os.path.splitext(base_name)[0]
+
+    # get the pdf filename
+    pdf_file = stem + ".pdf"
+    pdf_path = os.path.join(tex_dir, pdf_file)
+
     try:
-        check_cmd = subprocess.run(
-            ["which", "pdflatex"],
-            capture_output=True,
-            text=True
-        )
-        if check_cmd.returncode != 0:
+        if shutil.which("pdflatex") is None:
             return False, "Error: pdflatex is not installed or not found in PATH."
-        
+
         print(f"⚙️  Generating PDF from {tex_file}...")
-        
-        result = subprocess.run(
-            ["pdflatex", "-interaction=nonstopmode", base_name],
-            cwd=tex_dir,
-            capture_output=True,
-            text=True
-        )
-        
-        result = subprocess.run(
-            ["pdflatex", "-interaction=nonstopmode", base_name],
-            cwd=tex_dir,
-            capture_output=True,
-            text=True
-        )
-        
-        # get the pdf filename
-        pdf_file = os.path.splitext(base_name)[0] + ".pdf"
-        pdf_path = os.path.join(tex_dir, pdf_file)
-        
-        aux_extensions = [".aux", ".log", ".out"]
-        for ext in aux_extensions:
-            aux_file = os.path.splitext(base_name)[0] + ext
-            aux_path = os.path.join(tex_dir, aux_file)
-            if os.path.exists(aux_path):
-                try:
-                    os.remove(aux_path)
-                except PermissionError:
-                    print(f"Warning: Could not delete auxiliary file {aux_file}. It may be in use.")
-        
-        if result.returncode == 0 and os.path.exists(pdf_path):
+
+        command = ["pdflatex", "-interaction=nonstopmode", base_name]
+        if passes is None:
+            passes = required_passes(tex_file)
+        if isolated:
+            # Auxiliary files never touch the output directory; they vanish with the scratch dir.
+            with tempfile.TemporaryDirectory(prefix="littletex-", dir=scratch_root()) as work_dir:
+                _link_inputs(tex_dir, work_dir, stem)
+                result = _run_passes(command, work_dir, limits, cancel_token, passes, on_timing)
+                built_pdf = os.path.join(work_dir, pdf_file)
+                pdf_built = os.path.exists(built_pdf)
+                if pdf_built:
+                    _move_into_place(built_pdf, pdf_path)
+                built_log = os.path.join(work_dir, stem + ".log")
+                if keep_log and os.path.exists(built_log):
+                    _move_into_place(built_log, os.path.join(tex_dir, stem + ".log"))
+        else:
+            aux_extensions = [".aux", ".out"] if keep_log else [".aux", ".log", ".out"]
+            try:
+                result = _run_passes(command, tex_dir, limits, cancel_token, passes, on_timing)
+            except (PdfTimeoutError, PdfCancelledError):
+                # A half-written PDF must not be mistaken for a finished one.
+                _remove_files(tex_dir, stem, [".pdf"])
+                raise
+            finally:
+                _remove_files(tex_dir, stem, aux_extensions)
+            pdf_built = os.path.exists(pdf_path)
+
+        if result.returncode == 0 and pdf_built:
             print(f"✅ PDF successfully generated: {pdf_path}")
             return True, pdf_path
-        elif os.path.exists(pdf_path):
+        elif pdf_built:
             # LaTeX returned warning/error code but PDF was still generated
             print(f"⚠️  PDF generated with warnings: {pdf_path}")
             print("   --- LaTeX Log ---")
@@ -79,6 +336,8 @@ def generate_pdf_from_latex(tex_file: str) -> Tuple[bool, Optional[str]]:
             else:
                 error_msg += "No error output available. Check LaTeX syntax."
             return False, f"Error generating PDF: {error_msg}"
-    
+
+    except (PdfTimeoutError, PdfCancelledError):
+        raise
     except Exception as e:
-        return False, f"Error running pdflatex: {str(e)}"
\ No newline at end of file
+        return False, f"Error running pdflatex: {str(e)}"
@@ -15,7 +15,11 @@ def extract_metadata(markdown_content: str) -> tuple[dict, str]:
         if not in_metadata_block:
             break
         
-        if stripped_line.startswith("@") and ":" in stripped_line:
+        if stripped_line.startswith(("@include:", "@cite[")):
+            # Includes and citations are content, not metadata, even at the top of the file.
+            in_metadata_block = False
+
+        elif stripped_line.startswith("@") and ":" in stripped_line:
             key, value = stripped_line[1:].split(":", 1)
             metadata[key.strip()] = value.strip()
             content_start_index = i + 1
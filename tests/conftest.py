@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def fake_pdflatex(tmp_path, monkeypatch):
+    """Puts a pdflatex on PATH that runs the given shell snippet."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+
+    def install(body):
+        script = bin_dir / "pdflatex"
+        script.write_text("#!/bin/sh\n" + body + "\n")
+        script.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    return install
@@ -0,0 +1,70 @@
+import zipfile
+
+import pytest
+
+from src.core.includes import IncludeError
+from web.archive import ArchiveError, ArchiveLimits, UploadArchive
+
+DOCUMENT = """@title: Report
+@bibliography: refs.bib
+
+# Intro
+
+![Figure: Cat](img/cat.png)
+
+@include: chapters/one.md
+"""
+
+
+def _zip(tmp_path, files):
+    path = tmp_path / "upload.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return path
+
+
+def test_only_referenced_files_are_extracted(tmp_path):
+    upload = _zip(tmp_path, {
+        "report/main.md": DOCUMENT,
+        "report/chapters/one.md": "# One\n\n![Figure: Dog](../img/dog.png)\n",
+        "report/img/cat.png": b"cat",
+        "report/img/dog.png": b"dog",
+        "report/img/unused.png": b"x" * 1000,
+        "report/refs.bib": "@book{k, title = {T}}",
+        "report/notes/draft.md": "# Draft\n",
+        "__MACOSX/report/._main.md": "junk",
+    })
+    dest = tmp_path / "session"
+    document = UploadArchive(upload, dest).extract_document()
+
+    assert document == (dest / "report" / "main.md").resolve()
+    extracted = sorted(p.relative_to(dest).as_posix() for p in dest.rglob("*") if p.is_file())
+    assert extracted == ["report/chapters/one.md", "report/img/cat.png", "report/img/dog.png",
+                         "report/main.md", "report/refs.bib"]
+
+
+def test_limits_are_enforced(tmp_path):
+    upload = _zip(tmp_path, {"main.md": "![Figure: Big](big.png)\n", "big.png": b"\0" * 100_000})
+    with pytest.raises(ArchiveError, match="bytes allowed"):
+        UploadArchive(upload, tmp_path / "a", ArchiveLimits(max_bytes=10_000)).extract_document()
+    assert not (tmp_path / "a" / "big.png").exists()
+    with pytest.raises(ArchiveError, match="entries"):
+        UploadArchive(upload, tmp_path / "b", ArchiveLimits(max_entries=1)).extract_document()
+
+
+def test_entries_outside_the_archive_are_ignored(tmp_path):
+    upload = _zip(tmp_path, {"main.md": "![Figure: Evil](../evil.png)\n", "../evil.png": b"x"})
+    UploadArchive(upload, tmp_path / "session").extract_document()
+    assert not (tmp_path / "evil.png").exists()
+
+
+def test_includes_cannot_reach_files_outside_the_archive(tmp_path):
+    upload = _zip(tmp_path, {"main.md": "@include: ../../../../../../etc/hostname\n"})
+    with pytest.raises(IncludeError, match="outside the document's directory"):
+        UploadArchive(upload, tmp_path / "session").extract_document()
+
+
+def test_archive_without_markdown_is_rejected(tmp_path):
+    with pytest.raises(ArchiveError, match="No .md"):
+        UploadArchive(_zip(tmp_path, {"a.png": b"x"}), tmp_path / "s").extract_document()
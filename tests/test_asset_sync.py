@@ -0,0 +1,79 @@
+import os
+
+import pytest
+from src.core.ast import DocumentNode, ImageNode, ListItemNode, ListNode, ParagraphNode
+from src.core.errors import AssetError
+from src.pipeline.stages import CopyAssetsStage
+from src.utils.asset_sync import plan_asset_names, sync_assets
+
+
+def _document(*urls):
+    document = DocumentNode()
+    paragraph = ParagraphNode()
+    paragraph.children = [ImageNode(alt_text="", url=url, caption="") for url in urls]
+    document.children.append(paragraph)
+    return document
+
+
+def test_colliding_names_get_unique_destinations():
+    names = plan_asset_names(_document("a/figure.png", "b/figure.png", "a/figure.png"))
+    assert names["a/figure.png"] == "figure.png"
+    assert names["b/figure.png"] != "figure.png"
+    assert names["b/figure.png"].startswith("figure-")
+    assert names["b/figure.png"].endswith(".png")
+
+
+def test_images_inside_lists_are_found():
+    document = DocumentNode()
+    item = ListItemNode()
+    item.children.append(ImageNode(alt_text="", url="img/list.png", caption=""))
+    list_node = ListNode("itemize")
+    list_node.items.append(item)
+    document.children.append(list_node)
+    assert plan_asset_names(document) == {"img/list.png": "list.png"}
+
+
+def test_second_sync_skips_unchanged_files(tmp_path):
+    source_dir, output_dir = tmp_path / "src", tmp_path / "out"
+    source_dir.mkdir()
+    output_dir.mkdir()
+    (source_dir / "one.png").write_bytes(b"one")
+    (source_dir / "two.png").write_bytes(b"two")
+    pairs = [(source_dir / name, output_dir / name) for name in ("one.png", "two.png", "gone.png")]
+
+    first = sync_assets(pairs)
+    assert len(first.copied) + len(first.linked) == 2
+    assert first.missing == [source_dir / "gone.png"]
+
+    second = sync_assets(pairs)
+    assert len(second.unchanged) == 2
+    assert (output_dir / "two.png").read_bytes() == b"two"
+
+
+def test_changed_source_is_resynced(tmp_path):
+    source, dest = tmp_path / "fig.png", tmp_path / "out.png"
+    source.write_bytes(b"old")
+    dest.write_bytes(b"stale")
+    os.utime(dest, (0, 0))
+    report = sync_assets([(source, dest)])
+    assert not report.unchanged
+    assert dest.read_bytes() == b"old"
+
+
+@pytest.mark.parametrize("url", ["/etc/hostname", "../secret.png", "img/../../secret.png"])
+def test_images_outside_the_document_directory_are_rejected(tmp_path, url):
+    (tmp_path / "secret.png").write_bytes(b"secret")
+    input_dir, output_dir = tmp_path / "doc", tmp_path / "out"
+    input_dir.mkdir()
+    with pytest.raises(AssetError, match="outside the document's directory"):
+        CopyAssetsStage(input_dir, output_dir).run(({}, _document("fig.png", url)))
+    assert not output_dir.exists()
+
+
+def test_images_may_come_from_an_allowed_directory(tmp_path):
+    cache = tmp_path / "cache"
+    cache.mkdir()
+    (cache / "fig-small.png").write_bytes(b"small")
+    stage = CopyAssetsStage(tmp_path / "doc", tmp_path / "out", image_dirs=[cache])
+    stage.run(({}, _document(str(cache / "fig-small.png"))))
+    assert (tmp_path / "out" / "fig-small.png").read_bytes() == b"small"
@@ -0,0 +1,57 @@
+import os
+import subprocess
+
+from benchmarks import fake_pdflatex
+from benchmarks.generator import MIXES, FeatureMix, generate_document, parse_size
+from benchmarks.loadtest import percentile
+from benchmarks.suite import compare, run_suite
+from src.core.convert import convert_markdown
+
+
+def test_generated_documents_are_deterministic_and_sized():
+    document = generate_document(20_000, MIXES["technical"], seed=3)
+    assert document == generate_document(20_000, MIXES["technical"], seed=3)
+    assert document != generate_document(20_000, MIXES["technical"], seed=4)
+    assert 20_000 <= len(document) < 25_000
+    assert parse_size("1KB") == 1024 and parse_size("500MB") == 500 * 1024 ** 2
+
+
+def test_feature_mix_controls_the_blocks():
+    latex = convert_markdown(generate_document(20_000, MIXES["technical"])).latex
+    assert "\\begin{tabular}" in latex and "\\begin{lstlisting}" in latex and "\\includegraphics" in latex
+    prose = generate_document(20_000, FeatureMix(tables=0, code=0, math=0, images=0, lists=0))
+    assert "```" not in prose and "::: table" not in prose and "$$" not in prose
+
+
+def test_regressions_beyond_the_threshold_are_reported():
+    baseline = {"mixed/1024/parse": {"seconds": 1.0, "peak_mb": 10.0}}
+    assert compare({"mixed/1024/parse": {"seconds": 1.1, "peak_mb": 10.5}}, baseline, 0.2) == []
+    regressions = compare({"mixed/1024/parse": {"seconds": 1.5, "peak_mb": 13.0},
+                           "mixed/1024/render": {"seconds": 9.0}}, baseline, 0.2)
+    assert len(regressions) == 2 and all(message.startswith("mixed/1024/parse") for message in regressions)
+
+
+def test_suite_measures_every_step():
+    results = run_suite([2048], repeat=1, log=lambda line: None)
+    assert sorted(key.split("/")[-1] for key in results) == ["parse", "pipeline", "render", "tokenize"]
+    assert all(result["mb_per_s"] > 0 and "peak_mb" in result for result in results.values())
+
+
+def test_fake_pdflatex_latency_and_failure_rate_come_from_the_environment(tmp_path):
+    wrapper = fake_pdflatex.install(tmp_path / "bin")
+    (tmp_path / "doc.tex").write_text("\\documentclass{article}")
+    env = dict(os.environ, FAKE_PDFLATEX_LATENCY="0", FAKE_PDFLATEX_FAILURE_RATE="0")
+    assert subprocess.run([str(wrapper), "-interaction=nonstopmode", "doc.tex"], cwd=tmp_path, env=env).returncode == 0
+    assert (tmp_path / "doc.pdf").read_bytes().startswith(b"%PDF")
+
+    (tmp_path / "doc.pdf").unlink()
+    env["FAKE_PDFLATEX_FAILURE_RATE"] = "1"
+    result = subprocess.run([str(wrapper), "-interaction=nonstopmode", "doc.tex"], cwd=tmp_path, env=env,
+                            capture_output=True)
+    assert result.returncode == 1 and not (tmp_path / "doc.pdf").exists()
+
+
+def test_percentiles_use_the_nearest_rank():
+    values = [float(n) for n in range(1, 101)]
+    assert (percentile(values, 0.5), percentile(values, 0.99), percentile(values, 1.0)) == (50.0, 99.0, 100.0)
+    assert percentile([], 0.9) == 0.0
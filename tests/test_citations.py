@@ -0,0 +1,82 @@
+import pytest
+
+from src.core.ast import BibliographyNode
+from src.core.citations import resolve_citations
+from src.core.errors import AssetError
+from src.core.parser import Parser
+from src.core.renderer import LatexRenderer
+from src.core.tokenizer import Tokenizer
+from src.pipeline.stages import BibliographyStage
+from src.utils.bibtex import load_bibliography, parse_bibtex
+from src.utils.pdf_generator import required_passes
+
+BIB = """
+@string{tug = "TUGboat"}
+@comment{ignored}
+@article{knuth84,
+  author  = {Knuth, Donald E.},
+  title   = {Literate {P}rogramming},
+  journal = tug # " Journal",
+  volume  = 27,
+  number  = {2},
+  pages   = {97--111},
+  year    = 1984,
+}
+@book{lamport94, author = "Lamport, Leslie", title = "{\\LaTeX}: A Document Preparation System",
+  publisher = {Addison-Wesley}, year = {1994}}
+"""
+
+
+def _parse(markdown):
+    return Parser(Tokenizer().tokenize(markdown)).parse()
+
+
+def test_bibtex_fields_strings_and_nested_braces():
+    entries = parse_bibtex(BIB)
+    assert set(entries) == {"knuth84", "lamport94"}
+    assert entries["knuth84"].get("title") == "Literate {P}rogramming"
+    assert entries["knuth84"].get("journal") == "TUGboat Journal"
+    assert entries["knuth84"].get("year") == "1984"
+    assert entries["lamport94"].entry_type == "book"
+
+
+def test_citations_are_numbered_in_order_of_first_use():
+    document = _parse("See @cite[lamport94, knuth84] and @cite[knuth84, nobody].")
+    missing = resolve_citations(document, parse_bibtex(BIB))
+
+    assert missing == ["nobody"]
+    bibliography = document.children[-1]
+    assert isinstance(bibliography, BibliographyNode)
+    assert [(label, entry.key) for label, entry in bibliography.entries] == [("1", "lamport94"), ("2", "knuth84")]
+
+    latex = LatexRenderer().render(document, {})
+    assert "[\\hyperlink{cite.lamport94}{1}, \\hyperlink{cite.knuth84}{2}]" in latex
+    assert "[\\hyperlink{cite.knuth84}{2}, ?]" in latex
+    assert "\\hypertarget{cite.knuth84}{[2]}] Donald E. Knuth. Literate {P}rogramming." in latex
+    assert "\\emph{TUGboat Journal}, 27(2), pp.~97--111, 1984." in latex
+
+
+def test_bibliography_needs_no_extra_pass(tmp_path):
+    document = _parse("As shown in @cite[knuth84].")
+    resolve_citations(document, parse_bibtex(BIB))
+    tex_file = tmp_path / "doc.tex"
+    tex_file.write_text(LatexRenderer().render(document, {"title": "Doc"}))
+    assert required_passes(tex_file) == 1
+
+
+def test_bibliography_is_parsed_once_per_content(tmp_path, monkeypatch):
+    monkeypatch.setenv("LITTLETEX_CACHE_DIR", str(tmp_path / "cache"))
+    bib = tmp_path / "refs.bib"
+    bib.write_text(BIB)
+    first = load_bibliography(bib)
+    assert load_bibliography(bib) is first
+    assert list((tmp_path / "cache" / "bib").glob("*.json"))
+
+
+@pytest.mark.parametrize("bibliography", ["../refs.bib", "{outside}/refs.bib"])
+def test_bibliography_outside_the_document_directory_is_rejected(tmp_path, bibliography):
+    (tmp_path / "refs.bib").write_text("@book{k, title = {T}}")
+    (tmp_path / "doc").mkdir()
+    metadata = {"bibliography": bibliography.format(outside=tmp_path)}
+    with pytest.raises(AssetError, match="outside the document's directory"):
+        BibliographyStage(tmp_path / "doc").run((metadata, _parse("@cite[k]")))
@@ -0,0 +1,52 @@
+import os
+
+from src.core.convert import convert_markdown, warm_up
+
+BIB = """@book{knuth84, author = {Knuth, Donald E.}, title = {The TeXbook}, year = {1984}}"""
+
+
+def test_converts_a_string_without_touching_the_file_system(tmp_path, monkeypatch, capsys):
+    work, home, cache = tmp_path / "work", tmp_path / "home", tmp_path / "cache"
+    for directory in (work, home, cache):
+        directory.mkdir()
+    monkeypatch.chdir(work)
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("LITTLETEX_CACHE_DIR", str(cache))
+    monkeypatch.delenv("XDG_CACHE_HOME", raising=False)
+    markdown = ("@title: Notes\n@bibliography: refs.bib\n@math_mode: asciimath\n\n# Intro\n\n"
+                "See @cite[knuth84] and $x^2$.\n\n```python\nprint(1)\n```\n\n@include: parts/more.md\n")
+    result = convert_markdown(markdown, {"parts/more.md": "## More\n\nText.\n", "refs.bib": BIB})
+
+    assert "\\title{\\textbf{Notes}}" in result.latex
+    assert "\\section{Intro}" in result.latex and "\\subsection{More}" in result.latex
+    assert result.metadata["title"] == "Notes"
+    assert result.warnings == []
+    assert [os.listdir(directory) for directory in (work, home, cache)] == [[], [], []]
+    assert capsys.readouterr() == ("", "")
+
+
+def test_bibliography_comes_from_the_assets():
+    markdown = "@bibliography: refs.bib\n\nAs in @cite[knuth84] and @cite[nobody].\n"
+    result = convert_markdown(markdown, {"refs.bib": BIB.encode()})
+    assert "The TeXbook" in result.latex
+    assert result.warnings == ["Unknown citation keys: nobody"]
+
+
+def test_missing_inputs_are_reported_as_warnings():
+    markdown = "@bibliography: refs.bib\n\n![Figure: A cat](img/cat.png)\n"
+    result = convert_markdown(markdown, {"other.png": b"\x89PNG"})
+    assert "Bibliography file not provided: refs.bib" in result.warnings
+    assert "Image not provided: img/cat.png" in result.warnings
+    assert result.asset_names == {"img/cat.png": "cat.png"}
+
+
+def test_html_is_optional():
+    assert convert_markdown("# Hi\n").html is None
+    assert "<h2" in convert_markdown("# Hi\n", html=True).html
+
+
+def test_warm_up_builds_the_shared_asciimath_translator():
+    from src.core import renderer
+
+    warm_up()
+    assert renderer._asciimath is not None
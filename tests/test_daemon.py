@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+
+import pytest
+
+from src.cli.daemon import PROTOCOL_VERSION, ConversionDaemon, DaemonClient, ping, run_via_daemon
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    calls = []
+
+    def run(argv, cwd):
+        calls.append((argv, cwd))
+        if argv[0] == "--bad":
+            raise SystemExit(2)
+        time.sleep(0.3)
+        print(f"converted {argv[0]}")
+        return 5 if argv[0] == "broken.md" else 0
+
+    server = ConversionDaemon(tmp_path / "littletex.sock", run)
+    server.bind()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.calls = calls
+    yield server
+    server.shutdown()
+    thread.join()
+
+
+def test_run_replays_output_and_exit_status(daemon, capsys):
+    assert run_via_daemon(["broken.md", "out.tex"], daemon.socket_path) == 5
+    assert capsys.readouterr().out == "converted broken.md\n"
+    assert run_via_daemon(["--bad"], daemon.socket_path) == 2
+
+
+def test_requests_run_concurrently_with_separate_output(daemon):
+    results = {}
+
+    def client(name):
+        with DaemonClient(daemon.socket_path) as connection:
+            results[name] = connection.request({"op": "run", "argv": [name], "cwd": "/"})
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=client, args=(f"doc{n}.md",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start < 1.0
+    assert {name: result["stdout"] for name, result in results.items()} == {
+        f"doc{n}.md": f"converted doc{n}.md\n" for n in range(4)}
+
+
+def test_convert_answers_with_latex_and_errors_stay_on_the_connection(daemon):
+    with DaemonClient(daemon.socket_path) as connection:
+        result = connection.request({"op": "convert", "markdown": "# Hi\n"})
+        assert result["ok"] and "\\section{Hi}" in result["result"]["latex"]
+        assert connection.request({"op": "nope"})["ok"] is False
+        assert connection.request({"op": "ping"})["ok"] is True
+
+
+def test_without_a_daemon_the_caller_converts_in_process(tmp_path):
+    assert run_via_daemon(["a.md", "a.tex"], tmp_path / "missing.sock") is None
+    assert ping(tmp_path / "missing.sock") is None
+
+
+def test_a_socket_owned_by_another_user_is_not_used(daemon, monkeypatch, capsys):
+    uid = os.getuid()
+    monkeypatch.setattr(os, "getuid", lambda: uid + 1)
+    assert run_via_daemon(["a.md", "a.tex"], daemon.socket_path) is None
+    assert daemon.calls == []
+    assert "another user" in capsys.readouterr().err
+
+
+def test_a_daemon_speaking_another_protocol_version_is_not_used(daemon, monkeypatch, capsys):
+    handle = daemon.handle
+    monkeypatch.setattr(daemon, "handle", lambda request: (
+        {"ok": True, "version": PROTOCOL_VERSION + 1} if request.get("op") == "ping" else handle(request)))
+    assert run_via_daemon(["a.md", "a.tex"], daemon.socket_path) is None
+    assert daemon.calls == []
+    assert f"protocol {PROTOCOL_VERSION + 1}" in capsys.readouterr().err
+
+
+def test_bind_never_replaces_a_file_that_is_not_a_socket(tmp_path):
+    notes = tmp_path / "notes.md"
+    notes.write_text("# My notes")
+    with pytest.raises(RuntimeError, match="not a socket"):
+        ConversionDaemon(notes, lambda argv, cwd: 0).bind()
+    assert notes.read_text() == "# My notes"
+
+
+def test_bind_replaces_a_stale_socket(tmp_path):
+    first = ConversionDaemon(tmp_path / "littletex.sock", lambda argv, cwd: 0)
+    first.bind()
+    first.server.server_close()  # dies without removing its socket
+    second = ConversionDaemon(tmp_path / "littletex.sock", lambda argv, cwd: 0)
+    second.bind()
+    second.close()
+
+
+def test_depfile_paths_are_relative_to_the_clients_directory(tmp_path, monkeypatch):
+    from src.cli.argument_parser import ArgumentParser
+    from src.core.app import LittleTexApp
+
+    def convert(argv, cwd):  # what src.main.convert does
+        LittleTexApp(ArgumentParser.parse_args(argv, cwd)).run()
+        return 0
+
+    client_dir, daemon_dir = tmp_path / "client", tmp_path / "daemon"
+    client_dir.mkdir()
+    daemon_dir.mkdir()
+    (client_dir / "doc.md").write_text("@title: doc\n\n# Hi\n")
+    monkeypatch.chdir(daemon_dir)
+    server = ConversionDaemon(tmp_path / "littletex.sock", convert)
+    server.bind()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with DaemonClient(server.socket_path) as connection:
+            response = connection.request({"op": "run", "argv": ["doc.md", "out/doc.tex", "--depfile"],
+                                           "cwd": str(client_dir)})
+    finally:
+        server.shutdown()
+        thread.join()
+    assert response["exit_code"] == 0, response["stdout"]
+    assert (client_dir / "out" / "doc.d").read_text() == "out/doc.tex: \\\n  doc.md\n\ndoc.md:\n"
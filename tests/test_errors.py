@@ -0,0 +1,47 @@
+import pytest
+
+from src.core.app import LittleTexApp
+from src.core.convert import convert_markdown
+from src.core.errors import AssetError, LittleTexError, ParseError, RenderError
+from src.core.includes import IncludeError
+from src.pipeline.config import PipelineConfig
+from src.pipeline.core import Pipeline, Stage
+from src.pipeline.scheduler import DagPipeline
+
+
+class BrokenStage(Stage):
+    outputs = ("ast",)
+    error_type = RenderError
+
+    def run(self, data):
+        raise KeyError("heading")
+
+
+@pytest.mark.parametrize("pipeline_type", [Pipeline, DagPipeline])
+def test_stage_failures_are_reported_as_the_stage_error_type(pipeline_type):
+    with pytest.raises(RenderError) as info:
+        pipeline_type([BrokenStage()]).execute()
+    assert info.value.stage == "BrokenStage"
+    assert isinstance(info.value.__cause__, KeyError)
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_app_raises_instead_of_exiting(tmp_path, concurrent):
+    source = tmp_path / "doc.md"
+    source.write_text("# Intro\n@include: missing.md\n")
+    config = PipelineConfig(source, tmp_path / "out" / "doc.tex", concurrent=concurrent)
+    with pytest.raises(IncludeError) as info:
+        LittleTexApp(config).run()
+    assert isinstance(info.value, ParseError)
+    assert info.value.stage == "ResolveIncludesStage"
+
+
+def test_missing_input_is_an_asset_error(tmp_path):
+    config = PipelineConfig(tmp_path / "nope.md", tmp_path / "out" / "doc.tex")
+    with pytest.raises(AssetError):
+        LittleTexApp(config).run()
+
+
+def test_in_memory_conversion_raises_library_errors():
+    with pytest.raises(LittleTexError, match="missing.md"):
+        convert_markdown("@include: missing.md\n")
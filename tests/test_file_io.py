@@ -0,0 +1,20 @@
+import os
+
+from src.utils.file_io import format_depfile, write_if_changed
+
+
+def test_identical_content_is_not_rewritten(tmp_path):
+    path = tmp_path / "doc.tex"
+    assert write_if_changed(path, "hello")
+    os.utime(path, (0, 0))
+    assert not write_if_changed(path, "hello")
+    assert path.stat().st_mtime == 0
+    assert write_if_changed(path, "changed")
+    assert path.read_text() == "changed"
+    assert [p.name for p in tmp_path.iterdir()] == ["doc.tex"]
+
+
+def test_depfile_escapes_and_lists_phony_prerequisites(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    text = format_depfile([tmp_path / "out" / "my doc.tex"], [tmp_path / "doc.md", tmp_path / "img" / "a.png", tmp_path / "doc.md"])
+    assert text == "out/my\\ doc.tex: \\\n  doc.md \\\n  img/a.png\n\ndoc.md:\n\nimg/a.png:\n"
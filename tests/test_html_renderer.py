@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import pytest
+
+from src.core.html_renderer import HtmlRenderer
+from src.core.parser import Parser
+from src.core.tokenizer import Tokenizer
+from src.pipeline import PipelineBuilder, PipelineConfig
+
+MARKDOWN = """@toc
+# Intro & Scope
+Some **bold** <text> with $a^2 + b^2$ and `x < y`.
+
+$$
+\\int_0^1 f(x)\\,dx
+$$
+
+- one
+    - nested
+## Details
+```python
+if a < b: pass
+```
+"""
+
+
+def _parse(markdown):
+    return Parser(Tokenizer().tokenize(markdown)).parse()
+
+
+def test_html_escapes_text_and_keeps_math_as_tex():
+    page = HtmlRenderer().render(_parse(MARKDOWN), {"title": "A & B"})
+    assert "<title>A &amp; B</title>" in page
+    assert "<strong>bold</strong> &lt;text&gt;" in page
+    assert "\\(a^2 + b^2\\)" in page
+    assert "\\[\\int_0^1 f(x)\\,dx\\]" in page.replace("\n", "")
+    assert "<code>x &lt; y</code>" in page
+    assert '<pre><code class="language-python">if a &lt; b: pass</code></pre>' in page
+    assert "<li>one\n<ul>\n<li>nested\n</li>\n</ul>\n</li>" in page
+
+
+def test_toc_links_to_numbered_headings():
+    page = HtmlRenderer().render(_parse(MARKDOWN), {})
+    assert '<a href="#sec:1.1">1.1 Details</a>' in page
+    assert '<h2 id="sec:1">1 Intro &amp; Scope</h2>' in page
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_pipeline_writes_tex_and_html_from_one_parse(tmp_path, monkeypatch, concurrent):
+    calls = []
+    original = Parser.parse
+    monkeypatch.setattr(Parser, "parse", lambda self: calls.append(1) or original(self))
+    source = tmp_path / "doc.md"
+    source.write_text("@title: doc\n\n# Hello\nWorld")
+    config = PipelineConfig(source, tmp_path / "out" / "doc.tex", html=True)
+
+    builder = PipelineBuilder(config).add_core_stages()
+    tex_path = (builder.build_concurrent() if concurrent else builder.build()).execute()
+
+    assert Path(tex_path).read_text().count("\\section{Hello}") == 1
+    assert "<h2 id=\"sec:1\">1 Hello</h2>" in (tmp_path / "out" / "doc.html").read_text()
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("url, linked", [
+    ("https://example.com/?a=1&b=2", True),
+    ("mailto:someone@example.com", True),
+    ("chapter2.html#intro", True),
+    ("javascript:alert(document.cookie)", False),
+    ("JavaScript:alert(1)", False),
+    (" java\tscript:alert(1)", False),
+    ("data:text/html;base64,PHNjcmlwdD4=", False),
+])
+def test_only_safe_link_schemes_become_links(url, linked):
+    page = HtmlRenderer().render(_parse(f"See [the docs]({url})."), {})
+    assert ("<a href=" in page.split("<main>")[1]) == linked
+    assert "the docs" in page
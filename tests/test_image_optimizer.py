@@ -0,0 +1,58 @@
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from src.core.parser import Parser
+from src.core.tokenizer import Tokenizer
+from src.pipeline.stages import OptimizeImagesStage
+from src.utils.asset_sync import iter_images
+from src.utils.image_optimizer import ImageOptimizer
+
+
+@pytest.fixture
+def optimizer(tmp_path):
+    return ImageOptimizer(cache_path=tmp_path / "cache", target_dpi=100, display_width_in=2)
+
+
+def test_wide_image_is_downsampled_and_cached(tmp_path, optimizer):
+    source = tmp_path / "photo.jpg"
+    Image.new("RGB", (1000, 500), "red").save(source)
+
+    derivative = optimizer.optimize(source)
+    assert derivative != source
+    with Image.open(derivative) as image:
+        assert image.size == (200, 100)
+
+    derivative.write_bytes(b"cached")
+    assert optimizer.optimize(source).read_bytes() == b"cached"
+
+
+def test_small_jpeg_is_used_as_is(tmp_path, optimizer, monkeypatch):
+    source = tmp_path / "icon.jpg"
+    Image.new("RGB", (50, 50), "blue").save(source)
+    assert optimizer.optimize(source) == source
+
+    # The verdict is cached: the next build does not open the image again.
+    monkeypatch.setattr(Image, "open", lambda *args: pytest.fail("image decoded again"))
+    assert optimizer.optimize(source) == source
+
+
+def test_unsupported_format_is_converted_to_png(tmp_path, optimizer):
+    source = tmp_path / "anim.gif"
+    Image.new("P", (50, 50)).save(source)
+    derivative = optimizer.optimize(source)
+    assert derivative.suffix == ".png"
+    with Image.open(derivative) as image:
+        assert image.format == "PNG"
+
+
+def test_invalid_image_dpi_metadata_falls_back_with_a_warning(tmp_path, optimizer, capsys):
+    Image.new("RGB", (1000, 500), "red").save(tmp_path / "photo.jpg")
+    ast = Parser(Tokenizer().tokenize("![Photo](photo.jpg)")).parse()
+
+    _, ast = OptimizeImagesStage(tmp_path, optimizer).run(({"image_dpi": "high"}, ast))
+
+    assert "Ignoring @image_dpi 'high'" in capsys.readouterr().out
+    [image] = iter_images(ast)
+    with Image.open(image.url) as derivative:
+        assert derivative.size == (200, 100)
@@ -0,0 +1,64 @@
+import pytest
+from src.core.ast import HeadingNode, ImageNode, ParagraphNode
+from src.core.includes import IncludeError, IncludeResolver, ParseCache
+from src.core.parser import Parser
+from src.core.tokenizer import Tokenizer, TokenType
+
+
+def _parse(markdown):
+    return Parser(Tokenizer().tokenize(markdown)).parse()
+
+
+def test_include_token():
+    tokens = Tokenizer().tokenize("@include: chapters/one.md")
+    assert tokens[0].type == TokenType.INCLUDE
+    assert tokens[0].value == "chapters/one.md"
+
+
+def test_included_document_is_spliced_in(tmp_path):
+    (tmp_path / "chapters").mkdir()
+    (tmp_path / "chapters" / "one.md").write_text("@title: ignored\n\n# Chapter One\n\n![Image: fig](img/fig.png)\n")
+    root = tmp_path / "main.md"
+    document = _parse("# Intro\n@include: chapters/one.md\n# Outro")
+
+    resolver = IncludeResolver(root, ParseCache())
+    resolver.resolve(document)
+
+    headings = [node.text for node in document.children if isinstance(node, HeadingNode)]
+    assert headings == ["Intro", "Chapter One", "Outro"]
+    image = next(node for node in document.children if isinstance(node, ImageNode))
+    assert image.url == "chapters/img/fig.png"
+    assert resolver.graph == {root.resolve(): [(tmp_path / "chapters" / "one.md").resolve()]}
+
+
+def test_unchanged_files_are_parsed_once(tmp_path):
+    (tmp_path / "part.md").write_text("Some text.")
+    cache = ParseCache()
+    for _ in range(3):
+        IncludeResolver(tmp_path / "main.md", cache).resolve(_parse("@include: part.md"))
+    assert (cache.misses, cache.hits) == (1, 2)
+
+
+def test_cached_documents_are_not_shared(tmp_path):
+    (tmp_path / "part.md").write_text("Some text.")
+    cache = ParseCache()
+    first = IncludeResolver(tmp_path / "main.md", cache).resolve(_parse("@include: part.md"))
+    second = IncludeResolver(tmp_path / "main.md", cache).resolve(_parse("@include: part.md"))
+    assert isinstance(first.children[0], ParagraphNode)
+    assert first.children[0] is not second.children[0]
+
+
+def test_include_cycle_is_rejected(tmp_path):
+    (tmp_path / "a.md").write_text("@include: b.md")
+    (tmp_path / "b.md").write_text("@include: a.md")
+    with pytest.raises(IncludeError, match="cycle"):
+        IncludeResolver(tmp_path / "main.md", ParseCache()).resolve(_parse("@include: a.md"))
+
+
+@pytest.mark.parametrize("include", ["../secret.md", "{outside}/secret.md"])
+def test_includes_outside_the_document_directory_are_rejected(tmp_path, include):
+    (tmp_path / "secret.md").write_text("Secret.")
+    (tmp_path / "doc").mkdir()
+    document = _parse("@include: " + include.format(outside=tmp_path))
+    with pytest.raises(IncludeError, match="outside the document's directory"):
+        IncludeResolver(tmp_path / "doc" / "main.md", ParseCache()).resolve(document)
@@ -0,0 +1,121 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from web.jobs import DONE, FAILED, QUEUED, JobQueue
+
+
+def _wait_for(queue, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in (DONE, FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_small_jobs_run_before_large_ones(tmp_path):
+    order = []
+    release = threading.Event()
+
+    def handler(payload):
+        if payload["name"] == "first":
+            release.wait(5)
+        order.append(payload["name"])
+        return {"name": payload["name"]}
+
+    queue = JobQueue(tmp_path / "jobs.sqlite3", handler, workers=1)
+    try:
+        queue.submit("first", {"name": "first"}, cost=1)
+        while queue.get("first")["status"] == QUEUED:
+            time.sleep(0.01)
+        queue.submit("manual", {"name": "manual"}, cost=5_000_000)
+        queue.submit("memo", {"name": "memo"}, cost=2_000)
+        assert queue.get("memo")["position"] == 1
+        assert queue.get("manual")["position"] == 2
+        release.set()
+        assert _wait_for(queue, "manual")["result"] == {"name": "manual"}
+        assert order == ["first", "memo", "manual"]
+    finally:
+        release.set()
+        queue.stop(timeout=5)
+
+
+def test_failing_job_is_reported_and_the_worker_survives(tmp_path):
+    def handler(payload):
+        if payload["fail"]:
+            raise RuntimeError("broken document")
+        return {}
+
+    queue = JobQueue(tmp_path / "jobs.sqlite3", handler, workers=1)
+    try:
+        queue.submit("bad", {"fail": True}, cost=1)
+        assert _wait_for(queue, "bad")["status"] == FAILED
+        queue.submit("good", {"fail": False}, cost=1)
+        assert _wait_for(queue, "good")["status"] == DONE
+    finally:
+        queue.stop(timeout=5)
+
+
+# SystemExit still ends the worker thread; the queue starts a new one.
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_an_exiting_handler_fails_its_job_and_the_worker_is_replaced(tmp_path):
+    def handler(payload):
+        if payload["exit"]:
+            raise SystemExit(1)
+        return {}
+
+    queue = JobQueue(tmp_path / "jobs.sqlite3", handler, workers=1)
+    try:
+        queue.submit("exit", {"exit": True}, cost=1)
+        job = _wait_for(queue, "exit")
+        assert job["status"] == FAILED and job["error"] == "The conversion was interrupted."
+        queue._threads[0].join(5)
+        queue.submit("next", {"exit": False}, cost=1)
+        assert _wait_for(queue, "next")["status"] == DONE
+    finally:
+        queue.stop(timeout=5)
+
+
+def test_database_errors_do_not_stop_the_worker(tmp_path, monkeypatch):
+    queue = JobQueue(tmp_path / "jobs.sqlite3", lambda payload: {"ok": True}, workers=1)
+    claim, failures = queue._claim, []
+
+    def flaky_claim():
+        if not failures:
+            failures.append(1)
+            raise sqlite3.OperationalError("database is locked")
+        return claim()
+
+    monkeypatch.setattr(queue, "_claim", flaky_claim)
+    try:
+        queue.submit("job", {}, cost=1)
+        assert _wait_for(queue, "job")["result"] == {"ok": True}
+        assert failures
+    finally:
+        queue.stop(timeout=5)
+
+
+def test_queue_is_shared_through_the_database(tmp_path):
+    with JobQueue(tmp_path / "jobs.sqlite3", lambda payload: {}, workers=1)._connect() as db:
+        db.execute("INSERT INTO jobs (id, status, cost, payload, created) VALUES ('x', 'queued', 1, '{}', 0)")
+    other_process = JobQueue(tmp_path / "jobs.sqlite3", lambda payload: {"ok": True}, workers=1)
+    try:
+        other_process.start()
+        assert _wait_for(other_process, "x")["result"] == {"ok": True}
+    finally:
+        other_process.stop(timeout=5)
+
+
+def test_active_jobs_are_reported_and_finished_ones_can_be_forgotten(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3", lambda payload: {}, workers=1)
+    with queue._connect() as db:
+        db.execute("INSERT INTO jobs (id, status, cost, payload, created) VALUES ('w', 'queued', 1, '{}', 0)")
+        db.execute("INSERT INTO jobs (id, status, cost, payload, created) VALUES ('d', 'done', 1, '{}', 0)")
+    assert queue.active_ids() == {"w"}
+    queue.forget("d")
+    queue.forget("w")  # still waiting, so it is kept
+    assert queue.get("d") is None and queue.get("w") is not None
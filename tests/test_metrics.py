@@ -0,0 +1,76 @@
+import multiprocessing
+import os
+
+from web.metrics import MetricsRegistry
+
+
+def _registry(directory=None):
+    registry = MetricsRegistry(directory)
+    requests = registry.counter("requests_total", "Requests.", ("status",))
+    in_flight = registry.gauge("in_flight", "Running.")
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    return registry, requests, in_flight, latency
+
+
+def _record_in_child(directory):
+    registry, requests, in_flight, latency = _registry(directory)
+    requests.inc(status="200")
+    in_flight.inc()
+    latency.observe(5)
+    registry.flush()  # what gunicorn's worker_exit hook does
+
+
+def test_text_format():
+    registry, requests, in_flight, latency = _registry()
+    requests.inc(status="200")
+    requests.inc(2, status='5"0')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{status="200"} 1' in text
+    assert 'requests_total{status="5\\"0"} 2' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "latency_seconds_count 2" in text
+
+
+def test_values_are_merged_across_processes(tmp_path):
+    registry, requests, in_flight, latency = _registry(tmp_path)
+    requests.inc(status="200")
+    in_flight.inc()
+    child = multiprocessing.get_context("fork").Process(target=_record_in_child, args=(tmp_path,))
+    child.start()
+    child.join()
+
+    totals = registry.collect()
+    assert totals["requests_total"] == {'["200"]': 2}
+    # The child has exited, so its in-flight work no longer counts.
+    assert totals["in_flight"] == {"[]": 1}
+    assert totals["latency_seconds"]["[]"]["count"] == 1
+
+
+def test_updates_are_written_in_batches(tmp_path):
+    registry, requests, _, _ = _registry(tmp_path)
+    registry.flush_interval = 3600
+    for _ in range(100):
+        requests.inc(status="200")
+    assert list(tmp_path.glob("*.json")) == []
+    assert registry.collect()["requests_total"] == {'["200"]': 100}  # a scrape flushes first
+    assert len(list(tmp_path.glob("*.json"))) == 1
+
+
+def test_exited_workers_stop_counting_as_live_and_reset_clears_everything(tmp_path):
+    registry, requests, in_flight, _ = _registry(tmp_path)
+    requests.inc(status="200")
+    in_flight.inc()
+    registry.flush()
+    # As if the master reaped a worker whose pid is now reused by a live process.
+    registry.mark_process_dead(os.getpid())
+    other = _registry(tmp_path)[0]
+    assert other.collect()["in_flight"] == {}
+    assert other.collect()["requests_total"] == {'["200"]': 1}
+
+    other.reset()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,80 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+from src.utils.pdf_generator import (
+    CancelToken,
+    CompileLimits,
+    PdfCancelledError,
+    PdfTimeoutError,
+    generate_pdf_from_latex,
+)
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="uses a shell script as pdflatex")
+
+
+@pytest.fixture
+def tex_file(tmp_path):
+    path = tmp_path / "doc.tex"
+    path.write_text("\\documentclass{article}\\begin{document}x\\end{document}")
+    return path
+
+
+def test_successful_compile(fake_pdflatex, tex_file):
+    fake_pdflatex('touch doc.pdf doc.aux doc.log')
+    success, pdf_path = generate_pdf_from_latex(str(tex_file))
+    assert success
+    assert os.path.exists(pdf_path)
+    assert not (tex_file.parent / "doc.aux").exists()
+
+
+def test_pass_timeout_kills_process(fake_pdflatex, tex_file):
+    fake_pdflatex('touch doc.pdf; sleep 30')
+    start = time.monotonic()
+    with pytest.raises(PdfTimeoutError):
+        generate_pdf_from_latex(str(tex_file), CompileLimits(pass_timeout=0.5))
+    assert time.monotonic() - start < 10
+    assert not (tex_file.parent / "doc.pdf").exists()
+
+
+def test_cancel_token_aborts_compile(fake_pdflatex, tex_file):
+    fake_pdflatex('sleep 30')
+    token = CancelToken()
+    threading.Timer(0.3, token.cancel).start()
+    with pytest.raises(PdfCancelledError):
+        generate_pdf_from_latex(str(tex_file), cancel_token=token)
+
+
+def test_compile_failure_is_not_a_timeout(fake_pdflatex, tex_file):
+    fake_pdflatex('echo "! Undefined control sequence."; exit 1')
+    success, message = generate_pdf_from_latex(str(tex_file), CompileLimits(total_timeout=10))
+    assert not success
+    assert "Undefined control sequence" in message
+
+
+def test_isolated_compile_leaves_only_the_pdf(fake_pdflatex, tex_file):
+    (tex_file.parent / "figure.png").write_bytes(b"png")
+    fake_pdflatex('test -f figure.png || exit 1; touch doc.aux doc.log doc.out; echo pdf > doc.pdf')
+    success, pdf_path = generate_pdf_from_latex(str(tex_file), isolated=True, keep_log=True)
+    assert success
+    assert sorted(p.name for p in tex_file.parent.iterdir() if p.is_file()) == [
+        "doc.log", "doc.pdf", "doc.tex", "figure.png",
+    ]
+
+
+def test_resource_limits_apply_to_pdflatex(fake_pdflatex, tex_file):
+    fake_pdflatex('ulimit -v > limits.txt; ulimit -t >> limits.txt; touch doc.pdf')
+    success, _ = generate_pdf_from_latex(str(tex_file), CompileLimits(memory_limit_mb=512, cpu_time_limit=7))
+    assert success
+    assert (tex_file.parent / "limits.txt").read_text().split() == [str(512 * 1024), "7"]
+
+
+@pytest.mark.parametrize("passes, runs", [(None, 2), (1, 1)])
+def test_passes_override_the_detected_count(fake_pdflatex, tex_file, passes, runs):
+    tex_file.write_text("\\documentclass{article}\\begin{document}\\tableofcontents\\end{document}")
+    fake_pdflatex("echo run >> runs.txt; touch doc.pdf")
+    success, _ = generate_pdf_from_latex(str(tex_file), passes=passes)
+    assert success
+    assert (tex_file.parent / "runs.txt").read_text().split() == ["run"] * runs
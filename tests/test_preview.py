@@ -0,0 +1,52 @@
+import json
+import sys
+
+import pytest
+from src.core.parser import Parser
+from src.core.tokenizer import Tokenizer
+from src.pipeline.stages import PreviewStage
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="uses a shell script as pdflatex")
+
+MARKDOWN = "# Intro\nHello.\n# Broken\nBROKEN\n# Outro\nBye."
+# Records every pass and fails for the section that contains BROKEN.
+PDFLATEX = ('echo "$2" >> ../passes.txt\n'
+            'if grep -q BROKEN "$2"; then echo "! Undefined control sequence."; exit 1; fi\n'
+            'touch "${2%.tex}.pdf"')
+
+
+def _preview(tmp_path):
+    document = Parser(Tokenizer().tokenize(MARKDOWN)).parse()
+    stage = PreviewStage(tmp_path / "out", max_workers=3)
+    stage.run(({"title": "My Doc"}, document))
+    return stage
+
+
+def test_every_section_gets_its_own_pdf_and_manifest_entry(tmp_path, fake_pdflatex):
+    fake_pdflatex(PDFLATEX)
+    stage = _preview(tmp_path)
+
+    preview_dir = tmp_path / "out" / "my-doc-preview"
+    assert stage.manifest_path == preview_dir / "manifest.json"
+    manifest = json.loads(stage.manifest_path.read_text())
+    assert manifest["title"] == "My Doc"
+    sections = manifest["sections"]
+    assert [(s["index"], s["heading"]) for s in sections] == [(1, "Intro"), (2, "Broken"), (3, "Outro")]
+    for section in (sections[0], sections[2]):
+        assert section["error"] is None
+        assert (preview_dir / section["pdf"]).is_file()
+        assert (preview_dir / section["tex"]).is_file()
+
+
+def test_failed_sections_are_reported_without_stopping_the_others(tmp_path, fake_pdflatex):
+    fake_pdflatex(PDFLATEX)
+    broken = json.loads(_preview(tmp_path).manifest_path.read_text())["sections"][1]
+    assert broken["pdf"] is None
+    assert "Undefined control sequence" in broken["error"]
+
+
+def test_previews_compile_in_a_single_pass(tmp_path, fake_pdflatex):
+    fake_pdflatex(PDFLATEX)
+    _preview(tmp_path)
+    passes = (tmp_path / "out" / "passes.txt").read_text().split()
+    assert len(passes) == len(set(passes)) == 3
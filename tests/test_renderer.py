@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.parser import Parser
+from src.core.renderer import LatexRenderer, shared_renderer, translate_asciimath
+from src.core.tokenizer import Tokenizer
+from src.utils.highlight import HighlightCache
+from src.utils.pdf_generator import required_passes
+
+MARKDOWN = "@toc\n# Intro\n## Scope\n# Usage\n### Detail"
+
+
+def _parse(markdown):
+    return Parser(Tokenizer().tokenize(markdown)).parse()
+
+
+def test_python_toc_links_numbered_headings():
+    latex = LatexRenderer(toc_mode="python").render(_parse(MARKDOWN), {})
+    assert "\\tableofcontents" not in latex
+    assert "\\hyperlink{section.1}{\\textbf{1\\quad Intro}}" in latex
+    assert "\\hyperlink{subsection.1.1}{1.1\\quad Scope}" in latex
+    assert "\\hyperlink{subsubsection.2.0.1}{2.0.1\\quad Detail}" in latex
+    assert "\\section{Usage}\\label{sec:2}" in latex
+
+
+def test_toc_mode_can_be_set_per_document():
+    latex = LatexRenderer().render(_parse(MARKDOWN), {"toc_mode": "python"})
+    assert "\\tableofcontents" not in latex
+
+
+def test_pass_count_follows_the_document(tmp_path):
+    single = tmp_path / "single.tex"
+    single.write_text(LatexRenderer(toc_mode="python").render(_parse(MARKDOWN), {}))
+    double = tmp_path / "double.tex"
+    double.write_text(LatexRenderer().render(_parse(MARKDOWN), {}))
+    assert required_passes(str(single)) == 1
+    assert required_passes(str(double)) == 2
+
+
+def test_included_files_are_checked_for_references(tmp_path):
+    (tmp_path / "part.tex").write_text("See Section~\\ref{sec:1}.")
+    master = tmp_path / "master.tex"
+    master.write_text("\\begin{document}\\include{part}\\end{document}")
+    assert required_passes(str(master)) == 2
+
+
+def test_pygments_mode_emits_precolored_verbatim(tmp_path):
+    cache = HighlightCache(cache_path=tmp_path)
+    document = _parse("```python\ndef f(x):\n    return {x}\n```\n\n```python\ndef f(x):\n    return {x}\n```")
+    latex = LatexRenderer(code_mode="pygments", highlighter=cache).render(document, {})
+    assert "lstlisting" not in latex
+    assert "\\usepackage{fvextra}" in latex
+    assert "\\PY{k}{def}" in latex
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert len(list(tmp_path.glob("*.tex"))) == 1
+
+
+def test_highlighted_blocks_are_reused_from_disk(tmp_path):
+    HighlightCache(cache_path=tmp_path).highlight("x = 1", "python")
+    (cached,) = tmp_path.glob("*.tex")
+    cached.write_text("from disk")
+    assert HighlightCache(cache_path=tmp_path).highlight("x = 1", "python") == "from disk"
+    assert HighlightCache(cache_path=tmp_path).highlight("x = 1", "nosuchlanguage").startswith("\\begin{Verbatim}")
+
+
+def test_one_renderer_serves_concurrent_documents():
+    renderer, parser = LatexRenderer(), Parser()
+    jobs = [({"math_mode": "asciimath"}, "$x^2$"), ({"math_mode": "latex"}, "$x^2$"),
+            ({"toc_mode": "python"}, "@toc\n# Intro")] * 8
+    expected = [LatexRenderer().render(_parse(body), metadata) for metadata, body in jobs]
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        outputs = list(pool.map(lambda job: renderer.render(parser.parse(Tokenizer().tokenize(job[1])), job[0]), jobs))
+    assert outputs == expected
+    assert renderer.math_mode == "latex" and renderer.toc_mode == "latex"
+
+
+def test_asciimath_translates_concurrently():
+    expressions = [f"x^{i} + sqrt({i})" for i in range(40)] + ["sum_(i=1)^n i", "int_0^1 f(x) dx"]
+    expected = [translate_asciimath(e) for e in expressions]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert list(pool.map(translate_asciimath, expressions * 10)) == expected * 10
+
+
+def test_shared_renderers_are_created_once_per_set_of_options():
+    assert shared_renderer() is shared_renderer(toc_mode="latex", code_mode="listings")
+    assert shared_renderer(toc_mode="python") is not shared_renderer()
+    assert shared_renderer(toc_mode="python").default_toc_mode == "python"
@@ -0,0 +1,60 @@
+import os
+import threading
+import time
+
+from web.result_cache import ResultCache, cache_key
+
+
+def _session(tmp_path, name, pdf=b"%PDF"):
+    session = tmp_path / name
+    session.mkdir()
+    (session / "doc.md").write_text("# Hi")
+    (session / "doc.tex").write_text("\\section{Hi}")
+    (session / "doc.pdf").write_bytes(pdf)
+    (session / "littletex-blocks").mkdir()
+    (session / "littletex-blocks" / "code-1.txt").write_text("print()")
+    return session
+
+
+def test_stored_results_are_restored_into_a_new_session(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    key = cache_key("abc", "doc.md", {"html_only": False})
+    assert cache.lookup(key) is None
+    cache.store(key, _session(tmp_path, "first"), {"tex": "doc.tex", "pdf": "doc.pdf"})
+
+    assert cache.lookup(key) == {"tex": "doc.tex", "pdf": "doc.pdf"}
+    second = tmp_path / "second"
+    second.mkdir()
+    cache.restore(key, second)
+    assert sorted(p.relative_to(second).as_posix() for p in second.rglob("*.*")) == [
+        "doc.pdf", "doc.tex", "littletex-blocks/code-1.txt",
+    ]
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_options_are_part_of_the_key():
+    assert cache_key("abc", "doc.md", {"html_only": True}) != cache_key("abc", "doc.md", {"html_only": False})
+
+
+def test_cache_is_bounded_by_size_and_age(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=100, max_age=3600)
+    cache.store("old", _session(tmp_path, "a", pdf=b"x" * 60), {})
+    stamp = time.time() - 60
+    os.utime(tmp_path / "cache" / "old", (stamp, stamp))
+    cache.store("new", _session(tmp_path, "b", pdf=b"x" * 60), {})
+    assert cache.lookup("old") is None and cache.lookup("new") == {}
+
+    stamp = time.time() - 7200
+    os.utime(tmp_path / "cache" / "new", (stamp, stamp))
+    assert cache.lookup("new") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_leftover_staging_directory_does_not_break_a_store(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    staging = tmp_path / "cache" / f".key.{os.getpid()}.{threading.get_ident()}"
+    staging.mkdir(parents=True)
+    (staging / "stale.txt").write_text("from a crashed store")
+    cache.store("key", _session(tmp_path, "a"), {})
+    assert cache.lookup("key") == {}
+    assert not (tmp_path / "cache" / "key" / "stale.txt").exists()
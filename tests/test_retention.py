@@ -0,0 +1,53 @@
+import os
+import time
+
+from web.retention import RetentionManager
+
+
+def _session(root, name, size, age):
+    path = root / name
+    path.mkdir()
+    (path / "doc.pdf").write_bytes(b"x" * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_expired_sessions_are_removed_unless_in_use(tmp_path):
+    _session(tmp_path, "old", 10, age=7200)
+    _session(tmp_path, "running", 10, age=7200)
+    _session(tmp_path, "fresh", 10, age=10)
+    (tmp_path / "jobs.sqlite3").write_bytes(b"db")
+    evicted = []
+    manager = RetentionManager(tmp_path, ttl=3600, quota_bytes=None,
+                               in_use=lambda: {"running"}, on_evict=evicted.append)
+
+    stats = manager.sweep()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["fresh", "jobs.sqlite3", "running"]
+    assert evicted == ["old"]
+    assert (stats["evicted_expired"], stats["bytes_freed"], stats["usage_bytes"], stats["sessions"]) == (1, 10, 20, 2)
+
+
+def test_quota_evicts_least_recently_downloaded_first(tmp_path):
+    _session(tmp_path, "a", 100, age=300)
+    _session(tmp_path, "b", 100, age=200)
+    _session(tmp_path, "c", 100, age=100)
+    manager = RetentionManager(tmp_path, ttl=None, quota_bytes=150)
+    manager.touch("a")  # downloaded just now
+
+    stats = manager.sweep()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a"]
+    assert (stats["evicted_quota"], stats["usage_bytes"]) == (2, 100)
+
+
+def test_recently_created_sessions_without_a_job_are_kept(tmp_path):
+    _session(tmp_path, "old", 100, age=300)
+    _session(tmp_path, "uploading", 100, age=5)  # saved, not queued yet
+    manager = RetentionManager(tmp_path, ttl=1, quota_bytes=50, grace=60)
+
+    stats = manager.sweep()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["uploading"]
+    assert (stats["evicted_expired"], stats["evicted_quota"], stats["sessions"]) == (1, 0, 1)
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+
+import pytest
+from src.pipeline.core import Stage, Pipeline
+from src.pipeline.scheduler import DagPipeline
+
+
+class AddStage(Stage):
+    def __init__(self, amount, inputs, outputs):
+        self.amount = amount
+        self.inputs = inputs
+        self.outputs = outputs
+
+    def run(self, data):
+        return (data or 0) + self.amount
+
+
+class BarrierStage(Stage):
+    """Only finishes if its sibling runs at the same time."""
+
+    def __init__(self, barrier, inputs, outputs):
+        self.barrier = barrier
+        self.inputs = inputs
+        self.outputs = outputs
+
+    def run(self, data):
+        self.barrier.wait(timeout=5)
+        return data
+
+
+class SumStage(Stage):
+    inputs = ("left", "right")
+    outputs = ("total",)
+
+    def run(self, data):
+        left, right = data
+        return left + right
+
+
+def test_linear_stages_match_pipeline():
+    stages = [
+        AddStage(1, (), ("a",)),
+        AddStage(2, ("a",), ("b",)),
+        AddStage(3, ("b",), ("c",)),
+    ]
+    assert DagPipeline(stages).execute() == Pipeline(stages).execute() == 6
+
+
+def test_independent_stages_run_concurrently():
+    barrier = threading.Barrier(2)
+    stages = [
+        AddStage(1, (), ("base",)),
+        BarrierStage(barrier, ("base",), ("left",)),
+        BarrierStage(barrier, ("base",), ("right",)),
+        SumStage(),
+    ]
+    assert DagPipeline(stages, max_workers=2).execute() == 2
+    assert asyncio.run(DagPipeline(stages, max_workers=2).execute_async()) == 2
+
+
+def test_missing_producer_is_rejected():
+    with pytest.raises(ValueError, match="No stage produces the artifact"):
+        DagPipeline([AddStage(1, ("missing",), ("a",))])
+
+
+def test_cycle_is_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        DagPipeline([AddStage(1, ("b",), ("a",)), AddStage(1, ("a",), ("b",))])
+
+
+def test_stage_can_refine_an_artifact():
+    stages = [
+        AddStage(1, (), ("a",)),
+        AddStage(10, ("a",), ("a",)),
+        AddStage(100, ("a",), ("b",)),
+    ]
+    assert DagPipeline(stages).execute() == 111
+
+
+@pytest.mark.parametrize("pipeline_type", [Pipeline, DagPipeline])
+def test_stage_timings_are_reported(pipeline_type):
+    timings = []
+    stages = [AddStage(1, (), ("a",)), AddStage(2, ("a",), ("b",))]
+    pipeline_type(stages, on_timing=lambda name, seconds: timings.append((name, seconds))).execute()
+    assert [name for name, _ in timings] == ["add", "add"]
+    assert all(seconds >= 0 for _, seconds in timings)
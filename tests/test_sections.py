@@ -0,0 +1,51 @@
+import pytest
+from src.core.parser import Parser
+from src.core.renderer import LatexRenderer
+from src.core.sections import select_sections, split_sections
+from src.core.tokenizer import Tokenizer
+from src.utils.pdf_generator import required_passes
+
+MARKDOWN = "Preface text.\n# Getting Started\nIntro.\n## Details\nMore.\n# API Reference\nCalls."
+
+
+def _parse(markdown):
+    return Parser(Tokenizer().tokenize(markdown)).parse()
+
+
+def test_document_is_cut_at_level_one_headings():
+    front, sections = split_sections(_parse(MARKDOWN))
+    assert len(front) == 1
+    assert [s.name for s in sections] == ["sec01-getting-started", "sec02-api-reference"]
+    assert len(sections[0].nodes) == 4
+
+
+def test_sections_are_selected_by_number_name_or_heading():
+    _, sections = split_sections(_parse(MARKDOWN))
+    assert select_sections(sections, ["2"]) == [sections[1]]
+    assert select_sections(sections, ["getting started"]) == [sections[0]]
+    assert select_sections(sections, ["sec02-api-reference"]) == [sections[1]]
+    with pytest.raises(ValueError):
+        select_sections(sections, ["Missing"])
+
+
+def test_split_render_includes_each_section():
+    split = LatexRenderer().render_split(_parse(MARKDOWN), {"title": "Manual"}, only=["2"], directory="manual")
+    assert "\\includeonly{manual/sec02-api-reference}" in split.master
+    assert split.master.index("\\includeonly") < split.master.index("\\begin{document}")
+    assert "\\include{manual/sec01-getting-started}" in split.master
+    assert "Preface text." in split.master
+    name, content = split.sections[0]
+    assert name == "manual/sec01-getting-started"
+    assert "\\section{Getting Started}" in content
+    assert "\\subsection{Details}" in content
+
+
+@pytest.mark.parametrize("only, passes", [(None, 1), (["2"], 2)])
+def test_includeonly_builds_get_a_second_pass(tmp_path, only, passes):
+    # The excluded sections keep their numbering only through the master .aux of a first pass.
+    split = LatexRenderer().render_split(_parse(MARKDOWN), {"title": "Manual"}, only=only, directory="manual")
+    (tmp_path / "manual").mkdir()
+    for name, content in split.sections:
+        (tmp_path / f"{name}.tex").write_text(content)
+    (tmp_path / "Manual.tex").write_text(split.master)
+    assert required_passes(str(tmp_path / "Manual.tex")) == passes
@@ -0,0 +1,65 @@
+from src.core.html_renderer import HtmlRenderer
+from src.core.parser import Parser
+from src.core.renderer import LatexRenderer
+from src.core.spill import SPILL_DIR, BlockSpill
+from src.core.tokenizer import Tokenizer, TokenType
+from src.utils.highlight import HighlightCache
+from src.utils.pdf_generator import required_passes
+
+CODE = "\n".join(f"value_{i} = {i}" for i in range(50))
+TABLE = "\n".join(["caption: Values", "| Name | Value |", "|---|---|"] + [f"| v{i} | {i} |" for i in range(50)])
+MARKDOWN = f"```python\nprint(1)\n```\n\n```python\n{CODE}\n```\n\n::: table\n{TABLE}\n:::\n"
+
+
+def _parse(tmp_path, threshold=200):
+    return Parser(Tokenizer(BlockSpill(tmp_path, threshold)).tokenize(MARKDOWN)).parse()
+
+
+def test_only_blocks_over_the_threshold_are_spilled(tmp_path):
+    tokens = Tokenizer(BlockSpill(tmp_path, 200)).tokenize(MARKDOWN)
+    small, big = [token for token in tokens if token.type == TokenType.CODE_BLOCK]
+    assert small.value == {"language": "python", "content": "print(1)"}
+    assert big.value["content"] == "" and big.value["spilled"].name.startswith(f"{SPILL_DIR}/code-")
+    assert big.value["spilled"].path.read_text() == CODE + "\n"
+
+    # Files are named after their content, so a rebuild reuses them.
+    mtime = big.value["spilled"].path.stat().st_mtime_ns
+    again = Tokenizer(BlockSpill(tmp_path, 200)).tokenize(MARKDOWN)
+    assert [token.value for token in again if token.type == TokenType.CODE_BLOCK][1]["spilled"].path.stat().st_mtime_ns == mtime
+    assert len(list((tmp_path / SPILL_DIR).iterdir())) == 2
+
+
+def test_spilled_blocks_are_read_by_pdflatex(tmp_path):
+    latex = LatexRenderer().render(_parse(tmp_path), {})
+    assert "\\begin{lstlisting}[language=python]\nprint(1)" in latex
+    assert f"\\lstinputlisting[language=python]{{{SPILL_DIR}/code-" in latex
+    assert "value_7" not in latex and "v7 & 7" not in latex
+
+    table_input = next(line for line in latex.splitlines() if line.startswith("\\input{"))
+    table_tex = (tmp_path / table_input[len("\\input{"):-1]).read_text()
+    assert "\\begin{longtable}{|l|l|}" in table_tex and "\\textbf{Name} & \\textbf{Value} \\\\" in table_tex
+    assert "v49 & 49 \\\\" in table_tex and "\\caption{Values} \\\\" in table_tex
+
+
+def test_spilled_code_is_highlighted_into_a_side_file(tmp_path):
+    latex = LatexRenderer(code_mode="pygments", highlighter=HighlightCache(use_disk=False)).render(_parse(tmp_path), {})
+    name = next(line for line in latex.splitlines() if ".python.tex" in line)[len("\\input{"):-1]
+    assert "\\begin{Verbatim}" in (tmp_path / name).read_text()
+
+
+def test_html_preview_inlines_spilled_blocks(tmp_path):
+    page = HtmlRenderer().render(_parse(tmp_path), {})
+    assert "value_49 = 49" in page
+    assert "<caption>Values</caption>" in page and "<td>v49</td><td>49</td>" in page
+
+
+
+def test_spilled_blocks_are_not_scanned_for_second_pass_commands(tmp_path):
+    (tmp_path / SPILL_DIR).mkdir()
+    (tmp_path / SPILL_DIR / "table-1.tex").write_text("\\ref{looks-like-a-reference} \\\\\n" * 1000)
+    (tmp_path / "part.tex").write_text(f"\\input{{{SPILL_DIR}/table-1}}\n")
+    tex_file = tmp_path / "doc.tex"
+    tex_file.write_text("\\begin{document}\n\\input{part}\n\\end{document}\n")
+    assert required_passes(str(tex_file)) == 1
+    (tmp_path / "part.tex").write_text("See \\ref{intro}.\n")
+    assert required_passes(str(tex_file)) == 2
@@ -0,0 +1,139 @@
+import io
+import time
+
+import pytest
+
+import web.app as web_app
+from web.jobs import JobQueue
+from web.result_cache import ResultCache
+from web.retention import RetentionManager
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """The web app with its sessions, job queue and result cache under tmp_path."""
+    sessions = tmp_path / "sessions"
+    queue = JobQueue(sessions / "jobs.sqlite3", handler=web_app.run_conversion, workers=1)
+    retention = RetentionManager(sessions, in_use=queue.active_ids, on_evict=queue.forget)
+    monkeypatch.setattr(web_app, "SESSIONS_ROOT", sessions)
+    monkeypatch.setattr(web_app, "JOB_QUEUE", queue)
+    monkeypatch.setattr(web_app, "RESULT_CACHE", ResultCache(tmp_path / "results"))
+    monkeypatch.setattr(web_app, "RETENTION", retention)
+    monkeypatch.setattr(web_app.METRICS, "directory", None)  # this process's values, in memory
+    yield web_app.app.test_client()
+    queue.stop(10)
+    retention.stop(10)
+
+
+def _upload(client, markdown, filename="doc.md", html_only=True):
+    data = {"file": (io.BytesIO(markdown.encode("utf-8")), filename)}
+    if html_only:
+        data["html_only"] = "1"
+    response = client.post("/convert", data=data, headers={"Accept": "application/json"})
+    assert response.status_code == 202
+    return response.get_json()["job_id"]
+
+
+def _wait(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/api/jobs/{job_id}").get_json()
+        if status["status"] in ("done", "failed"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish in {timeout}s")
+
+
+def test_upload_is_queued_converted_and_offered_for_download(client, fake_pdflatex):
+    fake_pdflatex('echo "%PDF-1.4" > "${2%.tex}.pdf"')
+    job_id = _upload(client, "@title: Doc\n\n# Hi\n", html_only=False)
+    assert client.get(f"/jobs/{job_id}").status_code == 200
+
+    status = _wait(client, job_id)
+    assert status["status"] == "done" and status["result_url"] == f"/results/{job_id}"
+    page = client.get(status["result_url"]).data
+    for link in (f"/downloads/{job_id}/Doc.tex", f"/downloads/{job_id}/Doc.pdf", f"/view/{job_id}/Doc.html"):
+        assert link.encode() in page
+    assert client.get(f"/downloads/{job_id}/Doc.pdf").data == b"%PDF-1.4\n"
+    assert client.get(f"/api/jobs/{job_id}x").status_code == 404
+
+
+def test_images_outside_the_document_folder_are_not_served(client, tmp_path):
+    (tmp_path / "secret.txt").write_text("server secret")
+    job_id = _upload(client, f"@title: Doc\n\n# Hi\n\n![Fig: x]({tmp_path / 'secret.txt'})\n")
+
+    status = _wait(client, job_id)
+    assert status["status"] == "failed"
+    assert "outside the document's directory" in status["error"]
+    assert client.get(f"/view/{job_id}/secret.txt").status_code == 404
+    assert client.get(f"/downloads/{job_id}/secret.txt").status_code == 404
+    assert not list((tmp_path / "sessions" / job_id).glob("secret*"))
+
+
+def test_only_the_jobs_own_outputs_can_be_downloaded(client):
+    job_id = _upload(client, "@title: Doc\n\n# Hi\n")
+    assert _wait(client, job_id)["status"] == "done"
+    assert client.get(f"/downloads/{job_id}/Doc.tex").status_code == 200
+    assert client.get(f"/downloads/{job_id}/doc.md").status_code == 404
+    assert client.get(f"/downloads/{job_id}/jobs.sqlite3").status_code == 404
+
+
+def test_results_page_of_an_html_only_job_has_no_pdf_link(client):
+    job_id = _upload(client, "@title: Doc\n\n# Hi\n")
+    assert _wait(client, job_id)["status"] == "done"
+    page = client.get(f"/results/{job_id}")
+    assert page.status_code == 200
+    assert f"/downloads/{job_id}/Doc.tex".encode() in page.data
+    assert b"Download .pdf" not in page.data
+
+
+def test_a_repeated_upload_is_served_from_the_result_cache(client, tmp_path):
+    first = _upload(client, "@title: Doc\n\n# Hi\n")
+    assert _wait(client, first)["status"] == "done"
+
+    second = _upload(client, "@title: Doc\n\n# Hi\n")
+    status = client.get(f"/api/jobs/{second}").get_json()
+    assert status["status"] == "done"  # recorded as done, without queueing
+    assert client.get(status["result_url"]).data == client.get(f"/view/{first}/Doc.html").data
+    assert web_app.RESULT_CACHE.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("body", [
+    {"data": "not json", "content_type": "text/plain"},
+    {"json": ["# Hi"]},
+    {"json": {"markdown": 5}},
+    {"json": {"markdown": "# Hi", "assets": ["a.png"]}},
+    {"json": {"markdown": "# Hi", "assets": {"a.png": "not base64!"}}},
+    {"json": {"markdown": "# Hi", "assets": {"a.png": 5}}},
+])
+def test_api_convert_rejects_bad_payloads(client, body):
+    response = client.post("/api/convert", **body)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_api_convert_answers_with_latex_or_a_conversion_error(client):
+    result = client.post("/api/convert", json={"markdown": "# Hi\n", "html": True}).get_json()
+    assert "\\section{Hi}" in result["latex"] and "<h1" in result["html"]
+
+    response = client.post("/api/convert", json={"markdown": "@include: ../../etc/passwd\n"})
+    assert response.status_code == 422
+    assert response.get_json()["kind"] == "IncludeError"
+
+
+def _sample(text, series):
+    return next((float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(series + " ")), 0.0)
+
+
+def test_metrics_expose_requests_conversions_and_stage_latency(client):
+    ok = 'littletex_conversions_total{mode="tex",outcome="ok"}'
+    before = client.get("/metrics").get_data(as_text=True)
+    client.post("/api/convert", json={"markdown": "# Hi\n"})
+
+    response = client.get("/metrics")
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert "# TYPE littletex_conversion_seconds histogram" in text
+    assert _sample(text, ok) == _sample(before, ok) + 1
+    assert _sample(text, 'littletex_http_requests_total{endpoint="/api/convert",method="POST",status="200"}') >= 1
+    assert _sample(text, 'littletex_stage_seconds_count{stage="render"}') >= 1
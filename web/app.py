@@ -1,18 +1,30 @@
+import base64
+import binascii
+import hashlib
 import os
 import tempfile
 import uuid
-import zipfile
+from contextlib import contextmanager
 from pathlib import Path
 from flask import (
-    Flask, request, render_template, send_from_directory,
-    url_for, flash, redirect, session
+    Flask, Response, request, render_template, send_from_directory,
+    url_for, flash, redirect, jsonify, abort
 )
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 
 # Import your existing application components
 from src.core.app import LittleTexApp
+from src.core.convert import convert_markdown
+from src.core.errors import AssetError, CompileError, LittleTexError, ParseError, RenderError
 from src.pipeline.config import PipelineConfig
+from src.pipeline.stages import CopyAssetsStage
+from src.utils.pdf_generator import CompileLimits, PdfCancelledError, PdfTimeoutError
+from web.archive import ArchiveLimits, UploadArchive
+from web.jobs import DONE, FAILED, QUEUED, JobQueue
+from web.metrics import SIZE_BUCKETS, MetricsRegistry
+from web.result_cache import ResultCache, cache_key
+from web.retention import RetentionManager
 
 load_dotenv()
 
@@ -22,6 +34,178 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'd08fb1b3ebd309b2563c17000923cdffba5f8275b8f661e55022df4b30bc28e0')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Set max upload size to 16MB
 
+def _env_number(name, default, cast=float):
+    """Read a numeric setting from the environment; an empty value disables the limit."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return cast(value) if value.strip() else None
+
+
+# Keep a pathological document from tying up a worker or exhausting the box's memory.
+PDF_LIMITS = CompileLimits(
+    pass_timeout=_env_number('LITTLETEX_PASS_TIMEOUT', 60),
+    total_timeout=_env_number('LITTLETEX_TOTAL_TIMEOUT', 120),
+    memory_limit_mb=_env_number('LITTLETEX_MEMORY_LIMIT_MB', 1024, int),
+    cpu_time_limit=_env_number('LITTLETEX_CPU_LIMIT', 120, int),
+)
+
+SESSIONS_ROOT = Path(tempfile.gettempdir()) / "littletex_web"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# A .zip upload may not list more entries, or expand to more bytes, than this.
+_archive_mb = _env_number('LITTLETEX_ZIP_MAX_MB', 200, int)
+ARCHIVE_LIMITS = ArchiveLimits(
+    max_entries=_env_number('LITTLETEX_ZIP_MAX_ENTRIES', 10_000, int),
+    max_bytes=_archive_mb * 1024 * 1024 if _archive_mb else None,
+)
+
+# Finished conversions by upload hash, so repeated uploads skip the pipeline and pdflatex.
+_result_cache_mb = _env_number('LITTLETEX_RESULT_CACHE_MB', 512, int)
+RESULT_CACHE = ResultCache(
+    Path(tempfile.gettempdir()) / "littletex_results",
+    max_bytes=_result_cache_mb * 1024 * 1024 if _result_cache_mb else None,
+    max_age=_env_number('LITTLETEX_RESULT_CACHE_TTL', 7 * 24 * 3600),
+)
+
+# Prometheus metrics; every worker process writes its values to this directory and
+# /metrics merges them, so a scrape of any worker covers the whole server.
+METRICS = MetricsRegistry(Path(os.getenv('LITTLETEX_METRICS_DIR') or
+                               Path(tempfile.gettempdir()) / "littletex_metrics"))
+HTTP_REQUESTS = METRICS.counter('littletex_http_requests_total', 'HTTP requests handled.',
+                                ('endpoint', 'method', 'status'))
+CONVERSIONS = METRICS.counter('littletex_conversions_total',
+                              'Conversions by mode (pdf, html, tex) and outcome.', ('mode', 'outcome'))
+CONVERSION_SECONDS = METRICS.histogram('littletex_conversion_seconds',
+                                       'Total conversion latency, excluding time in the queue.', ('mode',))
+STAGE_SECONDS = METRICS.histogram('littletex_stage_seconds',
+                                  'Latency of each pipeline stage and pdflatex pass.', ('stage',))
+UPLOAD_BYTES = METRICS.histogram('littletex_upload_bytes', 'Size of uploaded documents.', ('kind',),
+                                 buckets=SIZE_BUCKETS)
+PDFLATEX_FAILURES = METRICS.counter('littletex_pdflatex_failures_total', 'pdflatex runs that produced no PDF.')
+PDFLATEX_TIMEOUTS = METRICS.counter('littletex_pdflatex_timeouts_total', 'pdflatex runs stopped by a time limit.')
+IN_FLIGHT = METRICS.gauge('littletex_conversions_in_flight', 'Conversions currently running.')
+
+# Outcome label per failure kind, most specific first.
+OUTCOMES = [
+    (PdfTimeoutError, 'timeout'),
+    (PdfCancelledError, 'cancelled'),
+    (ParseError, 'parse_error'),
+    (RenderError, 'render_error'),
+    (AssetError, 'asset_error'),
+    (CompileError, 'compile_error'),
+]
+
+
+def _observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+@contextmanager
+def _measure_conversion(mode):
+    """Records the latency, outcome and concurrency of one conversion."""
+    with IN_FLIGHT.track(), CONVERSION_SECONDS.time(mode=mode):
+        try:
+            yield
+        except Exception as e:
+            outcome = next((label for error_type, label in OUTCOMES if isinstance(e, error_type)), 'error')
+            if outcome == 'timeout':
+                PDFLATEX_TIMEOUTS.inc()
+            elif outcome == 'compile_error':
+                PDFLATEX_FAILURES.inc()
+            CONVERSIONS.inc(mode=mode, outcome=outcome)
+            raise
+    CONVERSIONS.inc(mode=mode, outcome='ok')
+
+
+def _save_upload(file, path):
+    """Streams an upload to disk, hashing it on the way; returns the hex digest."""
+    digest = hashlib.sha256()
+    with open(path, 'wb') as out:
+        while True:
+            chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+
+def run_conversion(payload):
+    """Job handler: runs the pipeline for one upload and returns the output file names."""
+    input_path = Path(payload['input_path'])
+    config = PipelineConfig(
+        input_path=input_path,
+        output_path=Path(payload['session_dir']) / f"{input_path.stem}.tex",
+        generate_pdf=not payload['html_only'],
+        compile_limits=PDF_LIMITS,
+        isolated_build=True,
+        html=True,
+        on_timing=_observe_stage,
+        # Uploads are capped by MAX_CONTENT_LENGTH, and a .tex downloaded on its own
+        # could not reach side files in littletex-blocks/, so blocks stay inline.
+        spill_threshold=None,
+    )
+    # Conversion failures raise LittleTexError; the job queue records the message.
+    with _measure_conversion('html' if payload['html_only'] else 'pdf'):
+        conversion = LittleTexApp(config)
+        result = conversion.run()
+        if not result or not result.exists():
+            raise RuntimeError('Conversion failed to produce any output.')
+    filenames = {
+        'tex': result.with_suffix('.tex').name,
+        'pdf': None if payload['html_only'] else result.name,
+        'html': result.with_suffix('.html').name,
+        # The images the preview references; /view serves nothing else from the session.
+        'images': sorted({name for stage in conversion.stages if isinstance(stage, CopyAssetsStage)
+                          for name in stage.asset_names.values()}),
+    }
+    RESULT_CACHE.store(payload['cache_key'], Path(payload['session_dir']), filenames)
+    return filenames
+
+
+# Conversions run on a bounded pool of worker threads per process; the queue itself lives
+# in SQLite so every gunicorn worker sees the same jobs. Smaller inputs are served first.
+JOB_QUEUE = JobQueue(
+    SESSIONS_ROOT / "jobs.sqlite3",
+    handler=run_conversion,
+    workers=_env_number('LITTLETEX_JOB_WORKERS', 2, int) or 1,
+)
+
+
+# Session directories are deleted after a TTL, and the least recently downloaded ones go
+# first when the total exceeds the quota. Queued and running conversions are kept.
+_quota_mb = _env_number('LITTLETEX_SESSION_QUOTA_MB', 2048, int)
+RETENTION = RetentionManager(
+    SESSIONS_ROOT,
+    ttl=_env_number('LITTLETEX_SESSION_TTL', 6 * 3600),
+    quota_bytes=_quota_mb * 1024 * 1024 if _quota_mb else None,
+    interval=_env_number('LITTLETEX_RETENTION_INTERVAL', 60) or 60,
+    in_use=JOB_QUEUE.active_ids,
+    on_evict=JOB_QUEUE.forget,
+)
+
+
+def _job_cost(session_dir):
+    """Estimated conversion cost: the total size of the upload (Markdown plus assets)."""
+    return sum(path.stat().st_size for path in session_dir.rglob('*') if path.is_file())
+
+
+def _job_status(job):
+    status = {'job_id': job['id'], 'status': job['status'],
+              'status_url': url_for('job_status', job_id=job['id'])}
+    if job['status'] == QUEUED:
+        status['position'] = job['position']
+    elif job['status'] == FAILED:
+        status['error'] = job['error']
+    elif job['status'] == DONE:
+        if job['payload']['html_only']:
+            status['result_url'] = url_for('view_file', session_id=job['id'], filename=job['result']['html'])
+        else:
+            status['result_url'] = url_for('results', session_id=job['id'])
+    return status
+
+
 # Define the allowed file extensions
 ALLOWED_EXTENSIONS = {'md', 'zip'}
 
@@ -51,7 +235,7 @@ def convert_file():
 
     # 2. Create a unique temporary directory for this conversion
     session_id = str(uuid.uuid4())
-    session_dir = Path(tempfile.gettempdir()) / "littletex_web" / session_id
+    session_dir = SESSIONS_ROOT / session_id
     session_dir.mkdir(parents=True, exist_ok=True)
     
     # input_filename = secure_filename(file.filename)
@@ -59,26 +243,33 @@ def convert_file():
     # file.save(input_path)
     
     input_path = None
+    html_only = bool(request.form.get('html_only'))
     
     try:
         filename = secure_filename(file.filename)
+        upload_path = session_dir / filename
+        digest = _save_upload(file, upload_path)
+        UPLOAD_BYTES.observe(upload_path.stat().st_size, kind=upload_path.suffix.lstrip('.').lower())
+
+        # Identical upload and options converted before: serve the stored result.
+        key = cache_key(digest, filename, {'html_only': html_only})
+        result = RESULT_CACHE.lookup(key)
+        if result is not None:
+            try:
+                RESULT_CACHE.restore(key, session_dir)
+            except OSError:
+                result = None  # evicted while we were copying; convert again
+        if result is not None:
+            CONVERSIONS.inc(mode='html' if html_only else 'pdf', outcome='cached')
+            payload = {'session_dir': str(session_dir), 'html_only': html_only}
+            JOB_QUEUE.record(session_id, payload, result)
+            return _job_response(session_id)
         
-        # handle .zip files
+        # handle .zip files: only the document and the files it references are extracted
         if filename.lower().endswith('.zip'):
-            zip_path = session_dir / filename
-            file.save(zip_path)
-            
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(session_dir)
-            
-            md_files = list(session_dir.glob('**/*.md')) + list(session_dir.glob('**/*.markdown'))
-            if not md_files:
-                raise ValueError("No .md or .markdown file found inside the .zip archive.")
-            
-            input_path = md_files[0]
+            input_path = UploadArchive(upload_path, session_dir, ARCHIVE_LIMITS).extract_document()
         else:
-            input_path = session_dir / filename
-            file.save(input_path)
+            input_path = upload_path
     except Exception as e:
         flash(f"Error processing uploaded file: {e}")
         return redirect(url_for('index'))
@@ -87,51 +278,150 @@ def convert_file():
     # Store the original filename stem in the user's session for later use
     # session['filename_stem'] = input_path.stem
 
-    # 3. Try to run the conversion pipeline
+    # 3. Queue the conversion; a worker thread runs the pipeline (and pdflatex).
+    # "HTML preview only" skips pdflatex entirely; otherwise the preview is a cheap extra.
+    payload = {
+        'input_path': str(input_path),
+        'session_dir': str(session_dir),
+        'html_only': html_only,
+        'cache_key': key,
+    }
+    # The retention sweep spares recently used sessions until the job row protects this one.
+    RETENTION.touch(session_id)
+    JOB_QUEUE.submit(session_id, payload, cost=_job_cost(session_dir))
+    return _job_response(session_id)
+
+
+@app.route('/api/convert', methods=['POST'])
+def api_convert():
+    """
+    Tex-only conversion without a job or any files: takes
+    {"markdown": ..., "assets": {path: base64}, "toc_mode": ..., "code_mode": ..., "html": bool}
+    and returns the LaTeX source, the metadata and any warnings.
+    """
+    UPLOAD_BYTES.observe(request.content_length or 0, kind='json')
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('markdown'), str):
+        return jsonify({'error': 'Expected a JSON object with a "markdown" string.'}), 400
     try:
-        output_path = session_dir / f"{input_path.stem}.tex"
-        config = PipelineConfig(
-            input_path=input_path,
-            output_path=output_path,
-            generate_pdf=True
-        )
-        littletex_app = LittleTexApp(config)
-        final_pdf_path = littletex_app.run()
-        
-        if not final_pdf_path or not final_pdf_path.exists():
-            flash('Conversion failed to produce a PDF file.')
-            return redirect(url_for('index'))
-        
-        session['pdf_filename'] = final_pdf_path.name
-        session['tex_filename'] = final_pdf_path.with_suffix('.tex').name
-        
-    except Exception as e:
-        # If anything goes wrong in the pipeline, flash an error and redirect
-        flash(f'An error occurred during conversion: {e}')
-        return redirect(url_for('index'))
+        assets = {name: base64.b64decode(content, validate=True)
+                  for name, content in (data.get('assets') or {}).items()}
+    except (AttributeError, TypeError, binascii.Error):
+        return jsonify({'error': '"assets" must map file names to base64 strings.'}), 400
+
+    try:
+        with _measure_conversion('tex'):
+            result = convert_markdown(
+                data['markdown'], assets,
+                toc_mode='python' if data.get('toc_mode') == 'python' else 'latex',
+                code_mode='pygments' if data.get('code_mode') == 'pygments' else 'listings',
+                html=bool(data.get('html')),
+                on_timing=_observe_stage,
+            )
+    except LittleTexError as e:  # e.g. a broken include
+        return jsonify({'error': str(e), 'kind': type(e).__name__}), 422
+    return jsonify(result.to_dict())
+
+
+def _job_response(job_id):
+    RETENTION.start()
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(_job_status(JOB_QUEUE.get(job_id))), 202
+    return redirect(url_for('job_page', job_id=job_id))
 
-    # 4. If successful, redirect to the results page
-    return redirect(url_for('results', session_id=session_id))
+
+@app.route('/jobs/<job_id>')
+def job_page(job_id):
+    """Waiting page that polls the job status and moves on to the result."""
+    if JOB_QUEUE.get(job_id) is None:
+        abort(404)
+    return render_template('job.html', status_url=url_for('job_status', job_id=job_id))
+
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """Reports a job's state, its queue position while waiting, and where to find the result."""
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job id.'}), 404
+    return jsonify(_job_status(job))
 
 
 @app.route('/results/<session_id>')
 def results(session_id):
     """Displays the download links after a successful conversion."""
-    # Retrieve the filename stem we saved in the session
-    # filename_stem = session.get('filename_stem', 'output')
-    
-    pdf_filename = session.get('pdf_filename', 'output.pdf')
-    tex_filename = session.get('tex_filename', 'output.tex')
-    
+    job = JOB_QUEUE.get(session_id)
+    if job is None or job['status'] != DONE:
+        flash('This conversion is not finished or did not succeed.')
+        return redirect(url_for('index'))
+    filenames = job['result']
+
     # Generate the links for the results.html template
-    tex_link = url_for('download_file', session_id=session_id, filename=tex_filename)
-    pdf_link = url_for('download_file', session_id=session_id, filename=pdf_filename)
+    tex_link = url_for('download_file', session_id=session_id, filename=filenames['tex'])
+    # "HTML preview only" jobs have no PDF.
+    pdf_link = url_for('download_file', session_id=session_id, filename=filenames['pdf']) if filenames['pdf'] else None
+    html_link = url_for('view_file', session_id=session_id, filename=filenames['html'])
     
-    return render_template('results.html', tex_link=tex_link, pdf_link=pdf_link)
+    return render_template('results.html', tex_link=tex_link, pdf_link=pdf_link, html_link=html_link)
 
 
 @app.route('/downloads/<session_id>/<filename>')
 def download_file(session_id: str, filename: str):
     """A dedicated route to safely serve the generated files for download."""
-    directory = Path(tempfile.gettempdir()) / "littletex_web" / session_id
-    return send_from_directory(directory, filename, as_attachment=True)
\ No newline at end of file
+    job = JOB_QUEUE.get(session_id)
+    if job is None or job['status'] != DONE:
+        abort(404)
+    # Only the job's own outputs; the session also holds the upload and its assets.
+    if filename not in {job['result']['tex'], job['result']['pdf']} - {None}:
+        abort(404)
+    RETENTION.touch(session_id)
+    return send_from_directory(SESSIONS_ROOT / session_id, filename, as_attachment=True)
+
+
+# Uploaded documents are untrusted, and /view serves them inline on the app's origin. The
+# sandbox gives the page an opaque origin (no cookies, no same-origin requests); scripts stay
+# allowed so MathJax can typeset the math.
+VIEW_HEADERS = {
+    'Content-Security-Policy': 'sandbox allow-scripts',
+    'X-Content-Type-Options': 'nosniff',
+}
+
+
+@app.route('/view/<session_id>/<filename>')
+def view_file(session_id: str, filename: str):
+    """Serves the HTML preview (and the images it references) for viewing in the browser."""
+    job = JOB_QUEUE.get(session_id)
+    if job is None or job['status'] != DONE:
+        abort(404)
+    if filename not in {job['result']['html'], *job['result'].get('images', ())}:
+        abort(404)
+    RETENTION.touch(session_id)
+    response = send_from_directory(SESSIONS_ROOT / session_id, filename)
+    response.headers.update(VIEW_HEADERS)
+    return response
+
+
+@app.route('/api/storage')
+def storage_stats():
+    """Session storage counters: evictions (by reason), bytes freed and current usage."""
+    return jsonify(RETENTION.stats())
+
+
+@app.route('/api/cache')
+def cache_stats():
+    """Result cache counters for this process, including the hit rate."""
+    return jsonify(RESULT_CACHE.stats())
+
+
+@app.after_request
+def count_request(response):
+    # The route pattern, not the path, keeps the number of label values bounded.
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics, merged across all worker processes."""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,149 @@
+"""Extraction of .zip uploads: only the Markdown document and the files it references."""
+
+import posixpath
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Dict, Optional
+
+from src.core.errors import AssetError
+from src.core.includes import EXTERNAL_URL, IncludeResolver
+from src.core.parser import Parser
+from src.core.tokenizer import Tokenizer
+from src.utils.asset_sync import plan_asset_names
+from src.utils.text_processing import extract_metadata
+
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+CHUNK_SIZE = 1024 * 1024
+
+
+class ArchiveError(AssetError):
+    """Raised for archives that are unreadable, have no document or exceed the limits."""
+
+
+class ArchiveLimits:
+    """Bounds on what an uploaded archive may make us read and write."""
+
+    def __init__(self, max_entries: Optional[int] = 10_000,
+                 max_bytes: Optional[int] = 200 * 1024 * 1024):
+        self.max_entries = max_entries  # entries in the archive index, extracted or not
+        self.max_bytes = max_bytes      # uncompressed bytes written, over all extracted files
+
+
+class _ArchiveIncludeResolver(IncludeResolver):
+    """Extracts each @include:d file from the archive just before it is read."""
+
+    def __init__(self, archive: "UploadArchive", root_path: Path):
+        super().__init__(root_path)
+        self.archive = archive
+
+    def _read(self, path: Path) -> str:
+        self.archive.extract_path(path)
+        return super()._read(path)
+
+
+class UploadArchive:
+    """
+    Reads the index of an uploaded .zip, picks the Markdown document and
+    extracts it, the files it includes, its bibliography and the images its
+    AST references into `dest` (keeping the archive layout, so relative
+    paths still work). Nothing else in the archive is touched. Entries are
+    streamed in chunks and the byte limit counts what is actually
+    decompressed, not what the index claims.
+    """
+
+    def __init__(self, zip_path: Path, dest: Path, limits: Optional[ArchiveLimits] = None):
+        self.zip_path = Path(zip_path)
+        self.dest = Path(dest).resolve()
+        self.limits = limits or ArchiveLimits()
+        self.extracted: Dict[str, Path] = {}
+        self.bytes_written = 0
+        self._archive: Optional[zipfile.ZipFile] = None
+        self._index: Dict[str, zipfile.ZipInfo] = {}
+
+    def extract_document(self) -> Path:
+        """Extracts what the document needs; returns the path of the extracted Markdown file."""
+        try:
+            with zipfile.ZipFile(self.zip_path) as archive:
+                self._archive = archive
+                self._index = self._read_index(archive)
+                return self._extract_document()
+        except (zipfile.BadZipFile, zlib.error, NotImplementedError, RuntimeError) as e:
+            # Corrupt data, unsupported compression or encrypted entries.
+            raise ArchiveError(f"Could not read the .zip archive: {e}") from e
+        finally:
+            self._archive = None
+
+    def _read_index(self, archive: zipfile.ZipFile) -> Dict[str, zipfile.ZipInfo]:
+        entries = archive.infolist()
+        if self.limits.max_entries is not None and len(entries) > self.limits.max_entries:
+            raise ArchiveError(f"The archive has {len(entries)} entries; at most "
+                               f"{self.limits.max_entries} are allowed.")
+        index = {}
+        for info in entries:
+            name = posixpath.normpath(info.filename)
+            # Absolute names and names climbing out of the archive are never extracted.
+            if info.is_dir() or name.startswith(("/", "../")) or name == "..":
+                continue
+            index[name] = info
+        return index
+
+    def _pick_document(self) -> str:
+        candidates = [name for name in self._index
+                      if name.lower().endswith(MARKDOWN_SUFFIXES)
+                      and not name.startswith("__MACOSX/")
+                      and not posixpath.basename(name).startswith(".")]
+        if not candidates:
+            raise ArchiveError("No .md or .markdown file found inside the .zip archive.")
+        # The top-most file is the main document; deeper ones are usually included chapters.
+        return min(candidates, key=lambda name: (name.count("/"), name))
+
+    def _extract_document(self) -> Path:
+        name = self._pick_document()
+        document_path = self._extract(name)
+        metadata, markdown = extract_metadata(document_path.read_text(encoding="utf-8"))
+        # Parsed here only to find the referenced files; the pipeline tokenizes and parses the
+        # document again (the included files are shared through the parse cache).
+        document = Parser(Tokenizer().tokenize(markdown)).parse()
+        _ArchiveIncludeResolver(self, document_path).resolve(document)
+
+        base = posixpath.dirname(name)
+        references = list(plan_asset_names(document))
+        if metadata.get("bibliography"):
+            references.append(metadata["bibliography"])
+        for url in references:
+            if EXTERNAL_URL.match(url) or url.startswith("/"):
+                continue
+            entry = posixpath.normpath(posixpath.join(base, url))
+            if entry in self._index:
+                self._extract(entry)
+        return document_path
+
+    def extract_path(self, path: Path) -> None:
+        """Extracts the archive entry at `path` (a path under `dest`), if there is one."""
+        try:
+            name = Path(path).resolve().relative_to(self.dest).as_posix()
+        except ValueError:
+            return
+        if name in self._index:
+            self._extract(name)
+
+    def _extract(self, name: str) -> Path:
+        if name in self.extracted:
+            return self.extracted[name]
+        target = self.dest.joinpath(*name.split("/"))
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with self._archive.open(self._index[name]) as source, open(target, "wb") as out:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.bytes_written += len(chunk)
+                if self.limits.max_bytes is not None and self.bytes_written > self.limits.max_bytes:
+                    out.close()
+                    target.unlink()
+                    raise ArchiveError(f"The archive expands to more than the "
+                                       f"{self.limits.max_bytes} bytes allowed.")
+                out.write(chunk)
+        self.extracted[name] = target
+        return target
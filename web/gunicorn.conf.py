@@ -0,0 +1,37 @@
+"""Gunicorn settings: load the app once in the master and warm it up before forking workers."""
+
+import gc
+
+preload_app = True
+
+
+def on_starting(server):
+    # Imported here so the config file can be read without loading the app.
+    from web.app import METRICS
+
+    # Per-process metric files of a previous run would keep their counts, and their
+    # gauges would count again once a new worker happens to get an old pid.
+    METRICS.reset()
+
+
+def when_ready(server):
+    from src.core.convert import warm_up
+
+    warm_up()
+    # Keep the warmed-up objects out of the collector's reach, so collections
+    # in the workers do not touch (and un-share) the pages they live on.
+    gc.freeze()
+    server.log.info("LittleTex converter warmed up.")
+
+
+def worker_exit(server, worker):
+    from web.app import METRICS
+
+    # Write the last updates; the periodic flush may not have run since.
+    METRICS.flush()
+
+
+def child_exit(server, worker):
+    from web.app import METRICS
+
+    METRICS.mark_process_dead(worker.pid)
@@ -0,0 +1,210 @@
+"""A small SQLite-backed job queue, so conversions run outside the request thread."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# Waiting jobs gain this much priority per second, so large jobs are not starved
+# by a steady stream of small ones (1 MB of input after ~100 s in the queue).
+AGING_BYTES_PER_SECOND = 10 * 1024
+POLL_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    cost INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, cost);
+"""
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    Jobs are rows in a SQLite database, so every gunicorn worker process sees
+    the same queue and status; each process runs a bounded pool of worker
+    threads that claim the cheapest waiting job (by input size, with aging).
+    """
+
+    def __init__(self, db_path: Path, handler: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 workers: int = 2):
+        self.db_path = Path(db_path)
+        self.handler = handler
+        self.workers = workers
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            yield db
+        finally:
+            db.close()
+
+    def start(self) -> None:
+        """Starts this process's worker threads, replacing any that died; called on every submit."""
+        with self._start_lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            if len(self._threads) >= self.workers:
+                return
+            self._requeue_orphans()
+            for index in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._work, name=f"littletex-job-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stopping.clear()
+
+    def submit(self, job_id: str, payload: Dict[str, Any], cost: int) -> str:
+        """Queues a job; `cost` (e.g. input bytes) decides its place in the queue."""
+        with self._connect() as db:
+            db.execute("INSERT INTO jobs (id, status, cost, payload, created) VALUES (?, ?, ?, ?, ?)",
+                       (job_id, QUEUED, cost, json.dumps(payload), time.time()))
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def record(self, job_id: str, payload: Dict[str, Any], result: Dict[str, Any]) -> str:
+        """Adds a job that is already done, e.g. one served from a result cache."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT INTO jobs (id, status, cost, payload, result, created, started, finished) "
+                       "VALUES (?, ?, 0, ?, ?, ?, ?, ?)",
+                       (job_id, DONE, json.dumps(payload), json.dumps(result), now, now, now))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the job as a dict (with its queue position while waiting), or None."""
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            job["payload"] = json.loads(job["payload"])
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+            if job["status"] == QUEUED:
+                job["position"] = db.execute(
+                    f"SELECT COUNT(*) FROM jobs WHERE status = ? AND {self._priority()} < ?",
+                    (QUEUED, time.time(), self._priority_of(job)),
+                ).fetchone()[0] + 1
+        return job
+
+    def active_ids(self) -> Set[str]:
+        """Ids of the jobs that are waiting or running (their files must be kept)."""
+        with self._connect() as db:
+            rows = db.execute("SELECT id FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+        return {row["id"] for row in rows}
+
+    def forget(self, job_id: str) -> None:
+        """Drops a finished job, e.g. once its files have been deleted."""
+        with self._connect() as db:
+            db.execute("DELETE FROM jobs WHERE id = ? AND status IN (?, ?)", (job_id, DONE, FAILED))
+
+    @staticmethod
+    def _priority() -> str:
+        return f"(cost - (? - created) * {AGING_BYTES_PER_SECOND})"
+
+    @staticmethod
+    def _priority_of(job: Dict[str, Any]) -> float:
+        return job["cost"] - (time.time() - job["created"]) * AGING_BYTES_PER_SECOND
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically marks the highest-priority waiting job as running by this process."""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    f"SELECT * FROM jobs WHERE status = ? ORDER BY {self._priority()}, created LIMIT 1",
+                    (QUEUED, time.time()),
+                ).fetchone()
+                if row is not None:
+                    db.execute("UPDATE jobs SET status = ?, worker_pid = ?, started = ? WHERE id = ?",
+                               (RUNNING, os.getpid(), time.time(), row["id"]))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return dict(row) if row is not None else None
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None) -> None:
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ?",
+                       (status, json.dumps(result) if result is not None else None, error,
+                        time.time(), job_id))
+
+    def _requeue_orphans(self) -> None:
+        """Puts back jobs whose worker process died mid-conversion."""
+        with self._connect() as db:
+            rows = db.execute("SELECT id, worker_pid FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+            for row in rows:
+                if row["worker_pid"] != os.getpid() and not pid_alive(row["worker_pid"]):
+                    db.execute("UPDATE jobs SET status = ?, worker_pid = NULL WHERE id = ? AND status = ?",
+                               (QUEUED, row["id"], RUNNING))
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:  # e.g. the database stayed locked; try again later
+                print(f"Warning: Could not claim a job: {e}")
+                self._stopping.wait(POLL_INTERVAL)
+                continue
+            if job is None:
+                # Other processes may queue work too, so poll as well as waiting for a wakeup.
+                self._wakeup.wait(POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: Dict[str, Any]) -> None:
+        """Runs a claimed job; it ends up DONE or FAILED even if the handler raises BaseException."""
+        status, result, error = FAILED, None, "The conversion was interrupted."
+        try:
+            result = self.handler(json.loads(job["payload"]))
+            status, error = DONE, None
+        except Exception as e:  # a failing job must never take the worker thread down
+            error = str(e) or type(e).__name__
+        finally:
+            try:
+                self._finish(job["id"], status, result, error)
+            except sqlite3.Error as e:
+                print(f"Warning: Could not record the outcome of job {job['id']}: {e}")
@@ -0,0 +1,280 @@
+"""Prometheus metrics shared by all worker processes through a directory of per-process files."""
+
+import atexit
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from web.jobs import pid_alive
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2)
+# Seconds between writes of a process's values to its file.
+FLUSH_INTERVAL = 1.0
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _write_json(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(temp_path, path)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    """A named family of values, one per combination of label values."""
+
+    kind = "untyped"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str,
+                 labelnames: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> str:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return json.dumps([str(labels[name]) for name in self.labelnames])
+
+    def _labels(self, key: str, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, json.loads(key))) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def merge(self, total, value):
+        return (total or 0) + value
+
+    def expose(self, values: Dict[str, object]) -> List[str]:
+        if not values and not self.labelnames:
+            return [f"{self.name} 0"]  # an unlabelled series exists from the start
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}" for key, value in sorted(values.items())]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        self.registry._update(self, self._key(labels), lambda value: (value or 0) + amount)
+
+
+class Gauge(Metric):
+    """Summed over the processes that are still alive, e.g. work currently in progress."""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        self.registry._update(self, self._key(labels), lambda value: (value or 0) + amount)
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str,
+                 labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels: str) -> None:
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+
+        def add(state):
+            state = state or {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            state["buckets"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+            return state
+
+        self.registry._update(self, self._key(labels), add)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observes the duration of the block (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def merge(self, total, value):
+        if total is None:
+            return {"buckets": list(value["buckets"]), "sum": value["sum"], "count": value["count"]}
+        total["buckets"] = [a + b for a, b in zip(total["buckets"], value["buckets"])]
+        total["sum"] += value["sum"]
+        total["count"] += value["count"]
+        return total
+
+    def expose(self, values: Dict[str, object]) -> List[str]:
+        lines = []
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["buckets"]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._labels(key, (('le', _format_value(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{self._labels(key)} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Each process keeps its own values in memory and mirrors them to
+    `directory/<pid>-<id>.json` at most every `flush_interval` seconds (and
+    before it answers a scrape); `render` merges the files of all processes
+    (gunicorn workers), so any worker can answer a scrape. Counters and
+    histograms of exited workers keep counting towards the totals, gauges
+    only include live processes. Without a directory the registry only
+    reports the current process.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, flush_interval: float = FLUSH_INTERVAL):
+        self.directory = Path(directory) if directory is not None else None
+        self.flush_interval = flush_interval
+        self.metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._values: Dict[str, Dict[str, object]] = {}
+        self._path: Optional[Path] = None
+        self._dirty = False
+        atexit.register(self.flush)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def _update(self, metric: Metric, key: str, update) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker starts from zero instead of double-counting its parent's values.
+                self._pid = os.getpid()
+                self._values = {}
+                self._path = None
+                if self.directory is not None:
+                    self._path = self.directory / f"{self._pid}-{uuid.uuid4().hex[:8]}.json"
+                    threading.Thread(target=self._flush_periodically, args=(self._pid,),
+                                     name="metrics-flush", daemon=True).start()
+            values = self._values.setdefault(metric.name, {})
+            values[key] = update(values.get(key))
+            self._dirty = True
+
+    def _flush_periodically(self, pid: int) -> None:
+        # Updates only touch memory; the file is rewritten here, once per interval at most.
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes this process's values to its file now, if they changed since the last write."""
+        with self._lock:
+            if self._path is None or not self._dirty or self._pid != os.getpid():
+                return
+            _write_json(self._path, {"pid": self._pid, "values": self._values})
+            self._dirty = False
+
+    def mark_process_dead(self, pid: int) -> None:
+        """
+        Called (by the gunicorn master) when a worker has exited: its gauges
+        stop counting even if the operating system reuses its pid later.
+        """
+        if self.directory is None:
+            return
+        for path in self.directory.glob(f"{pid}-*.json"):
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            data["exited"] = True
+            _write_json(path, data)
+
+    def reset(self) -> None:
+        """
+        Deletes every process's file. Called once when the server starts, so
+        totals do not carry over between deployments and files of old workers
+        cannot come back to life when their pid is reused.
+        """
+        if self.directory is None or not self.directory.is_dir():
+            return
+        for path in self.directory.iterdir():
+            if path.suffix in (".json", ".tmp"):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def _snapshots(self) -> List[Tuple[bool, Dict[str, Dict[str, object]]]]:
+        """(process alive, values) for every process that has recorded anything."""
+        if self.directory is None or not self.directory.is_dir():
+            with self._lock:
+                return [(True, json.loads(json.dumps(self._values)))] if self._pid == os.getpid() else []
+        snapshots = []
+        for path in self.directory.glob("*.json"):
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue  # removed between listing and reading
+            alive = not data.get("exited") and (data["pid"] == os.getpid() or pid_alive(data["pid"]))
+            snapshots.append((alive, data["values"]))
+        return snapshots
+
+    def collect(self) -> Dict[str, Dict[str, object]]:
+        """Values of every metric, merged across processes."""
+        self.flush()
+        totals: Dict[str, Dict[str, object]] = {name: {} for name in self.metrics}
+        for alive, values in self._snapshots():
+            for name, series in values.items():
+                metric = self.metrics.get(name)
+                if metric is None or (metric.kind == "gauge" and not alive):
+                    continue
+                for key, value in series.items():
+                    totals[name][key] = metric.merge(totals[name].get(key), value)
+        return totals
+
+    def render(self) -> str:
+        """The Prometheus text exposition format."""
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.expose(values))
+        return "\n".join(lines) + "\n"
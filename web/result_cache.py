@@ -0,0 +1,140 @@
+"""Cache of finished conversions, keyed by the hash of the upload and the options."""
+
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from src.utils.cache import hash_bytes
+
+# Bump when the conversion output changes, so results of older versions are not served.
+CACHE_VERSION = "2"
+RESULT_FILE = "result.json"
+# Uploaded sources are not part of a result.
+SOURCE_SUFFIXES = {".md", ".markdown", ".zip"}
+
+
+def _files(directory: Path) -> Iterator[Path]:
+    """Every regular file below `directory`, at any depth."""
+    return (path for path in directory.rglob("*") if path.is_file())
+
+
+def cache_key(upload_digest: str, filename: str, options: Dict[str, Any]) -> str:
+    """Identical content, file name and options give the same key."""
+    return hash_bytes(f"{CACHE_VERSION}:{upload_digest}:{filename}:{json.dumps(options, sort_keys=True)}")
+
+
+class ResultCache:
+    """
+    Stores the output files of successful conversions in `root/<key>/`.
+    Entries older than `max_age` seconds are dropped, and the least recently
+    used entries go first when the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, root: Path, max_bytes: Optional[int] = 512 * 1024 ** 2,
+                 max_age: Optional[float] = 7 * 24 * 3600):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the stored result for `key` (and marks it as recently used), or None."""
+        entry = self.root / key
+        try:
+            result = json.loads((entry / RESULT_FILE).read_text(encoding="utf-8"))
+            expired = self.max_age is not None and time.time() - entry.stat().st_mtime > self.max_age
+        except (OSError, ValueError):
+            result, expired = None, False
+        if expired:
+            shutil.rmtree(entry, ignore_errors=True)
+            result = None
+        elif result is not None:
+            os.utime(entry)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def restore(self, key: str, session_dir: Path) -> None:
+        """Links (or copies) the cached files, subdirectories included, into a session directory."""
+        entry = self.root / key
+        for source in _files(entry):
+            if source == entry / RESULT_FILE:
+                continue
+            dest = session_dir / source.relative_to(entry)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(source, dest)
+            except OSError:
+                shutil.copy2(source, dest)
+
+    def store(self, key: str, session_dir: Path, result: Dict[str, Any]) -> None:
+        """Copies a finished conversion's outputs into the cache, then enforces the bounds."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = self.root / f".{key}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            # Left behind if this process died while storing; its contents are stale.
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.mkdir(exist_ok=True)
+            # Outputs can live in subdirectories, e.g. spilled blocks in littletex-blocks/.
+            for source in _files(session_dir):
+                if source.suffix.lower() not in SOURCE_SUFFIXES:
+                    dest = staging / source.relative_to(session_dir)
+                    dest.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(source, dest)
+            (staging / RESULT_FILE).write_text(json.dumps(result), encoding="utf-8")
+            # Publishing with a rename means readers never see a half-written entry.
+            os.rename(staging, self.root / key)
+        except OSError:
+            # Another worker stored the same result first, or the disk is full.
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        with self._lock:
+            self.stores += 1
+        self.prune()
+
+    def prune(self) -> None:
+        """Drops expired entries, then the least recently used ones until under `max_bytes`."""
+        if not self.root.is_dir():
+            return
+        now = time.time()
+        entries = []
+        for entry in self.root.iterdir():
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            try:
+                size = sum(path.stat().st_size for path in _files(entry))
+                entries.append((entry.stat().st_mtime, size, entry))
+            except FileNotFoundError:
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        for last_used, size, entry in sorted(entries, key=lambda item: item[0]):
+            expired = self.max_age is not None and now - last_used > self.max_age
+            if not expired and (self.max_bytes is None or total <= self.max_bytes):
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
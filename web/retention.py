@@ -0,0 +1,147 @@
+"""Expiry and disk quota for the per-conversion session directories of the web app."""
+
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Set
+
+# Sessions used this recently are never evicted: an upload is saved (and a .zip
+# extracted) into its directory before the job is queued and counts as in use.
+GRACE_PERIOD = 60
+
+
+def _directory_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+class RetentionManager:
+    """
+    Deletes session directories that have not been used for `ttl` seconds and,
+    when the directories together exceed `quota_bytes`, evicts the least
+    recently downloaded ones first. A directory's mtime records its last use
+    (creation, conversion output or download). Sessions reported by `in_use`
+    (e.g. queued or running jobs) and those used within the last `grace`
+    seconds are never removed.
+    """
+
+    def __init__(self, root: Path, ttl: Optional[float] = 6 * 3600,
+                 quota_bytes: Optional[int] = 2 * 1024 ** 3, interval: float = 60,
+                 in_use: Callable[[], Iterable[str]] = set,
+                 on_evict: Callable[[str], None] = lambda session_id: None,
+                 grace: float = GRACE_PERIOD):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.grace = grace
+        self.quota_bytes = quota_bytes
+        self.interval = interval
+        self.in_use = in_use
+        self.on_evict = on_evict
+        self.counters: Dict[str, int] = {
+            "evicted_expired": 0,
+            "evicted_quota": 0,
+            "bytes_freed": 0,
+            "sweeps": 0,
+            "usage_bytes": 0,
+            "sessions": 0,
+        }
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def touch(self, session_id: str) -> None:
+        """Marks a session as just used (e.g. downloaded), moving it to the back of the eviction order."""
+        if session_id in ("", ".", ".."):
+            return
+        try:
+            os.utime(self.root / session_id)
+        except FileNotFoundError:
+            pass
+
+    def start(self) -> None:
+        """Starts the background sweeper thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="littletex-retention", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._stopping.clear()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.sweep()
+            except Exception as e:  # keep sweeping; a bad directory must not stop retention
+                print(f"Warning: Session cleanup failed: {e}")
+            self._stopping.wait(self.interval)
+
+    def sweep(self) -> Dict[str, int]:
+        """Runs one expiry and quota pass; returns a snapshot of the counters."""
+        now = time.time()
+        protected: Set[str] = set(self.in_use())
+        sessions = []
+        if not self.root.is_dir():
+            return self.stats()
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue  # e.g. the job database
+                try:
+                    last_used = entry.stat(follow_symlinks=False).st_mtime
+                except FileNotFoundError:
+                    continue
+                if now - last_used < self.grace:
+                    protected.add(entry.name)
+                sessions.append([last_used, entry.name, _directory_size(Path(entry.path))])
+
+        evicted = {"evicted_expired": 0, "evicted_quota": 0, "bytes_freed": 0}
+        remaining = []
+        for session in sorted(sessions):
+            last_used, name, size = session
+            if self.ttl is not None and now - last_used > self.ttl and name not in protected:
+                self._evict(name, size, "evicted_expired", evicted)
+            else:
+                remaining.append(session)
+
+        usage = sum(size for _, _, size in remaining)
+        if self.quota_bytes is not None:
+            # Oldest last use first, i.e. least recently downloaded.
+            for last_used, name, size in list(remaining):
+                if usage <= self.quota_bytes:
+                    break
+                if name in protected:
+                    continue
+                self._evict(name, size, "evicted_quota", evicted)
+                remaining.remove([last_used, name, size])
+                usage -= size
+
+        with self._lock:
+            for key, value in evicted.items():
+                self.counters[key] += value
+            self.counters["sweeps"] += 1
+            self.counters["usage_bytes"] = usage
+            self.counters["sessions"] = len(remaining)
+            return dict(self.counters)
+
+    def _evict(self, name: str, size: int, reason: str, evicted: Dict[str, int]) -> None:
+        shutil.rmtree(self.root / name, ignore_errors=True)
+        evicted[reason] += 1
+        evicted["bytes_freed"] += size
+        self.on_evict(name)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)